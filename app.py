@@ -1,48 +1,177 @@
 import os
 import sys
 import json
-import random
+import time
 import threading
 import datetime
 from pathlib import Path
-from PIL import Image, ImageDraw, ImageFont
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Startup timing starts before the UI toolkit is imported
+STARTUP_STARTED = time.perf_counter()
+
 import customtkinter as ctk
-import google.generativeai as genai
-from deep_translator import GoogleTranslator
-import speech_recognition as sr
-import pyttsx3
+from storage import create_storage
+from cache import ResponseCache, CachedText, make_cache_key
+from translation import TranslationMemory, TranslatorPool, PipelinedTranslator
+import batch
+from indexes import PatternIndex, RankingIndex, SearchIndex, DuplicateIndex, merge_duplicates
+from engine import AsyncEngine, TkDispatcher, EngineBusyError, SingleFlight, single_flight, is_cancelled, DEFAULT_TIMEOUT
+from backends import create_model_backend, create_translation_backend, GeminiBackend
+from candidates import score_candidates
+from proofs import ProofRenderer
+from speech import SpeechWorker
+from voice import MicrophoneSource, TranscriptionPipeline, transcript_text
+from resilience import (ErrorResult, TokenBucket, CircuitBreaker, ResilientCaller,
+                        ResilientModelBackend, ResilientTranslationBackend)
+from metrics import REGISTRY, instrument
 
 
 ctk.set_appearance_mode("System")  
 ctk.set_default_color_theme("blue")  
 
-# Configure Gemini API
+# Configure Gemini API (applied when the client library is first loaded)
 API_KEY = "Your_Gemini_API_Key"
-genai.configure(api_key=API_KEY)
 MODEL_NAME = "gemini-2.0-flash"
 
+# Generation and translation backends: "gemini" / "google", or "local" for an offline
+# stand-in with simulated latency and errors (for load tests and profiling)
+MODEL_BACKEND = os.environ.get("EXCUSE_MODEL_BACKEND", "gemini")
+TRANSLATION_BACKEND = os.environ.get("EXCUSE_TRANSLATION_BACKEND", "google")
+LOCAL_MODEL_OPTIONS = {
+    "latency": os.environ.get("EXCUSE_LOCAL_LATENCY", "lognormal:0.8:0.4"),
+    "error_rate": float(os.environ.get("EXCUSE_LOCAL_ERROR_RATE", "0")),
+    "error_kinds": os.environ.get("EXCUSE_LOCAL_ERROR_KINDS", "rate_limit:2,server:1"),
+    "seed": int(os.environ.get("EXCUSE_LOCAL_SEED", "0"))
+}
+LOCAL_TRANSLATION_OPTIONS = dict(
+    LOCAL_MODEL_OPTIONS,
+    latency=os.environ.get("EXCUSE_LOCAL_TRANSLATION_LATENCY", "lognormal:0.2:0.4")
+)
+
+# Client-side quota for model calls in requests per minute (15 matches the Gemini free tier),
+# 0 disables it; the local stand-in is not limited unless this is set explicitly
+GEMINI_REQUESTS_PER_MINUTE = 15
+MODEL_REQUESTS_PER_MINUTE = os.environ.get("EXCUSE_MODEL_RPM")
+# Retries with exponential backoff on rate limits, server errors and timeouts
+MAX_ATTEMPTS = int(os.environ.get("EXCUSE_MAX_ATTEMPTS", "4"))
+RETRY_BASE_DELAY = float(os.environ.get("EXCUSE_RETRY_BASE_DELAY", "1"))
+# Consecutive failures before calls fail fast, and seconds before trying again
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_RESET_TIMEOUT = 30
+
+# Heavy client libraries are imported on first use to keep startup fast
+sr = None
+pyttsx3 = None
+
+
+def load_speech_recognition():
+    global sr
+    if sr is None:
+        import speech_recognition as sr_module
+        sr = sr_module
+    return sr
+
+
+def load_pyttsx3():
+    global pyttsx3
+    if pyttsx3 is None:
+        import pyttsx3 as pyttsx3_module
+        pyttsx3 = pyttsx3_module
+    return pyttsx3
+
+# Background engine limits: concurrent model/translation calls and seconds before a request is abandoned
+ENGINE_MAX_CONCURRENCY = int(os.environ.get("EXCUSE_MAX_CONCURRENCY", "4"))
+REQUEST_TIMEOUT = float(os.environ.get("EXCUSE_REQUEST_TIMEOUT", "60"))
+
+# Show generated text chunk by chunk as the model streams it
+STREAM_RESPONSES = True
+
+# While streaming, translate finished sentences before the rest of the excuse has arrived
+PIPELINE_TRANSLATION = True
+
 # Create data directory if it doesn't exist
 data_dir = Path("data")
 data_dir.mkdir(exist_ok=True)
 
-# Path for excuse history
-history_file = data_dir / "excuse_history.json"
+# Storage backend for history and favorites: "json" (default) or "sqlite"
+# Run `python storage.py import-json` once to move the JSON files into the database
+STORAGE_BACKEND = os.environ.get("EXCUSE_STORAGE_BACKEND", "json")
+
+# Path for excuse history (append-only journal, the old JSON list is migrated on first load)
+history_file = data_dir / "excuse_history.jsonl"
+legacy_history_file = data_dir / "excuse_history.json"
 favorites_file = data_dir / "favorites.json"
+database_file = data_dir / "excuses.db"
+response_cache_file = data_dir / "response_cache.db"
+translation_memory_file = data_dir / "translation_memory.db"
+pattern_index_file = data_dir / "excuse_patterns.json"
+history_search_file = data_dir / "history_search.json"
+favorites_search_file = data_dir / "favorites_search.json"
+history_duplicates_file = data_dir / "history_duplicates.json"
+favorites_duplicates_file = data_dir / "favorites_duplicates.json"
+proofs_dir = data_dir / "proofs"
+speech_cache_dir = data_dir / "speech_cache"
 
-# Initialize history and favorites if they don't exist
-if not history_file.exists():
-    with open(history_file, "w") as f:
-        json.dump([], f)
+# Text-to-speech voice id and words per minute (None keeps the system defaults)
+SPEECH_VOICE = os.environ.get("EXCUSE_SPEECH_VOICE")
+SPEECH_RATE = os.environ.get("EXCUSE_SPEECH_RATE")
+# Favorites are synthesized into the speech cache this long after startup
+SPEECH_PRERENDER_DELAY_MS = 5000
+
+# Translations running at once when one excuse goes to several languages; enough for
+# the usual 5-10 languages to finish in about the time of the slowest one
+TRANSLATION_FANOUT_WORKERS = 10
+# Preselected for "Translate to Several Languages"
+DEFAULT_FANOUT_LANGUAGES = ["Spanish", "French", "German", "Chinese (Simplified)", "Japanese"]
+
+# Voice input: segments recognized at once, and seconds of silence that end listening
+VOICE_RECOGNITION_WORKERS = 4
+VOICE_IDLE_TIMEOUT = 3
 
+# Older excuses count half as much for prediction after this many days (None keeps all equal)
+PREDICTION_HALF_LIFE_DAYS = 90
+
+# Excuses sharing at least this share of their word triples count as near-duplicates
+DUPLICATE_THRESHOLD = 0.8
+
+# Initialize favorites if they don't exist
 if not favorites_file.exists():
     with open(favorites_file, "w") as f:
         json.dump([], f)
 
 
+def is_error_text(result):
+    # Generator methods report failures as ErrorResult values instead of raising
+    return isinstance(result, ErrorResult)
+
+
 class ExcuseGenerator:
-    def __init__(self):
-        self.model = genai.GenerativeModel(MODEL_NAME)
-        self.translator = GoogleTranslator()
+    def __init__(self, model_backend=None, translation_backend=None):
+        # Backends connect on first use; recognizer and TTS engine are created lazily too (see properties below)
+        model_backend = model_backend or create_model_backend(
+            MODEL_BACKEND, MODEL_NAME, API_KEY, **LOCAL_MODEL_OPTIONS
+        )
+        translation_backend = translation_backend or create_translation_backend(
+            TRANSLATION_BACKEND, **LOCAL_TRANSLATION_OPTIONS
+        )
+        # Every backend call goes through rate limiting, retries and a circuit breaker
+        self.use_model_backend(model_backend)
+        self.translation_backend = ResilientTranslationBackend(
+            translation_backend, self.resilient_caller("translation")
+        )
+        self._recognizer = None
+        self.voice_pipeline = None
+        # One thread owns the pyttsx3 engine (started on first use) and plays requests in order
+        self.speech = SpeechWorker(speech_cache_dir, lambda: load_pyttsx3().init(), SPEECH_VOICE, SPEECH_RATE)
+        self._favorites = None
+        self._translation_executor = None
+        self._lazy_lock = threading.Lock()
+        # One English-source translator per target language, reused across calls
+        self.translator_pool = TranslatorPool(self.translation_backend.translator)
+        # Translations from the offline stand-in are kept apart from real ones
+        namespace = None if self.translation_backend.name == "google" else self.translation_backend.name
+        self.translation_memory = TranslationMemory(translation_memory_file, namespace=namespace)
         # Updated language codes dictionary with all supported languages from GoogleTranslator
         self.language_codes = {
             "English": "en",
@@ -73,149 +202,466 @@ class ExcuseGenerator:
             "Hungarian": "hu",
             "Thai": "th"
         }
-        self.recognizer = sr.Recognizer()
-        self.engine = pyttsx3.init()
-        self.history = self.load_history()
-        self.favorites = self.load_favorites()
+        self.storage = create_storage(STORAGE_BACKEND, data_dir)
+        # Identical prompts are answered from the cache unless a fresh response is requested
+        self.response_cache = ResponseCache(response_cache_file)
+        self.always_fresh = False
+        self.generation_config = None
+        # Identical generations and translations already in progress are shared, not repeated
+        self.flights = SingleFlight("generator")
+        # Day x hour x context totals, updated per entry so predictions never rescan history
+        self.pattern_index = PatternIndex(pattern_index_file, PREDICTION_HALF_LIFE_DAYS)
+        # Rated excuses per (context, audience), built on first ranking and updated on every rating
+        self.ranking_index = RankingIndex()
+        # Full-text search over history and favorites, updated as entries are added
+        self.history_search = SearchIndex(history_search_file)
+        self.favorites_search = SearchIndex(favorites_search_file)
+        # Near-duplicate lookup (MinHash + LSH bands) for new history entries and favorites
+        self.history_duplicates = DuplicateIndex(history_duplicates_file, DUPLICATE_THRESHOLD)
+        self.favorites_duplicates = DuplicateIndex(favorites_duplicates_file, DUPLICATE_THRESHOLD)
+        # Held by every history and favorites write, so a duplicate check and the write it
+        # leads to, or a read-merge-rewrite, cannot interleave with another write
+        self.write_lock = threading.RLock()
+        # Proof documents; fonts and templates are loaded on first render, batches use worker processes
+        self.proof_renderer = ProofRenderer(proofs_dir)
+    
+    @staticmethod
+    def resilient_caller(name, backend=None):
+        if MODEL_REQUESTS_PER_MINUTE is not None and backend is not None:
+            requests_per_minute = float(MODEL_REQUESTS_PER_MINUTE)
+        elif isinstance(backend, GeminiBackend):
+            requests_per_minute = GEMINI_REQUESTS_PER_MINUTE
+        else:
+            requests_per_minute = 0
+        limiter = TokenBucket(requests_per_minute, name=name) if requests_per_minute > 0 else None
+        breaker = CircuitBreaker(CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT, name=name)
+        return ResilientCaller(
+            name, limiter, breaker,
+            max_attempts=MAX_ATTEMPTS, base_delay=RETRY_BASE_DELAY, max_wait=REQUEST_TIMEOUT
+        )
+    
+    def use_model_backend(self, model_backend):
+        self.model_backend = ResilientModelBackend(model_backend, self.resilient_caller("model", model_backend))
+    
+    def configure_model(self, model_name, api_key):
+        """Switch model or API key in place; storage, caches and the speech thread stay as they are"""
+        self.use_model_backend(create_model_backend(MODEL_BACKEND, model_name, api_key, **LOCAL_MODEL_OPTIONS))
+    
+    @property
+    def recognizer(self):
+        with self._lazy_lock:
+            if self._recognizer is None:
+                self._recognizer = load_speech_recognition().Recognizer()
+            return self._recognizer
+    
+    @property
+    def translation_executor(self):
+        with self._lazy_lock:
+            if self._translation_executor is None:
+                self._translation_executor = ThreadPoolExecutor(
+                    TRANSLATION_FANOUT_WORKERS, thread_name_prefix="translate"
+                )
+            return self._translation_executor
+    
+    @property
+    def favorites(self):
+        if self._favorites is None:
+            self._favorites = self.load_favorites()
+        return self._favorites
+    
+    @favorites.setter
+    def favorites(self, value):
+        self._favorites = value
+    
+    @instrument("ExcuseGenerator.preload")
+    def preload(self):
+        """Load history and favorites ahead of time, meant to run in the background after startup"""
+        start = time.perf_counter()
+        self.load_history()
+        self.favorites
+        # Bring the on-disk indexes up to date now rather than on the first generate or search
+        self.history_duplicates.ensure_synced(self.history_count(), self.load_history)
+        self.history_search.ensure_synced(self.history_count(), self.load_history)
+        return time.perf_counter() - start
+    
+    @property
+    def history(self):
+        # Full history in insertion order; prefer query_history for filtered views
+        return self.load_history()
         
+    @instrument("ExcuseGenerator.load_history")
     def load_history(self):
         try:
-            with open(history_file, "r") as f:
-                return json.load(f)
+            return self.storage.load_history()
         except Exception as e:
             print(f"Error loading history: {e}")
             return []
     
+    @instrument("ExcuseGenerator.load_favorites")
     def load_favorites(self):
         try:
-            with open(favorites_file, "r") as f:
-                return json.load(f)
+            return self.storage.load_favorites()
         except Exception as e:
             print(f"Error loading favorites: {e}")
             return []
     
-    def save_history(self):
+    @instrument("ExcuseGenerator.query_history")
+    def query_history(self, context=None, audience=None, rated_only=False, newest_first=True, limit=None, offset=0):
+        try:
+            return self.storage.query_history(context, audience, rated_only, newest_first, limit, offset)
+        except Exception as e:
+            print(f"Error querying history: {e}")
+            return []
+    
+    def get_history_entries(self, indices):
+        try:
+            return self.storage.get_history_entries(indices)
+        except Exception as e:
+            print(f"Error querying history: {e}")
+            return []
+    
+    def get_history_by_index(self, indices):
+        try:
+            return self.storage.get_history_by_index(indices)
+        except Exception as e:
+            print(f"Error querying history: {e}")
+            return {}
+    
+    def history_count(self):
         try:
-            with open(history_file, "w") as f:
-                json.dump(self.history, f)
+            return self.storage.count_history()
         except Exception as e:
-            print(f"Error saving history: {e}")
+            print(f"Error counting history: {e}")
+            return 0
     
+    @instrument("ExcuseGenerator.save_history")
+    def save_history(self, entries=None):
+        # Full rewrite; generate and rate only append or update single records
+        with self.write_lock:
+            try:
+                self.storage.replace_history(self.history if entries is None else entries)
+                self.pattern_index.rebuild(self.history)
+                self.ranking_index.built = False
+                self.history_search.rebuild(self.history)
+                self.history_duplicates.rebuild(self.history)
+            except Exception as e:
+                print(f"Error saving history: {e}")
+    
+    @instrument("ExcuseGenerator.append_history")
+    def append_history(self, entry):
+        with self.write_lock:
+            try:
+                # Flag near-duplicates of earlier excuses; they are still kept in the history
+                self.history_duplicates.ensure_synced(self.history_count(), self.load_history)
+                match = self.history_duplicates.find(entry.get("excuse"), self.get_history_by_index)
+                if match is not None:
+                    entry["duplicate_of"] = match[0]
+            
+                index = self.storage.append_history(entry)
+                self.pattern_index.add(entry)
+                self.ranking_index.update(index, entry)
+                self.history_search.add(index, entry)
+                self.history_duplicates.add(index, entry)
+                return index
+            except Exception as e:
+                print(f"Error saving history: {e}")
+                return None
+    
+    @instrument("ExcuseGenerator.update_history_entry")
+    def update_history_entry(self, index, **fields):
+        with self.write_lock:
+            try:
+                self.storage.update_history(index, fields)
+                if "effectiveness" in fields:
+                    for entry in self.storage.get_history_entries([index]):
+                        self.ranking_index.update(index, entry)
+            except Exception as e:
+                print(f"Error updating history: {e}")
+    
+    @instrument("ExcuseGenerator.rate_excuse")
+    def rate_excuse(self, index, effectiveness):
+        self.update_history_entry(index, effectiveness=effectiveness)
+    
+    @instrument("ExcuseGenerator.save_favorites")
     def save_favorites(self):
+        with self.write_lock:
+            try:
+                self.storage.replace_favorites(self.favorites)
+                self.favorites_search.rebuild(self.favorites)
+                self.favorites_duplicates.rebuild(self.favorites)
+            except Exception as e:
+                print(f"Error saving favorites: {e}")
+    
+    @instrument("ExcuseGenerator.search_history")
+    def search_history(self, query, limit=None):
+        """Return history positions matching query, newest first"""
+        try:
+            self.history_search.ensure_synced(self.history_count(), self.load_history)
+            return self.history_search.search(query, limit)
+        except Exception as e:
+            print(f"Error searching history: {e}")
+            return []
+    
+    @instrument("ExcuseGenerator.search_favorites")
+    def search_favorites(self, query, limit=None):
+        """Return favorite positions matching query, newest first"""
         try:
-            with open(favorites_file, "w") as f:
-                json.dump(self.favorites, f)
+            self.favorites_search.ensure_synced(len(self.favorites), lambda: self.favorites)
+            return self.favorites_search.search(query, limit)
         except Exception as e:
-            print(f"Error saving favorites: {e}")
+            print(f"Error searching favorites: {e}")
+            return []
     
-    def generate_excuse(self, context, audience, formality, urgency):
+    @instrument("ExcuseGenerator.generate_text")
+    def generate_text(self, prompt, use_cache=True, on_chunk=None):
+        """Call the model, answering repeated prompts from the response cache.
+        
+        When on_chunk is given the response is streamed and on_chunk(text) is called
+        for every chunk as it arrives (once with the whole text on a cache hit).
+        A cache hit is returned as CachedText.
+        """
+        use_cache = use_cache and not self.always_fresh
+        key = make_cache_key(self.model_backend.name, prompt, self.generation_config)
+        if use_cache:
+            cached = self.response_cache.get(key)
+            if cached is not None:
+                REGISTRY.increment("cache_hits_total", cache="response")
+                if on_chunk is not None:
+                    on_chunk(cached)
+                return CachedText(cached)
+            REGISTRY.increment("cache_misses_total", cache="response")
+        
+        backend = self.model_backend.name
+        with REGISTRY.timer("model_duration_seconds", backend=backend):
+            if on_chunk is None:
+                text = self.model_backend.generate(prompt, self.generation_config)
+            else:
+                parts = []
+                start = time.perf_counter()
+                for chunk_text in self.model_backend.stream(prompt, self.generation_config):
+                    if not parts:
+                        REGISTRY.observe("model_first_chunk_seconds", time.perf_counter() - start, backend=backend)
+                    parts.append(chunk_text)
+                    on_chunk(chunk_text)
+                text = "".join(parts)
+        
+        # A fresh response still refreshes the cache for the next identical request
+        self.response_cache.set(key, text)
+        return text
+    
+    def generate_excuse(self, context, audience, formality, urgency, use_cache=False, save_to_history=True, on_chunk=None):
+        return self.generate_excuse_entry(context, audience, formality, urgency, use_cache, save_to_history, on_chunk)[0]
+    
+    @instrument("ExcuseGenerator.generate_excuse", failed=lambda result: is_error_text(result[0]))
+    def generate_excuse_entry(self, context, audience, formality, urgency, use_cache=False, save_to_history=True,
+                              on_chunk=None):
+        """Generate an excuse and return (excuse, history index); the index is None when it was not saved"""
+        generated = self._generate_excuse(context, audience, formality, urgency, use_cache, on_chunk=on_chunk)
+        excuse = generated["excuse"]
+        # An excuse repeated from the cache is already in the history
+        if not save_to_history or is_error_text(excuse) or isinstance(excuse, CachedText):
+            return excuse, None
+        # Saving is up to each caller rather than the one that ran the shared generation: if
+        # that one was cancelled, another caller still showing the excuse saves it, once
+        with self.write_lock:
+            if generated.get("index") is None:
+                generated["index"] = self.record_excuse(excuse, context, audience)
+        return excuse, generated["index"]
+    
+    @single_flight("generate_excuse")
+    def _generate_excuse(self, context, audience, formality, urgency, use_cache=False, on_chunk=None):
+        # Every click should give a new excuse, so the cache is only used when asked for
         prompt = f"Generate a believable excuse for {context}. The audience is {audience}. "
         prompt += f"The tone should be {formality} and the urgency is {urgency}."
         
+        # A dict, so callers sharing this generation also share whether it was saved
         try:
-            response = self.model.generate_content(prompt)
-            excuse = response.text
-            
-            # Save to history
-            self.history.append({
-                "excuse": excuse,
-                "context": context,
-                "audience": audience,
-                "timestamp": datetime.datetime.now().isoformat(),
-                "effectiveness": None  # To be rated later
-            })
-            self.save_history()
-            
-            return excuse
+            return {"excuse": self.generate_text(prompt, use_cache, on_chunk)}
+        except Exception as e:
+            return {"excuse": ErrorResult(f"Error generating excuse: {e}", e)}
+    
+    def record_excuse(self, excuse, context, audience):
+        """Append excuse to history and return its index (None when not saved)"""
+        # The UI has already reported a cancelled or timed out request as failed
+        if is_cancelled():
+            return None
+        return self.append_history({
+            "excuse": excuse,
+            "context": context,
+            "audience": audience,
+            "timestamp": datetime.datetime.now().isoformat(),
+            "effectiveness": None  # To be rated later
+        })
+    
+    @instrument("ExcuseGenerator.generate_excuse_candidates", failed=is_error_text)
+    def generate_excuse_candidates(self, context, audience, formality, urgency, count=3):
+        """Generate count alternative excuses in one model round trip, best first.
+        
+        Candidates are scored locally on length, tone and similarity to the best rated
+        past excuses for this context and audience (rank_excuses). They are always
+        fresh and are not saved; record_excuse saves the one the user picks.
+        """
+        prompt = f"Generate a believable excuse for {context}. The audience is {audience}. "
+        prompt += f"The tone should be {formality} and the urgency is {urgency}."
+        
+        try:
+            backend = self.model_backend.name
+            with REGISTRY.timer("model_duration_seconds", backend=backend):
+                texts = self.model_backend.generate_candidates(prompt, count, self.generation_config)
+            ranked = self.rank_excuses(context, audience, 5)
+            return score_candidates(texts, formality, urgency, ranked, DUPLICATE_THRESHOLD)
         except Exception as e:
-            return f"Error generating excuse: {e}"
+            return ErrorResult(f"Error generating excuses: {e}", e)
     
-    def generate_proof(self, excuse_type, details):
+    @instrument("ExcuseGenerator.generate_proof", failed=is_error_text)
+    @single_flight("generate_proof")
+    def generate_proof(self, excuse_type, details, use_cache=True, on_chunk=None):
         prompt = f"Generate a convincing proof for this excuse: {details}. "
         prompt += f"The type of proof needed is: {excuse_type}."
         
         try:
-            response = self.model.generate_content(prompt)
-            return response.text
+            return self.generate_text(prompt, use_cache, on_chunk)
         except Exception as e:
-            return f"Error generating proof: {e}"
+            return ErrorResult(f"Error generating proof: {e}", e)
     
-    def generate_emergency_message(self, emergency_type, recipient):
+    @instrument("ExcuseGenerator.generate_emergency_message", failed=is_error_text)
+    @single_flight("generate_emergency_message")
+    def generate_emergency_message(self, emergency_type, recipient, use_cache=True, on_chunk=None):
         prompt = f"Generate an emergency message about {emergency_type} for {recipient}."
         
         try:
-            response = self.model.generate_content(prompt)
-            return response.text
+            return self.generate_text(prompt, use_cache, on_chunk)
         except Exception as e:
-            return f"Error generating emergency message: {e}"
+            return ErrorResult(f"Error generating emergency message: {e}", e)
     
-    def generate_apology(self, situation, formality):
+    @instrument("ExcuseGenerator.generate_apology", failed=is_error_text)
+    @single_flight("generate_apology")
+    def generate_apology(self, situation, formality, use_cache=True, on_chunk=None):
         prompt = f"Generate a {formality} apology for this situation: {situation}."
         
         try:
-            response = self.model.generate_content(prompt)
-            return response.text
+            return self.generate_text(prompt, use_cache, on_chunk)
         except Exception as e:
-            return f"Error generating apology: {e}"
+            return ErrorResult(f"Error generating apology: {e}", e)
     
+    @instrument("ExcuseGenerator.translate_excuse", failed=is_error_text)
+    @single_flight("translate_excuse", streams=False)
     def translate_excuse(self, excuse, target_language):
+        # A failed generation is not an excuse; it is neither sent out nor remembered
+        if is_error_text(excuse):
+            return excuse
         try:
             # Get the language code from the language_codes dictionary
             # If not found, use the target_language directly
             language_code = self.language_codes.get(target_language, target_language)
             
-            # Initialize a new translator with source language as English and target as the specified language
-            translator = GoogleTranslator(source='en', target=language_code)
-            
-            # Translate the text
-            translation = translator.translate(excuse)
-            return translation
+            # Translate through the translation memory, only unseen sentences reach the translator
+            return self.translation_memory.translate(excuse, language_code, self.translator_pool)
         except Exception as e:
-            return f"Error translating: {e}"
+            return ErrorResult(f"Error translating: {e}", e)
     
-    def voice_to_text(self):
+    @instrument("ExcuseGenerator.translate_excuse_many")
+    def translate_excuse_many(self, excuse, target_languages, on_result=None):
+        """Translate excuse into several languages concurrently.
+        
+        At most TRANSLATION_FANOUT_WORKERS translations run at once, each through the
+        translation memory and the per-language translator pool. on_result(language,
+        translation) is called as each one finishes. Returns {language: translation}
+        in the order given; failures are ErrorResult values.
+        """
+        languages = list(dict.fromkeys(target_languages))
+        futures = {
+            self.translation_executor.submit(self.translate_excuse, excuse, language): language
+            for language in languages
+        }
+        results = {}
+        for future in as_completed(futures):
+            language = futures[future]
+            # translate_excuse reports failures as ErrorResult instead of raising
+            results[language] = future.result()
+            if on_result is not None:
+                on_result(language, results[language])
+        return {language: results[language] for language in languages}
+    
+    def start_pipelined_translation(self, target_language, on_output=None):
+        """Return a PipelinedTranslator that translates streamed chunks sentence by sentence"""
+        language_code = self.language_codes.get(target_language, target_language)
+        return PipelinedTranslator(
+            lambda sentence: self.translation_memory.translate(sentence, language_code, self.translator_pool),
+            on_output, executor=self.translation_executor
+        )
+    
+    def voice_to_text(self, on_partial=None):
+        """Dictate from the microphone until VOICE_IDLE_TIMEOUT seconds of silence or stop_listening()"""
+        return self.transcribe(MicrophoneSource(), on_partial, VOICE_IDLE_TIMEOUT)
+    
+    @instrument("ExcuseGenerator.transcribe", failed=is_error_text)
+    def transcribe(self, source, on_partial=None, idle_timeout=None):
+        """Transcribe a MicrophoneSource, WavSource or PcmSource segment by segment.
+        
+        Speech segments are recognized concurrently and on_partial(text) receives each
+        one's text in order as it completes. Returns the whole transcript; failed
+        segments are left out, and only if nothing was recognized is an error returned.
+        """
         try:
-            with sr.Microphone() as source:
-                print("Listening...")
-                audio = self.recognizer.listen(source)
-                text = self.recognizer.recognize_google(audio)
-                return text
+            pipeline = TranscriptionPipeline(self.recognize_segment, VOICE_RECOGNITION_WORKERS, idle_timeout)
+            self.voice_pipeline = pipeline
+            results = pipeline.run(source, on_partial)
+            text = transcript_text(results)
+            errors = [error for _, _, error in results if error is not None]
+            if errors and not text:
+                return ErrorResult(f"Error in speech recognition: {errors[0]}", errors[0])
+            return text
         except Exception as e:
-            return f"Error in speech recognition: {e}"
+            return ErrorResult(f"Error in speech recognition: {e}", e)
+    
+    def recognize_segment(self, segment):
+        sr_module = load_speech_recognition()
+        audio = sr_module.AudioData(segment.pcm, segment.sample_rate, 2)
+        try:
+            return self.recognizer.recognize_google(audio)
+        except sr_module.UnknownValueError:
+            # Noise or mumbling, not an error
+            return ""
+    
+    def stop_listening(self):
+        if self.voice_pipeline is not None:
+            self.voice_pipeline.stop()
             
+    @instrument("ExcuseGenerator.text_to_speech", failed=lambda spoken: not spoken)
     def text_to_speech(self, text):
+        """Speak text and wait until it has been spoken (or interrupted)"""
         try:
-            self.engine.say(text)
-            self.engine.runAndWait()
+            self.speech.speak(text).result()
             return True
         except Exception as e:
             print(f"Error in speech synthesis: {e}")
             return False
     
+    def speak(self, text):
+        """Speak text without waiting, cutting off anything still playing; returns a Future"""
+        return self.speech.speak(text)
+    
+    def stop_speaking(self):
+        self.speech.stop()
+    
+    def prerender_speech(self, texts=None):
+        """Synthesize texts (all favorites by default) into the speech cache at low priority"""
+        if texts is None:
+            texts = [favorite.get("excuse") for favorite in self.favorites]
+        return self.speech.prerender(texts)
+    
+    @instrument("ExcuseGenerator.predict_excuse_needs")
     def predict_excuse_needs(self):
         """Predict when excuses might be needed based on past patterns"""
         try:
-            # Group excuses by day of week and time of day
-            day_counts = {}
-            hour_counts = {}
-            context_counts = {}
-            
-            for entry in self.history:
-                # Extract timestamp
-                timestamp = datetime.datetime.fromisoformat(entry["timestamp"])
-                day = timestamp.strftime("%A")  # Day of week
-                hour = timestamp.hour
-                context = entry["context"]
-                
-                # Count occurrences
-                day_counts[day] = day_counts.get(day, 0) + 1
-                hour_counts[hour] = hour_counts.get(hour, 0) + 1
-                context_counts[context] = context_counts.get(context, 0) + 1
-            
-            # Find most common day, time, and context
-            most_common_day = max(day_counts.items(), key=lambda x: x[1])[0] if day_counts else "Monday"
-            most_common_hour = max(hour_counts.items(), key=lambda x: x[1])[0] if hour_counts else 9
-            most_common_context = max(context_counts.items(), key=lambda x: x[1])[0] if context_counts else "Work"
+            # Most common day, time and context come from the incremental pattern index
+            self.pattern_index.ensure_synced(self.history_count(), self.load_history)
+            most_common = self.pattern_index.most_common()
+            if most_common:
+                most_common_day, most_common_hour, most_common_context = most_common
+            else:
+                most_common_day, most_common_hour, most_common_context = "Monday", 9, "Work"
             
             # Calculate next occurrence of the most common day
             today = datetime.datetime.now()
@@ -241,38 +687,254 @@ class ExcuseGenerator:
             print(f"Error predicting excuse needs: {e}")
             return None
     
-    def rank_excuses(self, context, audience):
-        # Filter history by similar context and audience
-        relevant_excuses = [h for h in self.history if h["context"] == context and h["audience"] == audience]
-        
-        # Sort by effectiveness and recency
-        rated_excuses = [e for e in relevant_excuses if e["effectiveness"] is not None]
-        if rated_excuses:
-            # Calculate a score based on effectiveness (70%) and recency (30%)
-            now = datetime.datetime.now()
-            for excuse in rated_excuses:
-                # Calculate recency score (higher for more recent excuses)
-                excuse_time = datetime.datetime.fromisoformat(excuse["timestamp"])
-                days_old = (now - excuse_time).days + 1  # Add 1 to avoid division by zero
-                recency_score = 10 / days_old  # Higher for more recent excuses
-                
-                # Calculate combined score (effectiveness + recency)
-                excuse["score"] = (excuse["effectiveness"] * 0.7) + (recency_score * 0.3)
-            
-            # Sort by combined score
-            sorted_excuses = sorted(rated_excuses, key=lambda x: x["score"], reverse=True)
-            return sorted_excuses
-        else:
-            return []
+    @instrument("ExcuseGenerator.rank_excuses")
+    def rank_excuses(self, context, audience, k=None):
+        """Return the k best rated excuses for this context and audience, best first.
+        
+        The score combines effectiveness (70%) and recency (30%). Results are copies
+        with a "score" field; the saved history entries are left untouched.
+        """
+        if not self.ranking_index.built:
+            self.ranking_index.build(self.load_history())
+        
+        ranked = self.ranking_index.top(context, audience, k)
+        entries = self.get_history_by_index([index for _, index in ranked])
+        return [dict(entries[index], score=score) for score, index in ranked if index in entries]
+    
+    def render_proof(self, text, proof_type, fmt="png"):
+        """Render proof text to a PNG or PDF document in data/proofs and return its path"""
+        return self.proof_renderer.render(text, proof_type, fmt)
+    
+    def render_proofs(self, jobs, on_progress=None):
+        """Render many proofs in worker processes; see ProofRenderer.render_batch"""
+        return self.proof_renderer.render_batch(jobs, on_progress)
+    
+    def find_duplicate_favorite(self, excuse):
+        """Return the position of a favorite nearly identical to excuse, or None"""
+        favorites = self.favorites
+        self.favorites_duplicates.ensure_synced(len(favorites), lambda: favorites)
+        match = self.favorites_duplicates.find(excuse, lambda positions: {p: favorites[p] for p in positions if p < len(favorites)})
+        return None if match is None else match[0]
     
+    @instrument("ExcuseGenerator.add_to_favorites")
     def add_to_favorites(self, excuse_data):
-        self.favorites.append(excuse_data)
-        self.save_favorites()
+        """Save a favorite unless a near-identical one exists; returns True if it was added"""
+        with self.write_lock:
+            try:
+                if self.find_duplicate_favorite(excuse_data.get("excuse")) is not None:
+                    return False
+                excuse_data = {key: value for key, value in excuse_data.items() if key != "duplicate_of"}
+                self.storage.add_favorite(excuse_data)
+                self.favorites.append(excuse_data)
+                self.favorites_search.add(len(self.favorites) - 1, excuse_data)
+                self.favorites_duplicates.add(len(self.favorites) - 1, excuse_data)
+                return True
+            except Exception as e:
+                print(f"Error saving favorites: {e}")
+                return False
     
+    @instrument("ExcuseGenerator.remove_from_favorites")
     def remove_from_favorites(self, excuse_index):
-        if 0 <= excuse_index < len(self.favorites):
-            del self.favorites[excuse_index]
-            self.save_favorites()
+        with self.write_lock:
+            if 0 <= excuse_index < len(self.favorites):
+                try:
+                    self.storage.remove_favorite(excuse_index)
+                    del self.favorites[excuse_index]
+                    # Positions after the removed favorite shift down, so reindex (favorites are few)
+                    self.favorites_search.rebuild(self.favorites)
+                    self.favorites_duplicates.rebuild(self.favorites)
+                except Exception as e:
+                    print(f"Error saving favorites: {e}")
+    
+    @instrument("ExcuseGenerator.compact_duplicates")
+    def compact_duplicates(self, dry_run=False):
+        """Merge near-duplicate history entries and favorites into their first copy.
+        
+        Returns (history entries removed, favorites removed). With dry_run nothing is saved.
+        """
+        # Entries appended while merging would be lost in the rewrite, so writers wait
+        with self.write_lock:
+            history, removed_history = merge_duplicates(self.load_history(), DUPLICATE_THRESHOLD)
+            favorites, removed_favorites = merge_duplicates(self.favorites, DUPLICATE_THRESHOLD)
+            if not dry_run:
+                if removed_history:
+                    self.save_history(history)
+                if removed_favorites:
+                    self.favorites = favorites
+                    self.save_favorites()
+            return removed_history, removed_favorites
+
+
+class StreamWriter:
+    """Appends streamed chunks to a textbox and times the request.
+    
+    feed() is called from worker threads; chunks are buffered and written by the Tk
+    thread at most once per dispatcher tick so a fast stream cannot flood the UI.
+    """
+    
+    def __init__(self, dispatcher, textbox, streaming=True):
+        self.dispatcher = dispatcher
+        self.textbox = textbox
+        self.streaming = streaming
+        self.started = time.perf_counter()
+        self.first_chunk = None
+        self.finished = None
+        self.closed = False
+        self._buffer = []
+        self._scheduled = False
+        self._cleared = False
+        self._lock = threading.Lock()
+    
+    def feed(self, chunk):
+        if self.closed:
+            return
+        with self._lock:
+            if self.first_chunk is None:
+                self.first_chunk = time.perf_counter()
+            self._buffer.append(chunk)
+            schedule = not self._scheduled
+            self._scheduled = True
+        if schedule:
+            self.dispatcher.call(self._flush)
+    
+    def finish(self):
+        if self.finished is None:
+            self.finished = time.perf_counter()
+        self.closed = True
+    
+    def close(self):
+        # Superseded by a newer request, drop anything still arriving
+        self.closed = True
+    
+    def timing_text(self):
+        end = self.finished or time.perf_counter()
+        total = end - self.started
+        if self.first_chunk is None:
+            return f"Total {total:.2f}s"
+        return f"First token {self.first_chunk - self.started:.2f}s · Total {total:.2f}s"
+    
+    def _flush(self):
+        with self._lock:
+            text = "".join(self._buffer)
+            self._buffer = []
+            self._scheduled = False
+        if self.closed or not text:
+            return
+        if not self._cleared:
+            # Replace the "Generating..." placeholder with the first chunk
+            self.textbox.delete("0.0", "end")
+            self._cleared = True
+        self.textbox.insert("end", text)
+        self.textbox.see("end")
+
+
+class VirtualList(ctk.CTkFrame):
+    """Scrollable list that only creates widgets for the rows on screen.
+    
+    A fixed set of rows is created once and re-bound to different items as the
+    list scrolls. Items are fetched a page at a time through fetch(offset, limit)
+    and kept in a small index cache. Lists are newest first, so a refresh that finds
+    more items shifts the cache down instead of refetching everything.
+    """
+    
+    def __init__(self, master, fetch, count, create_row, bind_row, visible_rows=6, page_size=50, **kwargs):
+        super().__init__(master, **kwargs)
+        self.fetch = fetch
+        self.count = count
+        self.bind_row = bind_row
+        self.visible_rows = visible_rows
+        self.page_size = page_size
+        self.offset = 0
+        self.total = 0
+        self._cache = {}
+        
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(0, weight=1)
+        
+        # Recycled rows
+        self.rows_frame = ctk.CTkFrame(self, fg_color="transparent")
+        self.rows_frame.grid(row=0, column=0, sticky="nsew")
+        self.rows_frame.grid_columnconfigure(0, weight=1)
+        self.rows = []
+        for slot in range(visible_rows):
+            row = create_row(self.rows_frame)
+            row["frame"].grid(row=slot, column=0, padx=5, pady=5, sticky="ew")
+            self._bind_wheel(row["frame"])
+            self.rows.append(row)
+        
+        # Scrollbar driving the row offset
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+        
+        # Position label
+        self.status_label = ctk.CTkLabel(self, text="", text_color="gray")
+        self.status_label.grid(row=1, column=0, columnspan=2, padx=5, pady=(0, 5), sticky="e")
+    
+    def refresh(self, full=False):
+        new_total = self.count()
+        added = new_total - self.total
+        if full or added < 0:
+            self._cache.clear()
+        elif added > 0:
+            # New items arrive at the top, keep what we already fetched
+            self._cache = {index + added: item for index, item in self._cache.items()}
+            if self.offset > 0:
+                self.offset += added
+        self.total = new_total
+        self.scroll_to(self.offset)
+    
+    def scroll_to(self, offset):
+        self.offset = max(0, min(offset, self.total - self.visible_rows))
+        self._render()
+    
+    def _item(self, index):
+        if index not in self._cache:
+            if len(self._cache) > self.page_size * 10:
+                self._cache.clear()
+            page_start = index - index % self.page_size
+            for i, item in enumerate(self.fetch(page_start, self.page_size)):
+                self._cache[page_start + i] = item
+        return self._cache.get(index)
+    
+    def _render(self):
+        for slot, row in enumerate(self.rows):
+            index = self.offset + slot
+            item = self._item(index) if index < self.total else None
+            if item is None:
+                row["frame"].grid_remove()
+            else:
+                self.bind_row(row, item, index)
+                row["frame"].grid()
+        
+        if self.total:
+            first = self.offset / self.total
+            last = min(1.0, (self.offset + self.visible_rows) / self.total)
+            self.scrollbar.set(first, last)
+            shown_to = min(self.total, self.offset + self.visible_rows)
+            self.status_label.configure(text=f"Showing {self.offset + 1}-{shown_to} of {self.total}")
+        else:
+            self.scrollbar.set(0, 1)
+            self.status_label.configure(text="Nothing here yet")
+    
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.scroll_to(int(float(amount) * self.total))
+        elif action == "scroll":
+            step = self.visible_rows if unit == "pages" else 1
+            self.scroll_to(self.offset + int(amount) * step)
+    
+    def _on_wheel(self, event):
+        if getattr(event, "num", None) == 4 or getattr(event, "delta", 0) > 0:
+            self.scroll_to(self.offset - 1)
+        else:
+            self.scroll_to(self.offset + 1)
+        return "break"
+    
+    def _bind_wheel(self, widget):
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            widget.bind(sequence, self._on_wheel, add="+")
+        for child in widget.winfo_children():
+            self._bind_wheel(child)
 
 
 class App(ctk.CTk):
@@ -288,7 +950,20 @@ class App(ctk.CTk):
         self.grid_columnconfigure(1, weight=1)
         
         # Initialize excuse generator
+        generator_started = time.perf_counter()
         self.excuse_generator = ExcuseGenerator()
+        self.startup_report = {"generator": time.perf_counter() - generator_started}
+        
+        # All blocking calls run on one engine loop, results come back through the dispatcher
+        self.engine = AsyncEngine(max_concurrency=ENGINE_MAX_CONCURRENCY, default_timeout=REQUEST_TIMEOUT)
+        self.dispatcher = TkDispatcher(self)
+        self.stream_writers = {}
+        # True while the excuse (or proof) on screen is an error message
+        self.excuse_failed = False
+        self.proof_failed = False
+        # History position of the excuse on screen, which the rating applies to (None: nothing to rate)
+        self.excuse_history_index = None
+        self.listening = False
         
         # Create navigation frame
         self.navigation_frame = ctk.CTkFrame(self, corner_radius=0)
@@ -364,16 +1039,56 @@ class App(ctk.CTk):
             frame.grid_rowconfigure(0, weight=1)
             frame.grid_columnconfigure(0, weight=1)
         
-        # Initialize all frames
-        self.init_generate_excuse_frame()
-        self.init_proof_generator_frame()
-        self.init_emergency_system_frame()
-        self.init_apology_generator_frame()
-        self.init_history_frame()
-        self.init_settings_frame()
+        # Settings shared by several frames exist before any frame is built
+        self.always_fresh_var = ctk.BooleanVar(value=False)
+        self.stream_responses_var = ctk.BooleanVar(value=STREAM_RESPONSES)
+        
+        # Frame contents are built the first time the frame is shown
+        self.frame_initializers = {
+            "generate_excuse": self.init_generate_excuse_frame,
+            "proof_generator": self.init_proof_generator_frame,
+            "emergency_system": self.init_emergency_system_frame,
+            "apology_generator": self.init_apology_generator_frame,
+            "history": self.init_history_frame,
+            "settings": self.init_settings_frame
+        }
+        self.initialized_frames = set()
         
         # Default to generate excuse frame
+        frames_started = time.perf_counter()
         self.select_frame_by_name("generate_excuse")
+        self.startup_report["first_frame"] = time.perf_counter() - frames_started
+        
+        # Report startup time once the window is up, then load history in the background
+        self.after_idle(self.on_startup_complete)
+        
+        # Escape stops speech
+        self.bind("<Escape>", self.stop_speaking)
+    
+    def ensure_frame(self, name):
+        if name not in self.initialized_frames:
+            self.initialized_frames.add(name)
+            self.frame_initializers[name]()
+    
+    def on_startup_complete(self):
+        self.startup_report["interactive"] = time.perf_counter() - STARTUP_STARTED
+        print(
+            f"Startup: window interactive after {self.startup_report['interactive'] * 1000:.0f} ms "
+            f"(generator {self.startup_report['generator'] * 1000:.0f} ms, "
+            f"first frame {self.startup_report['first_frame'] * 1000:.0f} ms)"
+        )
+        self.run_in_engine(
+            "preload", self.excuse_generator.preload, (),
+            on_result=self.on_preload_complete,
+            on_error=lambda e: print(f"Error preloading history: {e}"),
+            timeout=None
+        )
+    
+    def on_preload_complete(self, seconds):
+        self.startup_report["history_load"] = seconds
+        print(f"Startup: history loaded in background in {seconds * 1000:.0f} ms")
+        # Favorites play back instantly once they are in the speech cache
+        self.after(SPEECH_PRERENDER_DELAY_MS, self.excuse_generator.prerender_speech)
     
     def select_frame_by_name(self, name):
         # Hide all frames
@@ -384,6 +1099,9 @@ class App(ctk.CTk):
         self.history_frame.grid_forget()
         self.settings_frame.grid_forget()
         
+        # Build the frame on first visit
+        self.ensure_frame(name)
+        
         # Show selected frame
         if name == "generate_excuse":
             self.generate_excuse_frame.grid(row=0, column=1, sticky="nsew")
@@ -398,6 +1116,8 @@ class App(ctk.CTk):
             self.refresh_history()
         elif name == "settings":
             self.settings_frame.grid(row=0, column=1, sticky="nsew")
+            self.update_cache_stats()
+            self.update_diagnostics()
     
     def nav_to_generate_excuse(self):
         self.select_frame_by_name("generate_excuse")
@@ -537,6 +1257,26 @@ class App(ctk.CTk):
         )
         self.voice_input_button.grid(row=0, column=2, padx=10, pady=5)
         
+        # Answer identical inputs from the response cache instead of writing a new excuse
+        self.reuse_excuse_var = ctk.BooleanVar(value=False)
+        self.reuse_excuse_checkbox = ctk.CTkCheckBox(
+            self.language_frame, text="Reuse cached result",
+            variable=self.reuse_excuse_var
+        )
+        self.reuse_excuse_checkbox.grid(row=0, column=3, padx=10, pady=5)
+        
+        # Several options come back from one request and are shown side by side
+        self.candidate_count_label = ctk.CTkLabel(self.language_frame, text="Options:")
+        self.candidate_count_label.grid(row=1, column=0, padx=10, pady=5, sticky="w")
+        
+        self.candidate_count_var = ctk.StringVar(value="1")
+        self.candidate_count_options = ctk.CTkSegmentedButton(
+            self.language_frame,
+            values=["1", "3", "5"],
+            variable=self.candidate_count_var
+        )
+        self.candidate_count_options.grid(row=1, column=1, padx=10, pady=5, sticky="w")
+        
         # Generate button with improved styling
         self.generate_button = ctk.CTkButton(
             self.generate_excuse_scrollable, text="Generate Excuse",
@@ -563,6 +1303,15 @@ class App(ctk.CTk):
         self.result_text = ctk.CTkTextbox(self.result_frame, height=150)
         self.result_text.grid(row=1, column=0, padx=10, pady=5, sticky="ew")
         
+        # Latency of the last request
+        self.result_timing_label = ctk.CTkLabel(self.result_frame, text="", text_color="gray")
+        self.result_timing_label.grid(row=2, column=0, padx=10, pady=(0, 5), sticky="e")
+        
+        # Scored options when more than one is requested, hidden until then
+        self.candidates_frame = ctk.CTkFrame(self.result_frame, fg_color="transparent")
+        self.candidates_frame.grid(row=3, column=0, padx=5, pady=5, sticky="ew")
+        self.candidates_frame.grid_remove()
+        
         # Translation result frame
         self.translation_frame = ctk.CTkFrame(self.generate_excuse_scrollable, corner_radius=10, border_width=1)
         self.translation_frame.grid(row=7, column=0, padx=20, pady=10, sticky="ew")
@@ -644,6 +1393,41 @@ class App(ctk.CTk):
             command=self.rate_excuse
         )
         self.rate_stars.grid(row=0, column=1, padx=5, pady=5)
+        
+        # Translate the excuse into several languages at once, one tab per language
+        self.multi_translation_frame = ctk.CTkFrame(self.generate_excuse_scrollable, corner_radius=10, border_width=1)
+        self.multi_translation_frame.grid(row=9, column=0, padx=20, pady=10, sticky="ew")
+        self.multi_translation_frame.grid_columnconfigure(0, weight=1)
+        
+        self.multi_translation_label = ctk.CTkLabel(
+            self.multi_translation_frame, text="Translate to Several Languages:",
+            font=ctk.CTkFont(size=16, weight="bold")
+        )
+        self.multi_translation_label.grid(row=0, column=0, padx=10, pady=5, sticky="w")
+        
+        self.multi_language_frame = ctk.CTkFrame(self.multi_translation_frame, fg_color="transparent")
+        self.multi_language_frame.grid(row=1, column=0, padx=10, pady=5, sticky="ew")
+        self.multi_language_vars = {}
+        languages = sorted(name for name in self.excuse_generator.language_codes if name != "English")
+        for i, language in enumerate(languages):
+            var = ctk.BooleanVar(value=language in DEFAULT_FANOUT_LANGUAGES)
+            ctk.CTkCheckBox(self.multi_language_frame, text=language, variable=var).grid(
+                row=i // 5, column=i % 5, padx=5, pady=3, sticky="w"
+            )
+            self.multi_language_vars[language] = var
+        
+        self.multi_translate_button = ctk.CTkButton(
+            self.multi_translation_frame, text="Translate Selected",
+            command=self.translate_to_many
+        )
+        self.multi_translate_button.grid(row=2, column=0, padx=10, pady=5)
+        
+        self.multi_translation_timing_label = ctk.CTkLabel(self.multi_translation_frame, text="", text_color="gray")
+        self.multi_translation_timing_label.grid(row=3, column=0, padx=10, pady=(0, 5), sticky="e")
+        
+        # Tabs are created per request
+        self.multi_translation_tabview = None
+        self.multi_translation_texts = {}
     
     def init_proof_generator_frame(self):
         # Create scrollable container for content
@@ -716,6 +1500,30 @@ class App(ctk.CTk):
             command=lambda: self.copy_to_clipboard(self.proof_result_text)
         )
         self.copy_proof_button.grid(row=2, column=0, padx=10, pady=10)
+        
+        # Latency of the last request
+        self.proof_timing_label = ctk.CTkLabel(self.proof_result_frame, text="", text_color="gray")
+        self.proof_timing_label.grid(row=3, column=0, padx=10, pady=(0, 5), sticky="e")
+        
+        # Render the proof as a document from the template for its type
+        self.proof_export_frame = ctk.CTkFrame(self.proof_result_frame, fg_color="transparent")
+        self.proof_export_frame.grid(row=4, column=0, padx=10, pady=(0, 10), sticky="ew")
+        self.proof_export_frame.grid_columnconfigure(2, weight=1)
+        
+        self.export_proof_png_button = ctk.CTkButton(
+            self.proof_export_frame, text="Export PNG",
+            command=lambda: self.export_proof("png")
+        )
+        self.export_proof_png_button.grid(row=0, column=0, padx=5, pady=5)
+        
+        self.export_proof_pdf_button = ctk.CTkButton(
+            self.proof_export_frame, text="Export PDF",
+            command=lambda: self.export_proof("pdf")
+        )
+        self.export_proof_pdf_button.grid(row=0, column=1, padx=5, pady=5)
+        
+        self.proof_export_label = ctk.CTkLabel(self.proof_export_frame, text="", text_color="gray")
+        self.proof_export_label.grid(row=0, column=2, padx=5, pady=5, sticky="w")
     
     def init_emergency_system_frame(self):
         # Create scrollable container for content
@@ -805,6 +1613,10 @@ class App(ctk.CTk):
             command=self.simulate_send
         )
         self.send_emergency_button.grid(row=0, column=1, padx=5, pady=5)
+        
+        # Latency of the last request
+        self.emergency_timing_label = ctk.CTkLabel(self.emergency_result_frame, text="", text_color="gray")
+        self.emergency_timing_label.grid(row=3, column=0, padx=10, pady=(0, 5), sticky="e")
     
     def init_apology_generator_frame(self):
         # Create scrollable container for content
@@ -883,6 +1695,10 @@ class App(ctk.CTk):
             command=lambda: self.copy_to_clipboard(self.apology_result_text)
         )
         self.copy_apology_button.grid(row=2, column=0, padx=10, pady=10)
+        
+        # Latency of the last request
+        self.apology_timing_label = ctk.CTkLabel(self.apology_result_frame, text="", text_color="gray")
+        self.apology_timing_label.grid(row=3, column=0, padx=10, pady=(0, 5), sticky="e")
     
     def init_history_frame(self):
         # Create scrollable container for content
@@ -897,9 +1713,31 @@ class App(ctk.CTk):
         )
         self.history_title.grid(row=0, column=0, padx=20, pady=(20, 20))
         
+        # Search box, filters both tabs as you type
+        self.history_matches = None
+        self.favorite_matches = None
+        self.search_after_id = None
+        self.search_var = ctk.StringVar()
+        self.search_frame = ctk.CTkFrame(self.history_scrollable, fg_color="transparent")
+        self.search_frame.grid(row=1, column=0, padx=20, pady=(0, 10), sticky="ew")
+        self.search_frame.grid_columnconfigure(0, weight=1)
+        self.search_entry = ctk.CTkEntry(
+            self.search_frame, textvariable=self.search_var,
+            placeholder_text="Search excuses, contexts, audiences and translations..."
+        )
+        self.search_entry.grid(row=0, column=0, padx=(0, 10), sticky="ew")
+        self.search_entry.bind("<KeyRelease>", self.schedule_search)
+        
+        # Merge near-duplicate excuses
+        self.merge_duplicates_button = ctk.CTkButton(
+            self.search_frame, text="Merge Duplicates",
+            command=self.merge_duplicates
+        )
+        self.merge_duplicates_button.grid(row=0, column=1)
+        
         # Tab view with improved styling
         self.history_tabview = ctk.CTkTabview(self.history_scrollable, corner_radius=10)
-        self.history_tabview.grid(row=1, column=0, padx=20, pady=10, sticky="nsew")
+        self.history_tabview.grid(row=2, column=0, padx=20, pady=10, sticky="nsew")
         self.history_tabview.add("History")
         self.history_tabview.add("Favorites")
         
@@ -907,19 +1745,29 @@ class App(ctk.CTk):
         self.history_tab = self.history_tabview.tab("History")
         self.history_tab.grid_columnconfigure(0, weight=1)
         
-        # History list frame
-        self.history_list_frame = ctk.CTkScrollableFrame(self.history_tab)
-        self.history_list_frame.grid(row=0, column=0, padx=10, pady=10, sticky="nsew")
-        self.history_list_frame.grid_columnconfigure(0, weight=1)
+        # History list, only the visible rows are real widgets
+        self.history_list = VirtualList(
+            self.history_tab,
+            fetch=self.fetch_history,
+            count=self.count_history,
+            create_row=self.create_history_row,
+            bind_row=self.bind_history_row
+        )
+        self.history_list.grid(row=0, column=0, padx=10, pady=10, sticky="nsew")
         
         # Favorites tab
         self.favorites_tab = self.history_tabview.tab("Favorites")
         self.favorites_tab.grid_columnconfigure(0, weight=1)
         
-        # Favorites list frame
-        self.favorites_list_frame = ctk.CTkScrollableFrame(self.favorites_tab)
-        self.favorites_list_frame.grid(row=0, column=0, padx=10, pady=10, sticky="nsew")
-        self.favorites_list_frame.grid_columnconfigure(0, weight=1)
+        # Favorites list (newest first)
+        self.favorites_list = VirtualList(
+            self.favorites_tab,
+            fetch=self.fetch_favorites,
+            count=self.count_favorites,
+            create_row=self.create_favorite_row,
+            bind_row=self.bind_favorite_row
+        )
+        self.favorites_list.grid(row=0, column=0, padx=10, pady=10, sticky="nsew")
     
     def init_settings_frame(self):
         # Create scrollable container for content
@@ -1001,6 +1849,13 @@ class App(ctk.CTk):
         )
         self.save_settings_button.grid(row=2, column=1, padx=15, pady=15, sticky="e")
         
+        # Streaming switch
+        self.stream_responses_switch = ctk.CTkSwitch(
+            self.api_settings_frame, text="Stream responses as they are generated",
+            variable=self.stream_responses_var
+        )
+        self.stream_responses_switch.grid(row=2, column=0, padx=10, pady=15, sticky="w")
+        
         # UI settings frame with improved styling
         self.ui_settings_frame = ctk.CTkFrame(self.settings_scrollable, corner_radius=10, border_width=1)
         self.ui_settings_frame.grid(row=2, column=0, padx=20, pady=20, sticky="ew")
@@ -1019,9 +1874,89 @@ class App(ctk.CTk):
         self.ui_scaling_optionemenu.grid(row=0, column=1, padx=10, pady=10, sticky="w")
         self.ui_scaling_optionemenu.set("100%")
         
+        # Response cache frame
+        self.cache_settings_frame = ctk.CTkFrame(self.settings_scrollable, corner_radius=10, border_width=1)
+        self.cache_settings_frame.grid(row=3, column=0, padx=20, pady=10, sticky="ew")
+        self.cache_settings_frame.grid_columnconfigure(1, weight=1)
+        
+        # Response cache title
+        self.cache_settings_title = ctk.CTkLabel(
+            self.cache_settings_frame, text="Response Cache",
+            font=ctk.CTkFont(size=18, weight="bold")
+        )
+        self.cache_settings_title.grid(row=0, column=0, columnspan=2, padx=10, pady=(10, 5), sticky="w")
+        
+        # Always fresh switch
+        self.always_fresh_switch = ctk.CTkSwitch(
+            self.cache_settings_frame, text="Always fetch fresh responses",
+            variable=self.always_fresh_var,
+            command=self.toggle_always_fresh
+        )
+        self.always_fresh_switch.grid(row=1, column=0, padx=10, pady=10, sticky="w")
+        
+        # Clear cache button
+        self.clear_cache_button = ctk.CTkButton(
+            self.cache_settings_frame, text="Clear Cache",
+            command=self.clear_response_cache
+        )
+        self.clear_cache_button.grid(row=1, column=1, padx=10, pady=10, sticky="e")
+        
+        # Cache statistics
+        self.cache_stats_label = ctk.CTkLabel(self.cache_settings_frame, text="", text_color="gray")
+        self.cache_stats_label.grid(row=2, column=0, columnspan=2, padx=10, pady=(0, 10), sticky="w")
+        
+        # Diagnostics frame: latency percentiles and counters from the metrics registry
+        self.diagnostics_frame = ctk.CTkFrame(self.settings_scrollable, corner_radius=10, border_width=1)
+        self.diagnostics_frame.grid(row=4, column=0, padx=20, pady=10, sticky="ew")
+        self.diagnostics_frame.grid_columnconfigure((0, 1, 2, 3), weight=1)
+        
+        # Diagnostics title
+        self.diagnostics_title = ctk.CTkLabel(
+            self.diagnostics_frame, text="Diagnostics",
+            font=ctk.CTkFont(size=16, weight="bold")
+        )
+        self.diagnostics_title.grid(row=0, column=0, columnspan=4, padx=10, pady=(10, 5), sticky="w")
+        
+        # Metrics table
+        self.diagnostics_text = ctk.CTkTextbox(
+            self.diagnostics_frame, height=220, wrap="none",
+            font=ctk.CTkFont(family="Courier", size=12)
+        )
+        self.diagnostics_text.grid(row=1, column=0, columnspan=4, padx=10, pady=5, sticky="ew")
+        self.diagnostics_text.configure(state="disabled")
+        
+        # Diagnostics buttons
+        self.refresh_diagnostics_button = ctk.CTkButton(
+            self.diagnostics_frame, text="Refresh",
+            command=self.update_diagnostics
+        )
+        self.refresh_diagnostics_button.grid(row=2, column=0, padx=5, pady=10)
+        
+        self.export_prometheus_button = ctk.CTkButton(
+            self.diagnostics_frame, text="Export Prometheus",
+            command=lambda: self.export_metrics("prometheus")
+        )
+        self.export_prometheus_button.grid(row=2, column=1, padx=5, pady=10)
+        
+        self.export_json_button = ctk.CTkButton(
+            self.diagnostics_frame, text="Export JSON Lines",
+            command=lambda: self.export_metrics("jsonl")
+        )
+        self.export_json_button.grid(row=2, column=2, padx=5, pady=10)
+        
+        self.reset_metrics_button = ctk.CTkButton(
+            self.diagnostics_frame, text="Reset",
+            command=self.reset_metrics
+        )
+        self.reset_metrics_button.grid(row=2, column=3, padx=5, pady=10)
+        
+        # Export status
+        self.diagnostics_status_label = ctk.CTkLabel(self.diagnostics_frame, text="", text_color="gray")
+        self.diagnostics_status_label.grid(row=3, column=0, columnspan=4, padx=10, pady=(0, 10), sticky="w")
+        
         # About frame with improved styling
         self.about_frame = ctk.CTkFrame(self.settings_scrollable, corner_radius=10, border_width=1)
-        self.about_frame.grid(row=3, column=0, padx=20, pady=20, sticky="ew")
+        self.about_frame.grid(row=5, column=0, padx=20, pady=20, sticky="ew")
         self.about_frame.grid_columnconfigure(0, weight=1)
         
         # About label with improved styling
@@ -1055,6 +1990,8 @@ class App(ctk.CTk):
         self.generate_button.configure(state="disabled")
         self.result_text.delete("0.0", "end")
         self.result_text.insert("0.0", "Generating excuse...")
+        self.excuse_failed = False
+        self.excuse_history_index = None
         
         # Get input values
         context = self.context_var.get()
@@ -1063,36 +2000,152 @@ class App(ctk.CTk):
         formality = self.formality_var.get()
         urgency = self.urgency_var.get()
         language = self.language_var.get()
-        
-        # Start thread
-        thread = threading.Thread(
-            target=self.generate_excuse_task,
-            args=(context, context_details, audience, formality, urgency, language)
+        use_cache = self.reuse_excuse_var.get()
+        self.candidates_frame.grid_remove()
+        candidate_count = int(self.candidate_count_var.get())
+        if candidate_count > 1:
+            self.generate_candidates(context, context_details, audience, formality, urgency, language, candidate_count)
+            return
+        writer = self.start_stream("excuse", self.result_text)
+        translation_writer = None
+        if language != "English" and writer.streaming and PIPELINE_TRANSLATION:
+            self.translation_text.delete("0.0", "end")
+            self.translation_text.insert("0.0", "Translating...")
+            translation_writer = self.start_stream("translation", self.translation_text)
+        
+        # Run on the engine, a newer excuse request supersedes an older one
+        self.run_in_engine(
+            "excuse", self.generate_excuse_task,
+            (context, context_details, audience, formality, urgency, language, use_cache, writer, translation_writer),
+            on_result=lambda result: self.update_excuse_result(*result),
+            on_error=lambda e: self.update_excuse_result(self.format_error(e), self.format_error(e), language)
         )
-        thread.daemon = True
-        thread.start()
     
-    def generate_excuse_task(self, context, context_details, audience, formality, urgency, language):
-        try:
-            # Generate excuse in English
-            original_excuse = self.excuse_generator.generate_excuse(f"{context}: {context_details}", audience, formality, urgency)
+    def generate_candidates(self, context, context_details, audience, formality, urgency, language, count):
+        start = time.perf_counter()
+        context = f"{context}: {context_details}"
+        # Streamed writers of an earlier request would report their timing over this one
+        for key in ("excuse", "translation"):
+            if key in self.stream_writers:
+                self.stream_writers.pop(key).close()
+        
+        def on_result(candidates):
+            self.result_timing_label.configure(text=f"{count} options in {time.perf_counter() - start:.1f}s")
+            self.show_candidates(candidates, context, audience, language)
+        
+        self.run_in_engine(
+            "excuse", self.excuse_generator.generate_excuse_candidates,
+            (context, audience, formality, urgency, count),
+            on_result=on_result,
+            on_error=lambda e: self.update_excuse_result(self.format_error(e), self.format_error(e), language)
+        )
+    
+    def show_candidates(self, candidates, context, audience, language):
+        if is_error_text(candidates):
+            self.update_excuse_result(candidates, candidates, language)
+            return
+        self.generate_button.configure(state="normal")
+        # Nothing is saved or rated until an option is picked
+        self.excuse_failed = True
+        self.result_text.delete("0.0", "end")
+        self.result_text.insert("0.0", "Pick one of the options below.")
+        
+        for child in self.candidates_frame.winfo_children():
+            child.destroy()
+        for column, candidate in enumerate(candidates):
+            self.candidates_frame.grid_columnconfigure(column, weight=1, uniform="candidates")
+            option_frame = ctk.CTkFrame(self.candidates_frame, corner_radius=8, border_width=1)
+            option_frame.grid(row=0, column=column, padx=5, pady=5, sticky="nsew")
+            option_frame.grid_columnconfigure(0, weight=1)
             
-            # Store the original excuse
-            translated_excuse = ""
+            ctk.CTkLabel(
+                option_frame, text=f"Option {column + 1}  ({candidate['score']:.0%})",
+                font=ctk.CTkFont(weight="bold")
+            ).grid(row=0, column=0, padx=5, pady=(5, 0), sticky="w")
             
-            # Translate if needed
-            if language != "English":
-                translated_excuse = self.excuse_generator.translate_excuse(original_excuse, language)
-            else:
-                translated_excuse = "No translation needed for English"
+            details = f"Length {candidate['length']:.0%}  Tone {candidate['formality']:.0%}"
+            if "similarity" in candidate:
+                details += f"  Match {candidate['similarity']:.0%}"
+            ctk.CTkLabel(option_frame, text=details, text_color="gray").grid(row=1, column=0, padx=5, sticky="w")
             
-            # Update UI in main thread
-            self.after(0, lambda: self.update_excuse_result(original_excuse, translated_excuse, language))
-        except Exception as e:
-            error_message = f"Error: {str(e)}"
-            self.after(0, lambda: self.update_excuse_result(error_message, error_message, language))
+            option_text = ctk.CTkTextbox(option_frame, height=160, wrap="word")
+            option_text.grid(row=2, column=0, padx=5, pady=5, sticky="ew")
+            option_text.insert("0.0", candidate["excuse"])
+            option_text.configure(state="disabled")
+            
+            ctk.CTkButton(
+                option_frame, text="Use This",
+                command=lambda excuse=candidate["excuse"]: self.use_candidate(excuse, context, audience, language)
+            ).grid(row=3, column=0, padx=5, pady=(0, 5))
+        self.candidates_frame.grid()
     
-    def update_excuse_result(self, original_excuse, translated_excuse, language):
+    def use_candidate(self, excuse, context, audience, language):
+        self.candidates_frame.grid_remove()
+        self.generate_button.configure(state="disabled")
+        self.result_text.delete("0.0", "end")
+        self.result_text.insert("0.0", excuse)
+        if language != "English":
+            self.translation_text.delete("0.0", "end")
+            self.translation_text.insert("0.0", "Translating...")
+        self.run_in_engine(
+            "excuse", self.use_candidate_task, (excuse, context, audience, language),
+            on_result=lambda result: self.update_excuse_result(*result),
+            on_error=lambda e: self.update_excuse_result(excuse, self.format_error(e), language)
+        )
+    
+    @instrument("App.use_candidate_task")
+    def use_candidate_task(self, excuse, context, audience, language):
+        index = self.excuse_generator.record_excuse(excuse, context, audience)
+        if language == "English":
+            return excuse, "No translation needed for English", language, index
+        return excuse, self.excuse_generator.translate_excuse(excuse, language), language, index
+    
+    @instrument("App.generate_excuse_task")
+    def generate_excuse_task(self, context, context_details, audience, formality, urgency, language, use_cache=False,
+                             writer=None, translation_writer=None):
+        on_chunk = self.stream_callback(writer)
+        pipeline = None
+        if translation_writer is not None:
+            # Pipelined mode: completed sentences are translated while the rest is generated
+            pipeline = self.excuse_generator.start_pipelined_translation(language, translation_writer.feed)
+            stream_chunk = on_chunk
+            
+            def on_chunk(chunk):
+                stream_chunk(chunk)
+                pipeline.feed(chunk)
+        
+        # Generate excuse in English
+        original_excuse, index = self.excuse_generator.generate_excuse_entry(
+            f"{context}: {context_details}", audience, formality, urgency,
+            use_cache=use_cache, on_chunk=on_chunk
+        )
+        
+        # Translate if needed
+        if language == "English":
+            translated_excuse = "No translation needed for English"
+        elif pipeline is not None:
+            translated_excuse = pipeline.finish()
+            if is_error_text(original_excuse):
+                translated_excuse = original_excuse
+            elif pipeline.errors:
+                # Failed sentences were left in English, say so rather than pass it off as translated
+                error = pipeline.errors[0]
+                translated_excuse = ErrorResult(
+                    f"Error translating {len(pipeline.errors)} of {pipeline.sentences} sentences "
+                    f"(left in English): {error}\n\n{translated_excuse}", error
+                )
+        elif is_error_text(original_excuse):
+            translated_excuse = original_excuse
+        else:
+            translated_excuse = self.excuse_generator.translate_excuse(original_excuse, language)
+        
+        return original_excuse, translated_excuse, language, index
+    
+    def update_excuse_result(self, original_excuse, translated_excuse, language, history_index=None):
+        # A failed request shows its error text but must not be saved or rated
+        self.excuse_failed = is_error_text(original_excuse)
+        self.excuse_history_index = None if self.excuse_failed else history_index
+        
         # Update original excuse text
         self.result_text.delete("0.0", "end")
         self.result_text.insert("0.0", original_excuse)
@@ -1108,6 +2161,9 @@ class App(ctk.CTk):
         
         # Re-enable generate button
         self.generate_button.configure(state="normal")
+        self.show_timing("excuse", self.result_timing_label)
+        if "translation" in self.stream_writers:
+            self.stream_writers.pop("translation").finish()
     
     def generate_proof_thread(self):
         # Disable generate button
@@ -1119,28 +2175,87 @@ class App(ctk.CTk):
         proof_type = self.proof_type_var.get()
         proof_details = self.proof_details.get("0.0", "end-1c")
         
-        # Start thread
-        thread = threading.Thread(
-            target=self.generate_proof_task,
-            args=(proof_type, proof_details)
+        writer = self.start_stream("proof", self.proof_result_text)
+        
+        self.run_in_engine(
+            "proof", self.generate_proof_task, (proof_type, proof_details, writer),
+            on_result=self.update_proof_result,
+            on_error=lambda e: self.update_proof_result(self.format_error(e))
         )
-        thread.daemon = True
-        thread.start()
     
-    def generate_proof_task(self, proof_type, proof_details):
-        try:
-            # Generate proof
-            proof = self.excuse_generator.generate_proof(proof_type, proof_details)
-            
-            # Update UI in main thread
-            self.after(0, lambda: self.update_proof_result(proof))
-        except Exception as e:
-            self.after(0, lambda: self.update_proof_result(f"Error: {str(e)}"))
+    @instrument("App.generate_proof_task")
+    def generate_proof_task(self, proof_type, proof_details, writer=None):
+        # Generate proof
+        return self.excuse_generator.generate_proof(
+            proof_type, proof_details, on_chunk=self.stream_callback(writer)
+        )
+    
+    def translate_to_many(self):
+        excuse = self.result_text.get("0.0", "end-1c")
+        languages = [language for language, var in self.multi_language_vars.items() if var.get()]
+        if not excuse or excuse == "Generating excuse..." or self.excuse_failed or not languages:
+            self.multi_translation_timing_label.configure(text="Generate an excuse and pick languages first")
+            return
+        
+        # Fresh tabs for this request, filled in as each translation finishes
+        if self.multi_translation_tabview is not None:
+            self.multi_translation_tabview.destroy()
+        self.multi_translation_tabview = ctk.CTkTabview(self.multi_translation_frame, height=220)
+        self.multi_translation_tabview.grid(row=4, column=0, padx=10, pady=5, sticky="ew")
+        self.multi_translation_texts = {}
+        for language in languages:
+            tab = self.multi_translation_tabview.add(language)
+            tab.grid_columnconfigure(0, weight=1)
+            textbox = ctk.CTkTextbox(tab, height=150, wrap="word")
+            textbox.grid(row=0, column=0, padx=5, pady=5, sticky="ew")
+            textbox.insert("0.0", "Translating...")
+            self.multi_translation_texts[language] = textbox
+        
+        self.multi_translate_button.configure(state="disabled")
+        self.multi_translation_timing_label.configure(text="")
+        start = time.perf_counter()
+        self.run_in_engine(
+            "multi_translation", self.excuse_generator.translate_excuse_many,
+            (excuse, languages, lambda language, text: self.dispatcher.call(self.show_translation_tab, language, text)),
+            on_result=lambda results: self.on_translate_to_many_done(results, start),
+            on_error=lambda e: self.on_translate_to_many_done({}, start, e)
+        )
+    
+    def show_translation_tab(self, language, translation):
+        textbox = self.multi_translation_texts.get(language)
+        if textbox is not None:
+            textbox.delete("0.0", "end")
+            textbox.insert("0.0", translation)
+    
+    def on_translate_to_many_done(self, results, start, error=None):
+        self.multi_translate_button.configure(state="normal")
+        if error is not None:
+            self.multi_translation_timing_label.configure(text=self.format_error(error))
+            return
+        failed = sum(1 for translation in results.values() if is_error_text(translation))
+        text = f"{len(results)} languages in {time.perf_counter() - start:.1f}s"
+        if failed:
+            text += f", {failed} failed"
+        self.multi_translation_timing_label.configure(text=text)
     
     def update_proof_result(self, proof):
+        self.proof_failed = is_error_text(proof)
         self.proof_result_text.delete("0.0", "end")
         self.proof_result_text.insert("0.0", proof)
         self.generate_proof_button.configure(state="normal")
+        self.show_timing("proof", self.proof_timing_label)
+    
+    def export_proof(self, fmt):
+        proof = self.proof_result_text.get("0.0", "end-1c").strip()
+        if not proof or self.proof_failed or proof == "Generating proof...":
+            self.proof_export_label.configure(text="Generate a proof first")
+            return
+        self.proof_export_label.configure(text=f"Rendering {fmt.upper()}...")
+        self.run_in_engine(
+            "proof_export", self.excuse_generator.render_proof, (proof, self.proof_type_var.get(), fmt),
+            on_result=lambda path: self.proof_export_label.configure(text=f"Saved to {path}"),
+            on_error=lambda e: self.proof_export_label.configure(text=self.format_error(e))
+        )
     
     def generate_emergency_thread(self):
         # Disable generate button
@@ -1152,28 +2267,26 @@ class App(ctk.CTk):
         emergency_type = self.emergency_type_var.get()
         recipient = self.recipient_entry.get()
         
-        # Start thread
-        thread = threading.Thread(
-            target=self.generate_emergency_task,
-            args=(emergency_type, recipient)
+        writer = self.start_stream("emergency", self.emergency_result_text)
+        
+        self.run_in_engine(
+            "emergency", self.generate_emergency_task, (emergency_type, recipient, writer),
+            on_result=self.update_emergency_result,
+            on_error=lambda e: self.update_emergency_result(self.format_error(e))
         )
-        thread.daemon = True
-        thread.start()
     
-    def generate_emergency_task(self, emergency_type, recipient):
-        try:
-            # Generate emergency message
-            message = self.excuse_generator.generate_emergency_message(emergency_type, recipient)
-            
-            # Update UI in main thread
-            self.after(0, lambda: self.update_emergency_result(message))
-        except Exception as e:
-            self.after(0, lambda: self.update_emergency_result(f"Error: {str(e)}"))
+    @instrument("App.generate_emergency_task")
+    def generate_emergency_task(self, emergency_type, recipient, writer=None):
+        # Generate emergency message
+        return self.excuse_generator.generate_emergency_message(
+            emergency_type, recipient, on_chunk=self.stream_callback(writer)
+        )
     
     def update_emergency_result(self, message):
         self.emergency_result_text.delete("0.0", "end")
         self.emergency_result_text.insert("0.0", message)
         self.generate_emergency_button.configure(state="normal")
+        self.show_timing("emergency", self.emergency_timing_label)
     
     def generate_apology_thread(self):
         # Disable generate button
@@ -1185,44 +2298,96 @@ class App(ctk.CTk):
         situation = self.situation_text.get("0.0", "end-1c")
         formality = self.apology_formality_var.get()
         
-        # Start thread
-        thread = threading.Thread(
-            target=self.generate_apology_task,
-            args=(situation, formality)
+        writer = self.start_stream("apology", self.apology_result_text)
+        
+        self.run_in_engine(
+            "apology", self.generate_apology_task, (situation, formality, writer),
+            on_result=self.update_apology_result,
+            on_error=lambda e: self.update_apology_result(self.format_error(e))
         )
-        thread.daemon = True
-        thread.start()
     
-    def generate_apology_task(self, situation, formality):
-        try:
-            # Generate apology
-            apology = self.excuse_generator.generate_apology(situation, formality)
-            
-            # Update UI in main thread
-            self.after(0, lambda: self.update_apology_result(apology))
-        except Exception as e:
-            self.after(0, lambda: self.update_apology_result(f"Error: {str(e)}"))
+    @instrument("App.generate_apology_task")
+    def generate_apology_task(self, situation, formality, writer=None):
+        # Generate apology
+        return self.excuse_generator.generate_apology(
+            situation, formality, on_chunk=self.stream_callback(writer)
+        )
     
     def update_apology_result(self, apology):
         self.apology_result_text.delete("0.0", "end")
         self.apology_result_text.insert("0.0", apology)
         self.generate_apology_button.configure(state="normal")
+        self.show_timing("apology", self.apology_timing_label)
+    
+    def start_stream(self, key, textbox):
+        # A new request closes the writer of the one it supersedes
+        previous = self.stream_writers.get(key)
+        if previous is not None:
+            previous.close()
+        writer = StreamWriter(self.dispatcher, textbox, streaming=self.stream_responses_var.get())
+        self.stream_writers[key] = writer
+        return writer
+    
+    def stream_callback(self, writer):
+        # Called on the worker thread, so only look at the writer, not Tk variables
+        if writer is None or not writer.streaming:
+            return None
+        return writer.feed
+    
+    def show_timing(self, key, label):
+        writer = self.stream_writers.get(key)
+        if writer is not None:
+            writer.finish()
+            label.configure(text=writer.timing_text())
+    
+    def run_in_engine(self, key, task, args, on_result, on_error, timeout=DEFAULT_TIMEOUT):
+        # Submit a blocking task to the engine and deliver its outcome on the Tk thread
+        try:
+            future = self.engine.submit(task, *args, key=key, timeout=timeout)
+        except EngineBusyError as e:
+            on_error(e)
+            return None
+        return self.dispatcher.watch(future, on_result, on_error)
+    
+    def format_error(self, error):
+        if isinstance(error, TimeoutError):
+            return ErrorResult(f"Error: request timed out after {REQUEST_TIMEOUT:.0f} seconds", error)
+        return ErrorResult(f"Error: {str(error)}", error)
     
     def voice_input(self):
-        # Start thread for voice input
-        thread = threading.Thread(target=self.voice_input_task)
-        thread.daemon = True
-        thread.start()
+        # A second click ends the dictation
+        if self.listening:
+            self.excuse_generator.stop_listening()
+            return
+        self.listening = True
+        self.voice_input_button.configure(text="Stop Listening")
+        # Listening runs until silence, so no timeout
+        self.run_in_engine(
+            "voice", self.voice_input_task, (),
+            on_result=self.on_voice_input_done,
+            on_error=lambda e: self.on_voice_input_done(self.format_error(e)),
+            timeout=None
+        )
     
+    def on_voice_input_done(self, text):
+        self.listening = False
+        self.voice_input_button.configure(text="Voice Input")
+        # Recognized text has already been inserted piece by piece; errors go to the console
+        if is_error_text(text):
+            print(text)
+    
+    def insert_voice_text(self, text):
+        existing = self.context_details.get("0.0", "end-1c")
+        if existing and not existing[-1].isspace():
+            text = " " + text
+        self.context_details.insert("end", text)
+    
+    @instrument("App.voice_input_task")
     def voice_input_task(self):
-        try:
-            # Get voice input
-            text = self.excuse_generator.voice_to_text()
-            
-            # Update UI in main thread
-            self.after(0, lambda: self.context_details.insert("end", text))
-        except Exception as e:
-            print(f"Error in voice input: {e}")
+        # Each recognized segment is inserted on the Tk thread as soon as it is ready
+        return self.excuse_generator.voice_to_text(
+            on_partial=lambda text: self.dispatcher.call(self.insert_voice_text, text)
+        )
     
     def copy_to_clipboard(self, textbox=None):
         if textbox is None:
@@ -1239,17 +2404,14 @@ class App(ctk.CTk):
             
         text = textbox.get("0.0", "end-1c")
         if text and text != "Generating excuse..." and text != "No translation needed for English":
-            # Start thread for speech synthesis
-            thread = threading.Thread(target=self.speak_excuse_task, args=(text,))
-            thread.daemon = True
-            thread.start()
-            
-    def speak_excuse_task(self, text):
-        try:
-            # Use text-to-speech to speak the excuse
-            self.excuse_generator.text_to_speech(text)
-        except Exception as e:
-            print(f"Error in speak excuse: {e}")
+            # Queued on the speech worker; speaking again cuts off the previous text
+            future = self.excuse_generator.speak(text)
+            future.add_done_callback(
+                lambda f: f.exception() and print(f"Error in speak excuse: {f.exception()}")
+            )
+    
+    def stop_speaking(self, event=None):
+        self.excuse_generator.stop_speaking()
     
     def save_to_favorites(self):
         original_excuse = self.result_text.get("0.0", "end-1c")
@@ -1258,9 +2420,9 @@ class App(ctk.CTk):
         context = self.context_var.get()
         audience = self.audience_var.get()
         
-        if original_excuse and original_excuse != "Generating excuse...":
+        if original_excuse and original_excuse != "Generating excuse..." and not self.excuse_failed:
             # Add to favorites
-            self.excuse_generator.add_to_favorites({
+            added = self.excuse_generator.add_to_favorites({
                 "excuse": original_excuse,
                 "translation": translated_excuse if translated_excuse != "No translation needed for English" else "",
                 "language": language,
@@ -1268,66 +2430,96 @@ class App(ctk.CTk):
                 "audience": audience,
                 "timestamp": datetime.datetime.now().isoformat()
             })
+            self.flash_button(self.save_button, "Saved!" if added else "Already in Favorites")
+            if added:
+                self.excuse_generator.prerender_speech([original_excuse])
+    
+    def flash_button(self, button, text, duration=1500):
+        # Show feedback on the button itself, then restore its label
+        default_text = button.cget("text")
+        button.configure(text=text, state="disabled")
+        self.after(duration, lambda: button.configure(text=default_text, state="normal"))
     
     def rate_excuse(self, value):
-        # Get the current excuse from history (most recent)
-        if self.excuse_generator.history:
-            latest_excuse = self.excuse_generator.history[-1]
-            latest_excuse["effectiveness"] = int(value)
-            self.excuse_generator.save_history()
+        # Rate the entry of the excuse on screen; one reused from the cache has none
+        if self.excuse_history_index is not None:
+            self.excuse_generator.rate_excuse(self.excuse_history_index, int(value))
     
     def refresh_history(self):
-        # Clear existing items
-        for widget in self.history_list_frame.winfo_children():
-            widget.destroy()
-        
-        for widget in self.favorites_list_frame.winfo_children():
-            widget.destroy()
-        
         # Reload data
-        self.excuse_generator.history = self.excuse_generator.load_history()
         self.excuse_generator.favorites = self.excuse_generator.load_favorites()
         
-        # Populate history
-        for i, item in enumerate(reversed(self.excuse_generator.history)):
-            self.add_history_item(i, item)
+        if self.search_var.get().strip():
+            self.run_search()
+            return
         
-        # Populate favorites
-        for i, item in enumerate(reversed(self.excuse_generator.favorites)):
-            self.add_favorite_item(i, item)
+        # History only grows, so just pick up the new entries; favorites can shrink
+        self.history_list.refresh()
+        self.favorites_list.refresh(full=True)
+    
+    def schedule_search(self, event=None):
+        # Wait for a short pause in typing before querying
+        if self.search_after_id is not None:
+            self.after_cancel(self.search_after_id)
+        self.search_after_id = self.after(150, self.run_search)
+    
+    def run_search(self):
+        self.search_after_id = None
+        query = self.search_var.get().strip()
+        if query:
+            self.history_matches = self.excuse_generator.search_history(query)
+            self.favorite_matches = self.excuse_generator.search_favorites(query)
+        else:
+            self.history_matches = None
+            self.favorite_matches = None
+        self.history_list.offset = 0
+        self.favorites_list.offset = 0
+        self.history_list.refresh(full=True)
+        self.favorites_list.refresh(full=True)
+    
+    def fetch_history(self, offset, limit):
+        if self.history_matches is None:
+            return self.excuse_generator.query_history(newest_first=True, limit=limit, offset=offset)
+        return self.excuse_generator.get_history_entries(self.history_matches[offset:offset + limit])
+    
+    def count_history(self):
+        if self.history_matches is None:
+            return self.excuse_generator.history_count()
+        return len(self.history_matches)
     
-    def add_history_item(self, index, item):
-        frame = ctk.CTkFrame(self.history_list_frame)
-        frame.grid(row=index, column=0, padx=5, pady=5, sticky="ew")
+    def fetch_favorites(self, offset, limit):
+        favorites = self.excuse_generator.favorites
+        if self.favorite_matches is None:
+            newest_first = favorites[::-1]
+            return newest_first[offset:offset + limit]
+        return [favorites[i] for i in self.favorite_matches[offset:offset + limit] if i < len(favorites)]
+    
+    def count_favorites(self):
+        if self.favorite_matches is None:
+            return len(self.excuse_generator.favorites)
+        return len(self.favorite_matches)
+    
+    def create_history_row(self, parent):
+        frame = ctk.CTkFrame(parent)
         frame.grid_columnconfigure(0, weight=1)
         
         # Context and audience
-        header = f"{item.get('context', 'Unknown')} - {item.get('audience', 'Unknown')}"
-        header_label = ctk.CTkLabel(frame, text=header, font=ctk.CTkFont(weight="bold"))
+        header_label = ctk.CTkLabel(frame, text="", font=ctk.CTkFont(weight="bold"))
         header_label.grid(row=0, column=0, padx=5, pady=2, sticky="w")
         
         # Timestamp
-        timestamp = item.get('timestamp', '')
-        if timestamp:
-            try:
-                dt = datetime.datetime.fromisoformat(timestamp)
-                timestamp = dt.strftime("%Y-%m-%d %H:%M")
-            except:
-                pass
-        
-        time_label = ctk.CTkLabel(frame, text=timestamp)
+        time_label = ctk.CTkLabel(frame, text="")
         time_label.grid(row=0, column=1, padx=5, pady=2, sticky="e")
         
         # Excuse text
         excuse_text = ctk.CTkTextbox(frame, height=60, wrap="word")
         excuse_text.grid(row=1, column=0, columnspan=2, padx=5, pady=2, sticky="ew")
-        excuse_text.insert("0.0", item.get('excuse', ''))
         excuse_text.configure(state="disabled")
         
         # Buttons frame
         buttons_frame = ctk.CTkFrame(frame)
         buttons_frame.grid(row=2, column=0, columnspan=2, padx=5, pady=2, sticky="ew")
-        buttons_frame.grid_columnconfigure((0, 1), weight=1)
+        buttons_frame.grid_columnconfigure((0, 1, 2), weight=1)
         
         # Copy button
         copy_btn = ctk.CTkButton(
@@ -1336,47 +2528,104 @@ class App(ctk.CTk):
         )
         copy_btn.grid(row=0, column=0, padx=5, pady=2, sticky="w")
         
-        # Add to favorites button
-        fav_btn = ctk.CTkButton(
-            buttons_frame, text="Add to Favorites",
-            command=lambda i=item: self.excuse_generator.add_to_favorites(i)
+        # Speak button, cached audio makes repeat playback instant
+        speak_btn = ctk.CTkButton(
+            buttons_frame, text="Speak",
+            command=lambda t=excuse_text: self.speak_excuse(t)
+        )
+        speak_btn.grid(row=0, column=1, padx=5, pady=2)
+        
+        # Add to favorites button, its command is set when the row is bound
+        fav_btn = ctk.CTkButton(buttons_frame, text="Add to Favorites")
+        fav_btn.grid(row=0, column=2, padx=5, pady=2, sticky="e")
+        
+        return {
+            "frame": frame,
+            "header": header_label,
+            "time": time_label,
+            "text": excuse_text,
+            "action": fav_btn
+        }
+    
+    def bind_history_row(self, row, item, index):
+        row["header"].configure(text=self.format_row_header(item))
+        row["time"].configure(text=self.format_timestamp(item.get('timestamp', '')))
+        self.set_row_text(row["text"], item.get('excuse', ''))
+        row["action"].configure(
+            text="Add to Favorites", state="normal",
+            command=lambda r=row, i=item: self.add_history_to_favorites(r, i)
         )
-        fav_btn.grid(row=0, column=1, padx=5, pady=2, sticky="e")
     
-    def add_favorite_item(self, index, item):
-        frame = ctk.CTkFrame(self.favorites_list_frame)
-        frame.grid(row=index, column=0, padx=5, pady=5, sticky="ew")
-        frame.grid_columnconfigure(0, weight=1)
-        
-        # Context and audience
+    def add_history_to_favorites(self, row, item):
+        added = self.excuse_generator.add_to_favorites(item)
+        # The row may be rebound to another item later, so this label is not restored
+        row["action"].configure(text="Added to Favorites" if added else "Already in Favorites", state="disabled")
+        if added:
+            self.favorites_list.refresh(full=True)
+            self.excuse_generator.prerender_speech([item.get("excuse")])
+    
+    def format_row_header(self, item):
         header = f"{item.get('context', 'Unknown')} - {item.get('audience', 'Unknown')}"
-        header_label = ctk.CTkLabel(frame, text=header, font=ctk.CTkFont(weight="bold"))
-        header_label.grid(row=0, column=0, padx=5, pady=2, sticky="w")
-        
-        # Excuse text
-        excuse_text = ctk.CTkTextbox(frame, height=60, wrap="word")
-        excuse_text.grid(row=1, column=0, columnspan=2, padx=5, pady=2, sticky="ew")
-        excuse_text.insert("0.0", item.get('excuse', ''))
-        excuse_text.configure(state="disabled")
-        
-        # Buttons frame
-        buttons_frame = ctk.CTkFrame(frame)
-        buttons_frame.grid(row=2, column=0, columnspan=2, padx=5, pady=2, sticky="ew")
-        buttons_frame.grid_columnconfigure((0, 1), weight=1)
-        
-        # Copy button
-        copy_btn = ctk.CTkButton(
-            buttons_frame, text="Copy",
-            command=lambda t=excuse_text: self.copy_to_clipboard(t)
+        if item.get("duplicates"):
+            header += f" (x{item['duplicates'] + 1})"
+        elif item.get("duplicate_of") is not None:
+            header += " (similar to an earlier excuse)"
+        return header
+    
+    def create_favorite_row(self, parent):
+        row = self.create_history_row(parent)
+        row["action"].configure(text="Remove")
+        return row
+    
+    def bind_favorite_row(self, row, item, index):
+        row["header"].configure(text=self.format_row_header(item))
+        row["time"].configure(text=self.format_timestamp(item.get('timestamp', '')))
+        self.set_row_text(row["text"], item.get('excuse', ''))
+        # The list is newest first, favorites are stored oldest first
+        if self.favorite_matches is None:
+            favorite_index = len(self.excuse_generator.favorites) - 1 - index
+        else:
+            favorite_index = self.favorite_matches[index]
+        row["action"].configure(command=lambda i=favorite_index: self.remove_favorite(i))
+    
+    def set_row_text(self, textbox, text):
+        textbox.configure(state="normal")
+        textbox.delete("0.0", "end")
+        textbox.insert("0.0", text)
+        textbox.configure(state="disabled")
+    
+    def format_timestamp(self, timestamp):
+        if timestamp:
+            try:
+                dt = datetime.datetime.fromisoformat(timestamp)
+                timestamp = dt.strftime("%Y-%m-%d %H:%M")
+            except ValueError:
+                pass
+        return timestamp
+    
+    def merge_duplicates(self):
+        self.merge_duplicates_button.configure(text="Merging...", state="disabled")
+        self.run_in_engine(
+            "dedup", self.excuse_generator.compact_duplicates, (),
+            self.on_duplicates_merged, self.on_duplicates_merge_error, timeout=None
         )
-        copy_btn.grid(row=0, column=0, padx=5, pady=2, sticky="w")
-        
-        # Remove from favorites button
-        remove_btn = ctk.CTkButton(
-            buttons_frame, text="Remove",
-            command=lambda i=index: self.remove_favorite(i)
+    
+    def on_duplicates_merged(self, removed):
+        removed_history, removed_favorites = removed
+        self.merge_duplicates_button.configure(text="Merge Duplicates", state="normal")
+        if removed_history:
+            # The excuse on screen may have moved or been merged away
+            self.excuse_history_index = None
+        # Positions changed, so rerun the search (or reset the lists) from the top
+        self.run_search()
+        self.flash_button(
+            self.merge_duplicates_button,
+            f"Merged {removed_history} + {removed_favorites}" if removed_history or removed_favorites else "No duplicates"
         )
-        remove_btn.grid(row=0, column=1, padx=5, pady=2, sticky="e")
+    
+    def on_duplicates_merge_error(self, error):
+        self.merge_duplicates_button.configure(text="Merge Duplicates", state="normal")
+        print(self.format_error(error))
     
     def remove_favorite(self, index):
         self.excuse_generator.remove_from_favorites(index)
@@ -1389,11 +2638,69 @@ class App(ctk.CTk):
         API_KEY = self.api_key_entry.get()
         MODEL_NAME = self.model_name_entry.get()
         
-        # Reconfigure Gemini API
-        genai.configure(api_key=API_KEY)
-        
-        # Reinitialize the excuse generator
-        self.excuse_generator = ExcuseGenerator()
+        # Only the model backend changes, it connects with the new key on first use
+        self.excuse_generator.configure_model(MODEL_NAME, API_KEY)
+    
+    def toggle_always_fresh(self):
+        self.excuse_generator.always_fresh = self.always_fresh_var.get()
+    
+    def clear_response_cache(self):
+        self.excuse_generator.response_cache.clear()
+        self.update_cache_stats()
+    
+    def update_cache_stats(self):
+        stats = self.excuse_generator.response_cache.stats()
+        self.cache_stats_label.configure(
+            text=f"{stats['disk_entries']} cached responses ({stats['disk_bytes'] // 1024} KB), "
+                 f"{stats['hits']} hits / {stats['misses']} misses this session"
+        )
+    
+    def update_diagnostics(self):
+        lines = [f"{'Method':<44}{'Calls':>7}{'Errors':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'Max ms':>10}"]
+        errors = {}
+        counters = []
+        for name, labels, value in REGISTRY.counter_values():
+            if name.endswith("errors_total") and "method" in labels:
+                errors[labels["method"]] = value
+            elif not name.endswith("calls_total"):
+                counters.append((name, labels, value))
+        
+        for name, labels, count, total, p50, p95, p99, maximum in REGISTRY.summary():
+            label = labels.get("method") or ", ".join(f"{k}={v}" for k, v in labels.items())
+            if not name.endswith("call_duration_seconds"):
+                label = f"{name.replace(REGISTRY.prefix, '', 1)} {label}".strip()
+            lines.append(
+                f"{label[:43]:<44}{count:>7}{errors.get(labels.get('method'), 0):>7}"
+                f"{p50 * 1000:>10.1f}{p95 * 1000:>10.1f}{p99 * 1000:>10.1f}{maximum * 1000:>10.1f}"
+            )
+        
+        if counters:
+            lines.append("")
+            for name, labels, value in counters:
+                label = ", ".join(f"{k}={v}" for k, v in labels.items())
+                lines.append(f"{name.replace(REGISTRY.prefix, '', 1)} {label}".strip() + f": {value}")
+        
+        self.set_row_text(self.diagnostics_text, "\n".join(lines))
+    
+    def export_metrics(self, fmt):
+        try:
+            if fmt == "prometheus":
+                path = data_dir / "metrics.prom"
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(REGISTRY.to_prometheus())
+            else:
+                # Appended, so successive exports build a time series
+                path = data_dir / "metrics.jsonl"
+                with open(path, "a", encoding="utf-8") as f:
+                    f.write(REGISTRY.to_json_lines())
+            self.diagnostics_status_label.configure(text=f"Exported to {path}")
+        except Exception as e:
+            self.diagnostics_status_label.configure(text=self.format_error(e))
+    
+    def reset_metrics(self):
+        REGISTRY.reset()
+        self.update_diagnostics()
+        self.diagnostics_status_label.configure(text="Metrics reset")
     
     def change_scaling_event(self, new_scaling):
         new_scaling_float = int(new_scaling.replace("%", "")) / 100
@@ -1427,5 +2734,17 @@ class App(ctk.CTk):
 
 
 if __name__ == "__main__":
+    # Headless bulk generation: python app.py batch scenarios.csv -o results.jsonl
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        sys.exit(batch.main(sys.argv[2:], ExcuseGenerator))
+    
+    # Merge near-duplicate excuses: python app.py dedup [--dry-run]
+    if len(sys.argv) > 1 and sys.argv[1] == "dedup":
+        dry_run = "--dry-run" in sys.argv[2:]
+        removed_history, removed_favorites = ExcuseGenerator().compact_duplicates(dry_run)
+        action = "Would merge" if dry_run else "Merged"
+        print(f"{action} {removed_history} duplicate history entries and {removed_favorites} duplicate favorites")
+        sys.exit(0)
+    
     app = App()
     app.mainloop()
\ No newline at end of file
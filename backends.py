@@ -0,0 +1,323 @@
+import time
+import random
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class BackendError(RuntimeError):
+    """Failure reported by a generation or translation backend.
+
+    kind is a short label such as "rate_limit", "server" or "timeout" so callers can
+    decide whether a retry makes sense.
+    """
+
+    def __init__(self, message, kind="server"):
+        super().__init__(message)
+        self.kind = kind
+
+
+class CandidatesUnsupportedError(BackendError):
+    """The model cannot return several candidates in one request"""
+
+    def __init__(self, name):
+        super().__init__(f"{name} does not support several candidates per request", "unsupported")
+
+
+class ModelBackend:
+    """Interface for text generation.
+
+    name identifies the model in cache keys, so responses from different backends
+    never answer for each other.
+    """
+
+    name = "model"
+
+    def generate(self, prompt, generation_config=None):
+        raise NotImplementedError
+
+    def stream(self, prompt, generation_config=None):
+        """Yield the response text chunk by chunk"""
+        yield self.generate(prompt, generation_config)
+
+    def generate_candidates(self, prompt, count, generation_config=None):
+        """Return up to count alternative responses to prompt.
+
+        By default the calls are made concurrently, so the wall time is about one call.
+        Failed calls are dropped; if all of them fail the first error is raised.
+        """
+        with ThreadPoolExecutor(max_workers=count) as pool:
+            futures = [pool.submit(self.generate, prompt, generation_config) for _ in range(count)]
+        texts = []
+        errors = []
+        for future in futures:
+            try:
+                texts.append(future.result())
+            except Exception as e:
+                errors.append(e)
+        if not texts and errors:
+            raise errors[0]
+        return texts
+
+
+class TranslationBackend:
+    """Interface for translation from English.
+
+    translator(language_code) returns an object with translate(text); instances are
+    kept and reused per language by a TranslatorPool.
+    """
+
+    name = "translation"
+
+    def translator(self, language_code):
+        raise NotImplementedError
+
+
+class GeminiBackend(ModelBackend):
+    """Google Gemini through google-generativeai, imported and configured on first use"""
+
+    def __init__(self, model_name, api_key):
+        self.name = model_name
+        self.api_key = api_key
+        # Cleared the first time the model refuses candidate_count
+        self.candidate_count_supported = True
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        with self._lock:
+            if self._model is None:
+                import google.generativeai as genai
+                genai.configure(api_key=self.api_key)
+                self._model = genai.GenerativeModel(self.name)
+            return self._model
+
+    def generate(self, prompt, generation_config=None):
+        kwargs = {"generation_config": generation_config} if generation_config else {}
+        return self.model.generate_content(prompt, **kwargs).text
+
+    def stream(self, prompt, generation_config=None):
+        kwargs = {"generation_config": generation_config} if generation_config else {}
+        for chunk in self.model.generate_content(prompt, stream=True, **kwargs):
+            try:
+                chunk_text = chunk.text
+            except ValueError:
+                # Chunks without text parts (e.g. only safety ratings)
+                continue
+            if chunk_text:
+                yield chunk_text
+
+    def generate_candidates(self, prompt, count, generation_config=None):
+        # One request with candidate_count; for models that only allow one candidate the
+        # caller fans out single requests instead, so each goes through its rate limiter
+        if not self.candidate_count_supported:
+            raise CandidatesUnsupportedError(self.name)
+        config = dict(generation_config or {}, candidate_count=count)
+        try:
+            response = self.model.generate_content(prompt, generation_config=config)
+        except Exception as e:
+            if type(e).__name__ != "InvalidArgument":
+                raise
+            self.candidate_count_supported = False
+            raise CandidatesUnsupportedError(self.name) from e
+        texts = []
+        for candidate in response.candidates:
+            text = "".join(getattr(part, "text", "") for part in candidate.content.parts)
+            if text:
+                texts.append(text)
+        return texts
+
+
+class GoogleTranslationBackend(TranslationBackend):
+    """Google Translate through deep_translator, imported on first use"""
+
+    name = "google"
+
+    def translator(self, language_code):
+        from deep_translator import GoogleTranslator
+        return GoogleTranslator(source="en", target=language_code)
+
+
+def parse_distribution(spec):
+    """Turn "fixed:0.5", "uniform:0.2:1.0", "normal:0.8:0.2", "lognormal:0.8:0.5"
+    (median, sigma) or "exponential:0.5" (mean) into a function rng -> seconds"""
+    name, _, params = str(spec).partition(":")
+    values = [float(v) for v in params.split(":") if v] if params else []
+    if name == "fixed":
+        return lambda rng: values[0] if values else 0.0
+    if name == "uniform":
+        low, high = values
+        return lambda rng: rng.uniform(low, high)
+    if name == "normal":
+        mean, stddev = values
+        return lambda rng: max(0.0, rng.gauss(mean, stddev))
+    if name == "lognormal":
+        median, sigma = values
+        return lambda rng: median * rng.lognormvariate(0, sigma)
+    if name == "exponential":
+        mean, = values
+        return lambda rng: rng.expovariate(1 / mean) if mean else 0.0
+    try:
+        # A bare number is a fixed latency
+        seconds = float(spec)
+    except ValueError:
+        raise ValueError(f"Unknown latency distribution: {spec}")
+    return lambda rng: seconds
+
+
+def parse_error_kinds(spec):
+    """Turn "rate_limit:3,server:1,timeout:1" into [(kind, weight), ...]"""
+    kinds = []
+    for part in str(spec).split(","):
+        kind, _, weight = part.strip().partition(":")
+        if kind:
+            kinds.append((kind, float(weight) if weight else 1.0))
+    return kinds
+
+
+class SimulatedService:
+    """Deterministic latency and failures shared by the local backends.
+
+    Every call draws from a random generator seeded by (seed, request text, how many
+    times that text was requested), so a run replays exactly with the same seed and
+    the same requests, whichever thread makes them.
+    """
+
+    def __init__(self, latency="fixed:0", error_rate=0.0, error_kinds="server", seed=0):
+        self.latency = parse_distribution(latency)
+        self.error_rate = error_rate
+        self.error_kinds = parse_error_kinds(error_kinds)
+        self.seed = seed
+        self.calls = 0
+        self.failures = 0
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def call_rng(self, text):
+        with self._lock:
+            count = self._counts.get(text, 0)
+            self._counts[text] = count + 1
+            self.calls += 1
+        digest = hashlib.sha256(f"{self.seed}:{count}:{text}".encode("utf-8")).hexdigest()
+        return random.Random(int(digest[:16], 16))
+
+    def delay_and_maybe_fail(self, rng, delay=None):
+        """Sleep for the sampled latency, then raise a BackendError at the configured rate"""
+        delay = self.latency(rng) if delay is None else delay
+        failed = rng.random() < self.error_rate
+        if failed and self.error_kinds:
+            kinds = [kind for kind, _ in self.error_kinds]
+            weights = [weight for _, weight in self.error_kinds]
+            kind = rng.choices(kinds, weights)[0]
+        else:
+            kind = "server"
+        if delay > 0:
+            time.sleep(delay)
+        if failed:
+            with self._lock:
+                self.failures += 1
+            raise BackendError(f"Simulated {kind} error", kind)
+
+    def stats(self):
+        with self._lock:
+            return {"calls": self.calls, "failures": self.failures}
+
+
+EXCUSE_SENTENCES = [
+    "I'm really sorry, but something unexpected came up this morning.",
+    "My car wouldn't start and the next bus was forty minutes late.",
+    "A family matter needed my attention and I couldn't step away.",
+    "I woke up feeling unwell and didn't want to risk passing it on.",
+    "There was a water leak in my building and I had to wait for the plumber.",
+    "My internet went down right before I was supposed to join.",
+    "I had an appointment that ran much longer than expected.",
+    "The train was cancelled and the replacement service was packed.",
+    "I misread the schedule and thought it was set for tomorrow.",
+    "My phone died and I only saw the messages just now.",
+    "I'll make sure to catch up on everything I missed today.",
+    "Thank you for understanding, it won't happen again.",
+]
+
+
+class LocalModelBackend(ModelBackend):
+    """Offline stand-in for the model, for load tests and profiling.
+
+    The same prompt always yields the same text. Latency and failures come from a
+    SimulatedService; streamed responses spread the latency over their chunks.
+    """
+
+    name = "local"
+
+    def __init__(self, latency="lognormal:0.8:0.4", error_rate=0.0, error_kinds="server", seed=0,
+                 sentences=(2, 4), chunk_words=4):
+        self.service = SimulatedService(latency, error_rate, error_kinds, seed)
+        self.sentences = sentences
+        self.chunk_words = chunk_words
+
+    def response_for(self, prompt, candidate=0):
+        variant = f"{prompt}#{candidate}" if candidate else prompt
+        digest = hashlib.sha256(f"{self.service.seed}:{variant}".encode("utf-8")).hexdigest()
+        rng = random.Random(int(digest[:16], 16))
+        count = rng.randint(*self.sentences)
+        return " ".join(rng.sample(EXCUSE_SENTENCES, count))
+
+    def generate(self, prompt, generation_config=None):
+        self.service.delay_and_maybe_fail(self.service.call_rng(prompt))
+        return self.response_for(prompt)
+
+    def generate_candidates(self, prompt, count, generation_config=None):
+        # Like a model returning several candidates: one latency, count different texts
+        self.service.delay_and_maybe_fail(self.service.call_rng(prompt))
+        return [self.response_for(prompt, candidate) for candidate in range(count)]
+
+    def stream(self, prompt, generation_config=None):
+        rng = self.service.call_rng(prompt)
+        words = self.response_for(prompt).split(" ")
+        chunks = [" ".join(words[i:i + self.chunk_words]) + " " for i in range(0, len(words), self.chunk_words)]
+        chunks[-1] = chunks[-1].rstrip()
+        total = self.service.latency(rng)
+        # Roughly a third of the time goes to the first chunk, the rest is spread evenly
+        self.service.delay_and_maybe_fail(rng, total / 3)
+        for chunk in chunks:
+            yield chunk
+            time.sleep(total * 2 / 3 / len(chunks))
+
+
+class LocalTranslator:
+    def __init__(self, service, language_code):
+        self.service = service
+        self.language_code = language_code
+
+    def translate(self, text):
+        self.service.delay_and_maybe_fail(self.service.call_rng(f"{self.language_code}:{text}"))
+        # Line by line, so callers that batch sentences one per line can match them up
+        return "\n".join(f"[{self.language_code}] {line}" if line.strip() else line for line in text.split("\n"))
+
+
+class LocalTranslationBackend(TranslationBackend):
+    """Offline stand-in for the translator: tags each line with the target language code"""
+
+    name = "local"
+
+    def __init__(self, latency="lognormal:0.2:0.4", error_rate=0.0, error_kinds="server", seed=0):
+        self.service = SimulatedService(latency, error_rate, error_kinds, seed)
+
+    def translator(self, language_code):
+        return LocalTranslator(self.service, language_code)
+
+
+def create_model_backend(name, model_name=None, api_key=None, **local_options):
+    if name == "gemini":
+        return GeminiBackend(model_name, api_key)
+    if name == "local":
+        return LocalModelBackend(**local_options)
+    raise ValueError(f"Unknown model backend: {name}")
+
+
+def create_translation_backend(name, **local_options):
+    if name == "google":
+        return GoogleTranslationBackend()
+    if name == "local":
+        return LocalTranslationBackend(**local_options)
+    raise ValueError(f"Unknown translation backend: {name}")
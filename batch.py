@@ -0,0 +1,210 @@
+import csv
+import sys
+import json
+import time
+import argparse
+import itertools
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from backends import LocalModelBackend, LocalTranslationBackend
+from resilience import ErrorResult
+
+
+# Same choices as the Generate Excuse page
+CONTEXTS = ["Work", "School", "Social", "Family", "Other"]
+AUDIENCES = ["Boss", "Teacher", "Friend", "Family", "Other"]
+FORMALITIES = ["Formal", "Casual", "Professional"]
+URGENCIES = ["Low", "Normal", "High", "Emergency"]
+
+SCENARIO_DEFAULTS = {
+    "context": "Work",
+    "details": "",
+    "audience": "Boss",
+    "formality": "Formal",
+    "urgency": "Normal",
+    "language": "English"
+}
+
+
+def scenario_grid(details="", language="English"):
+    """Every Context x Audience x Formality x Urgency combination"""
+    for context, audience, formality, urgency in itertools.product(CONTEXTS, AUDIENCES, FORMALITIES, URGENCIES):
+        yield {
+            "context": context,
+            "details": details,
+            "audience": audience,
+            "formality": formality,
+            "urgency": urgency,
+            "language": language
+        }
+
+
+def load_scenarios(path):
+    """Stream scenarios from a .csv (with a header row) or .jsonl file"""
+    path = Path(path)
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.suffix.lower() == ".csv":
+            rows = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+        for row in rows:
+            scenario = dict(SCENARIO_DEFAULTS)
+            scenario.update({k: v for k, v in row.items() if v not in (None, "")})
+            yield scenario
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class BatchRunner:
+    """Runs scenarios through an ExcuseGenerator on a bounded worker pool.
+
+    Results are written to a JSON Lines file as soon as each one finishes, so a
+    long run can be followed (or resumed from) while it is still going.
+    """
+
+    def __init__(self, generator, workers=4, use_cache=True, save_to_history=False, progress_every=50):
+        self.generator = generator
+        self.workers = workers
+        self.use_cache = use_cache
+        self.save_to_history = save_to_history
+        self.progress_every = progress_every
+        self._write_lock = threading.Lock()
+
+    def run_one(self, scenario):
+        start = time.perf_counter()
+        excuse = self.generator.generate_excuse(
+            f"{scenario['context']}: {scenario['details']}",
+            scenario["audience"], scenario["formality"], scenario["urgency"],
+            use_cache=self.use_cache, save_to_history=self.save_to_history
+        )
+        translation = ""
+        if scenario.get("language", "English") != "English" and not isinstance(excuse, ErrorResult):
+            translation = self.generator.translate_excuse(excuse, scenario["language"])
+        latency = time.perf_counter() - start
+        return dict(
+            scenario,
+            excuse=excuse,
+            translation=translation,
+            ok=not isinstance(excuse, ErrorResult) and not isinstance(translation, ErrorResult),
+            latency=latency
+        )
+
+    def run(self, scenarios, output_path, report=print):
+        output_path = Path(output_path)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        latencies = []
+        failures = 0
+        start = time.perf_counter()
+        scenarios = iter(scenarios)
+
+        with open(output_path, "w", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=self.workers) as pool:
+            pending = set()
+
+            def submit_more():
+                # Keep at most two items per worker queued so huge inputs are streamed, not preloaded
+                while len(pending) < self.workers * 2:
+                    scenario = next(scenarios, None)
+                    if scenario is None:
+                        return
+                    pending.add(pool.submit(self.run_one, scenario))
+
+            submit_more()
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.discard(future)
+                    result = future.result()
+                    latencies.append(result["latency"])
+                    failures += 0 if result["ok"] else 1
+                    with self._write_lock:
+                        out.write(json.dumps(result) + "\n")
+                        out.flush()
+                    if self.progress_every and len(latencies) % self.progress_every == 0:
+                        elapsed = time.perf_counter() - start
+                        report(f"{len(latencies)} done, {len(latencies) / elapsed:.1f} excuses/s")
+                submit_more()
+
+        elapsed = time.perf_counter() - start
+        latencies.sort()
+        summary = {
+            "total": len(latencies),
+            "failed": failures,
+            "elapsed": elapsed,
+            "throughput": len(latencies) / elapsed if elapsed else 0.0,
+            "p50": percentile(latencies, 0.50),
+            "p90": percentile(latencies, 0.90),
+            "p95": percentile(latencies, 0.95),
+            "p99": percentile(latencies, 0.99),
+            "max": latencies[-1] if latencies else 0.0
+        }
+        report(format_summary(summary))
+        return summary
+
+
+def format_summary(summary):
+    return (
+        f"Generated {summary['total']} excuses ({summary['failed']} failed) in {summary['elapsed']:.1f}s, "
+        f"{summary['throughput']:.2f} excuses/s\n"
+        f"Latency p50 {summary['p50'] * 1000:.0f} ms, p90 {summary['p90'] * 1000:.0f} ms, "
+        f"p95 {summary['p95'] * 1000:.0f} ms, p99 {summary['p99'] * 1000:.0f} ms, max {summary['max'] * 1000:.0f} ms"
+    )
+
+
+def main(argv, generator_factory):
+    parser = argparse.ArgumentParser(prog="app.py batch", description="Generate excuses in bulk")
+    parser.add_argument("scenarios", nargs="?", help="CSV or JSONL file of scenarios")
+    parser.add_argument("-o", "--output", default="data/batch_results.jsonl")
+    parser.add_argument("-w", "--workers", type=int, default=4)
+    parser.add_argument("--all-combinations", action="store_true",
+                        help="Use every Context x Audience x Formality x Urgency combination")
+    parser.add_argument("--details", default="", help="Details used with --all-combinations")
+    parser.add_argument("--language", default="English", help="Language used with --all-combinations")
+    parser.add_argument("--fresh", action="store_true", help="Bypass the response cache")
+    parser.add_argument("--save-history", action="store_true", help="Also record the excuses in history")
+    parser.add_argument("--offline", action="store_true",
+                        help="Use the local stand-in model and translator instead of the network")
+    parser.add_argument("--latency", default="lognormal:0.8:0.4",
+                        help="Offline model latency, e.g. fixed:0.5, uniform:0.2:1, lognormal:0.8:0.4")
+    parser.add_argument("--translation-latency", default="lognormal:0.2:0.4", help="Offline translator latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of offline calls that fail")
+    parser.add_argument("--error-kinds", default="rate_limit:2,server:1",
+                        help="Weighted failure kinds for offline calls")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for offline latency and failures")
+    args = parser.parse_args(argv)
+
+    if args.all_combinations:
+        scenarios = scenario_grid(args.details, args.language)
+    elif args.scenarios:
+        scenarios = load_scenarios(args.scenarios)
+    else:
+        parser.error("give a scenarios file or --all-combinations")
+
+    if args.offline:
+        model_backend = LocalModelBackend(args.latency, args.error_rate, args.error_kinds, args.seed)
+        translation_backend = LocalTranslationBackend(
+            args.translation_latency, args.error_rate, args.error_kinds, args.seed
+        )
+        generator = generator_factory(model_backend=model_backend, translation_backend=translation_backend)
+    else:
+        generator = generator_factory()
+
+    runner = BatchRunner(
+        generator,
+        workers=max(1, args.workers),
+        use_cache=not args.fresh,
+        save_to_history=args.save_history
+    )
+    summary = runner.run(scenarios, args.output)
+    return 0 if summary["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    print("Run batches through the app: python app.py batch --help", file=sys.stderr)
+    sys.exit(2)
@@ -0,0 +1,61 @@
+"""Compare the incremental PatternIndex with the full history scan used for predictions.
+
+Run from the repository root: python benchmarks/bench_prediction.py [--entries 100000]
+"""
+import sys
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from storage import JsonStorage
+from indexes import PatternIndex
+from common import synthetic_history
+
+
+def time_call(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    entries = synthetic_history(args.entries)
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = JsonStorage(Path(tmp) / "history.jsonl", Path(tmp) / "favorites.json")
+        storage.journal.entries[:] = entries
+        storage._history_loaded = True
+
+        index = PatternIndex(Path(tmp) / "patterns.json", half_life_days=90)
+        build = time_call(lambda: index.rebuild(entries), 1)
+        append = time_call(lambda: index.add(entries[-1]), args.repeat)
+
+        full_scan = time_call(storage.history_patterns, args.repeat)
+        lookup = time_call(index.most_common, args.repeat)
+
+    rows = [
+        ("History entries", f"{args.entries}"),
+        ("Full scan per prediction", f"{full_scan * 1000:.2f} ms"),
+        ("Index lookup per prediction", f"{lookup * 1000:.4f} ms"),
+        ("Index append + save", f"{append * 1000:.3f} ms"),
+        ("One-off index rebuild", f"{build * 1000:.2f} ms"),
+        ("Speedup per prediction", f"{full_scan / lookup:.0f}x"),
+    ]
+    for label, value in rows:
+        print(f"{label:<30}{value:>14}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+"""Measure full-text search over a large history with the inverted SearchIndex.
+
+Run from the repository root: python benchmarks/bench_search.py [--entries 100000]
+"""
+import sys
+import time
+import random
+import argparse
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from indexes import SearchIndex
+from common import synthetic_history
+from bench_prediction import time_call
+
+
+WORDS = ["traffic", "meeting", "doctor", "appointment", "flight", "delayed", "sick", "dog",
+         "internet", "outage", "family", "emergency", "train", "cancelled", "flat", "tire"]
+QUERIES = ["traffic", "doctor appointment", "delayed flight", "sick dog", "emerg", "work boss", "no such words"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(7)
+    entries = synthetic_history(args.entries)
+    for entry in entries:
+        entry["excuse"] += " " + " ".join(rng.sample(WORDS, 4))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index = SearchIndex(Path(tmp) / "search.json")
+        build = time_call(lambda: index.rebuild(entries), 1)
+
+        start = time.perf_counter()
+        reloaded = SearchIndex(Path(tmp) / "search.json")
+        reloaded.ensure_synced(len(entries), lambda: entries)
+        load = time.perf_counter() - start
+
+        append = time_call(lambda: index.add(len(entries), entries[-1]), args.repeat)
+
+        rows = [
+            ("History entries", f"{args.entries}"),
+            ("One-off index build + save", f"{build * 1000:.0f} ms"),
+            ("Load saved index", f"{load * 1000:.0f} ms"),
+            ("Add one entry", f"{append * 1000:.3f} ms"),
+        ]
+        for query in QUERIES:
+            elapsed = time_call(lambda: index.search(query, limit=200), args.repeat)
+            matches = len(index.search(query))
+            rows.append((f"Search '{query}' ({matches} hits)", f"{elapsed * 1000:.3f} ms"))
+
+    for label, value in rows:
+        print(f"{label:<40}{value:>14}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,34 @@
+"""Synthetic data shared by the benchmark scripts."""
+import random
+import datetime
+
+from backends import EXCUSE_SENTENCES
+
+
+CONTEXTS = ["Work", "School", "Social", "Family", "Other"]
+AUDIENCES = ["Boss", "Teacher", "Friend", "Family", "Other"]
+
+
+def synthetic_history(count, seed=42, stock_sentences=False):
+    """History entries spread over the last year.
+
+    With stock_sentences the excuses reuse the offline model's sentences like real ones
+    do; otherwise every excuse is a short unique text.
+    """
+    rng = random.Random(seed)
+    start = datetime.datetime.now() - datetime.timedelta(days=365)
+    entries = []
+    for i in range(count):
+        timestamp = start + datetime.timedelta(seconds=i * 365 * 86400 // count + rng.randint(0, 3600))
+        if stock_sentences:
+            excuse = " ".join(rng.sample(EXCUSE_SENTENCES, 2)) + f" Reference {rng.randint(0, 10 ** 6)}."
+        else:
+            excuse = f"Synthetic excuse {i}"
+        entries.append({
+            "excuse": excuse,
+            "context": f"{rng.choice(CONTEXTS)}: details {i % 50}",
+            "audience": rng.choice(AUDIENCES),
+            "timestamp": timestamp.isoformat(),
+            "effectiveness": rng.choice([None, 1, 2, 3, 4, 5])
+        })
+    return entries
@@ -0,0 +1,220 @@
+"""Reproducible benchmark suite for storage, ranking, prediction, translation and UI population.
+
+Runs headless on synthetic history with an offline stand-in model and translator, and
+writes the timings to a JSON file. A second mode compares two result files and flags
+regressions.
+
+Run from the repository root:
+    python benchmarks/suite.py run [--sizes 1000 10000 100000] [-o results.json]
+    python benchmarks/suite.py compare baseline.json results.json [--threshold 0.2]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import datetime
+import platform
+import tempfile
+import subprocess
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+
+from backends import LocalModelBackend, LocalTranslationBackend
+from common import synthetic_history
+
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+# Keep repeating a case until it has run this long (or --repeat times), then report the best run
+MIN_CASE_SECONDS = 0.5
+# Differences below this are timer noise, never a regression
+NOISE_FLOOR_SECONDS = 0.0005
+
+
+def measure(func, repeat, setup=None):
+    """Best wall time of func() over up to repeat runs, with setup() untimed before each"""
+    best = None
+    runs = 0
+    spent = 0.0
+    while runs < repeat and (runs == 0 or spent < MIN_CASE_SECONDS):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        spent += elapsed
+        runs += 1
+        best = elapsed if best is None else min(best, elapsed)
+    return best, runs
+
+
+class TaskHost:
+    """Just enough of App to run App.generate_excuse_task without a window"""
+
+    def __init__(self, app_module, generator):
+        self.excuse_generator = generator
+        self.stream_callback = lambda writer: None
+        self.generate_excuse_task = app_module.App.generate_excuse_task.__get__(self)
+
+
+def make_app(app_module, generator):
+    """Hidden App window for widget benchmarks, or None when no display is available"""
+    try:
+        window = app_module.App()
+    except Exception as e:
+        print(f"Skipping UI benchmarks: {e}", file=sys.stderr)
+        return None
+    window.withdraw()
+    window.excuse_generator = generator
+    window.ensure_frame("history")
+    return window
+
+
+def run_size(app_module, size, repeat, report):
+    results = []
+
+    def record(name, func, setup=None, repeats=repeat):
+        seconds, runs = measure(func, repeats, setup)
+        results.append({"name": name, "size": size, "seconds": seconds, "runs": runs})
+        report(f"{name:<36}{size:>8}{seconds * 1000:>12.3f} ms  ({runs} runs)")
+
+    entries = synthetic_history(size, stock_sentences=True)
+    # Every size starts from empty data files
+    for path in app_module.data_dir.iterdir():
+        if path.is_file():
+            path.unlink()
+    seed = app_module.create_storage(app_module.STORAGE_BACKEND, app_module.data_dir)
+    seed.replace_history(entries)
+    seed.close()
+
+    model = LocalModelBackend(latency="fixed:0")
+    translator = LocalTranslationBackend(latency="fixed:0")
+    generator = app_module.ExcuseGenerator(model_backend=model, translation_backend=translator)
+
+    record("load_history", lambda: generator.storage.load_history(reload=True))
+    # save_history also rebuilds the prediction, search and duplicate indexes
+    record("save_history", lambda: generator.save_history(entries), repeats=1 if size > 10000 else repeat)
+
+    def reset_ranking():
+        generator.ranking_index.built = False
+    record("rank_excuses (first call)", lambda: generator.rank_excuses("Work: details 1", "Boss", 10),
+           setup=reset_ranking)
+    record("rank_excuses", lambda: generator.rank_excuses("Work: details 1", "Boss", 10))
+    record("predict_excuse_needs", generator.predict_excuse_needs)
+
+    counter = iter(range(10 ** 9))
+    record("translate_excuse (new text)",
+           lambda: generator.translate_excuse(f"{entries[0]['excuse']} Note {next(counter)}.", "Spanish"))
+    record("translate_excuse (remembered)", lambda: generator.translate_excuse(entries[0]["excuse"], "Spanish"))
+
+    host = TaskHost(app_module, generator)
+    record("generate_excuse_task", lambda: host.generate_excuse_task(
+        "Work", f"details {next(counter)}", "Boss", "Formal", "Normal", "Spanish", use_cache=False
+    ))
+
+    window = make_app(app_module, generator)
+    if window is not None:
+        def invalidate():
+            window.history_list.total = 0
+            window.history_list._cache.clear()
+        record("refresh_history", window.refresh_history, setup=invalidate)
+        record("history scroll (one page)",
+               lambda: window.history_list.scroll_to((window.history_list.offset + 6) % max(1, size - 6)))
+        window.destroy()
+    generator.storage.close()
+    generator.response_cache.close()
+    return results
+
+
+def run(args):
+    # The app keeps its data next to the working directory, so run inside a scratch one
+    work_dir = Path(tempfile.mkdtemp(prefix="excuse-bench-"))
+    output = Path(args.output).resolve()
+    os.chdir(work_dir)
+    os.environ["EXCUSE_STORAGE_BACKEND"] = args.backend
+    import app as app_module
+
+    report = print
+    report(f"{'Case':<36}{'Entries':>8}{'Best':>15}")
+    results = []
+    for size in args.sizes:
+        results.extend(run_size(app_module, size, args.repeat, report))
+
+    try:
+        commit = subprocess.run(
+            ["git", "-C", str(REPO_DIR), "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, timeout=10
+        ).stdout.strip()
+    except Exception:
+        commit = ""
+    data = {
+        "meta": {
+            "timestamp": datetime.datetime.now().isoformat(),
+            "commit": commit,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "backend": args.backend,
+            "sizes": args.sizes,
+        },
+        "results": results
+    }
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    report(f"Results written to {output}")
+    return 0
+
+
+def compare(args):
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.current, "r", encoding="utf-8") as f:
+        current = json.load(f)
+
+    before = {(r["name"], r["size"]): r["seconds"] for r in baseline["results"]}
+    regressions = 0
+    print(f"{'Case':<36}{'Entries':>8}{'Before':>12}{'After':>12}{'Change':>9}")
+    for result in current["results"]:
+        key = (result["name"], result["size"])
+        if key not in before:
+            print(f"{result['name']:<36}{result['size']:>8}{'-':>12}{result['seconds'] * 1000:>9.3f} ms      new")
+            continue
+        old, new = before[key], result["seconds"]
+        change = (new - old) / old if old else 0.0
+        flag = ""
+        if change > args.threshold and new - old > NOISE_FLOOR_SECONDS:
+            flag = "  REGRESSION"
+            regressions += 1
+        elif change < -args.threshold and old - new > NOISE_FLOOR_SECONDS:
+            flag = "  faster"
+        print(f"{result['name']:<36}{result['size']:>8}{old * 1000:>9.3f} ms{new * 1000:>9.3f} ms"
+              f"{change * 100:>+8.0f}%{flag}")
+    print(f"{regressions} regression(s) above {args.threshold * 100:.0f}%")
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run the benchmarks and write a results file")
+    run_parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    run_parser.add_argument("--repeat", type=int, default=5)
+    run_parser.add_argument("--backend", choices=["json", "sqlite"], default="json")
+    run_parser.add_argument("-o", "--output", default="benchmarks/results.json")
+
+    compare_parser = subparsers.add_parser("compare", help="Flag regressions between two results files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.2, help="Relative slowdown that counts (0.2 = 20%%)")
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        return run(args)
+    return compare(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
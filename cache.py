@@ -0,0 +1,173 @@
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from collections import OrderedDict
+
+
+def normalize_prompt(prompt):
+    # Whitespace differences should not produce a different cache entry
+    return re.sub(r"\s+", " ", prompt).strip()
+
+
+def make_cache_key(model_name, prompt, params=None):
+    payload = json.dumps([model_name, normalize_prompt(prompt), params or {}], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CachedText(str):
+    """Response text answered from the cache rather than by the model"""
+
+
+class ResponseCache:
+    """Two-tier cache for model responses: an in-memory LRU in front of an SQLite file.
+
+    Entries expire after ttl seconds. The memory tier holds at most memory_entries
+    responses and the disk tier is trimmed back under disk_bytes, least recently used
+    first. Hits served from memory update the disk access times in batches.
+    """
+
+    # Memory hits whose access time is written back to disk at once
+    TOUCH_BATCH = 64
+
+    def __init__(self, cache_file, ttl=7 * 24 * 3600, memory_entries=256, disk_bytes=50 * 1024 * 1024):
+        self.cache_file = Path(cache_file)
+        self.ttl = ttl
+        self.memory_entries = memory_entries
+        self.disk_bytes = disk_bytes
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._touched = {}
+        self._touch_count = 0
+        self._lock = threading.RLock()
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.cache_file), check_same_thread=False)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL,
+                size INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed);
+        """)
+        self.conn.commit()
+        # Kept up to date on every write instead of summing the table each time
+        self._disk_size = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            cached = self._memory.get(key)
+            if cached is not None:
+                value, created = cached
+                if now - created <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    self._touched[key] = now
+                    # Counted per hit, so a single hot key is written back too
+                    self._touch_count += 1
+                    if self._touch_count >= self.TOUCH_BATCH:
+                        self._flush_touched()
+                        self.conn.commit()
+                    return value
+                del self._memory[key]
+
+            row = self.conn.execute(
+                "SELECT value, created, size FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                value, created, size = row
+                if now - created <= self.ttl:
+                    self.conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+                    self.conn.commit()
+                    self._remember(key, value, created)
+                    self.hits += 1
+                    return value
+                self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.conn.commit()
+                self._disk_size -= size
+
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            self._remember(key, value, now)
+            self._touched.pop(key, None)
+            previous = self.conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created, accessed, size) VALUES (?, ?, ?, ?, ?)",
+                (key, value, now, now, size)
+            )
+            self._disk_size += size - (previous[0] if previous else 0)
+            self._evict_disk(now)
+            self.conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._touched.clear()
+            self._touch_count = 0
+            self.conn.execute("DELETE FROM responses")
+            self.conn.commit()
+            self._disk_size = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            count = self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "memory_entries": len(self._memory),
+                "disk_entries": count,
+                "disk_bytes": self._disk_size
+            }
+
+    def close(self):
+        with self._lock:
+            self._flush_touched()
+            self.conn.commit()
+            self.conn.close()
+
+    def _remember(self, key, value, created):
+        self._memory[key] = (value, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _flush_touched(self):
+        if self._touched:
+            self.conn.executemany(
+                "UPDATE responses SET accessed = ? WHERE key = ?",
+                [(accessed, key) for key, accessed in self._touched.items()]
+            )
+            self._touched.clear()
+        self._touch_count = 0
+
+    def _evict_disk(self, now):
+        if self._disk_size <= self.disk_bytes:
+            return
+        # Expired entries go first, then the least recently used until we are back under the limit
+        self._flush_touched()
+        self.conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total > self.disk_bytes:
+            for key, size in self.conn.execute(
+                "SELECT key, size FROM responses ORDER BY accessed"
+            ).fetchall():
+                self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._memory.pop(key, None)
+                total -= size
+                if total <= self.disk_bytes:
+                    break
+        self._disk_size = total
@@ -0,0 +1,120 @@
+import re
+import math
+from collections import Counter
+
+from indexes import tokenize, shingles, jaccard
+
+
+# Comfortable length in words per urgency; urgent excuses should be short
+LENGTH_TARGETS = {
+    "Low": (40, 110),
+    "Normal": (30, 90),
+    "High": (20, 60),
+    "Emergency": (10, 45),
+}
+# Where each tone sits between casual (0) and formal (1)
+FORMALITY_TARGETS = {
+    "Casual": 0.25,
+    "Professional": 0.65,
+    "Formal": 0.85,
+}
+FORMAL_MARKERS = {
+    "apologize", "apologise", "apologies", "regret", "unfortunately", "sincerely", "kindly",
+    "please", "appreciate", "understanding", "inconvenience", "regards", "would", "therefore",
+    "assure", "unable", "attend", "circumstances", "accordingly", "respectfully",
+}
+CASUAL_MARKERS = {
+    "hey", "hi", "gonna", "wanna", "kinda", "totally", "super", "lol", "guys", "yeah",
+    "crazy", "stuff", "sorry", "ok", "okay", "btw", "omg", "dude", "awesome",
+}
+CONTRACTION_PATTERN = re.compile(r"\b\w+'(?:m|s|re|ve|ll|d|t)\b", re.IGNORECASE)
+WORD_PATTERN = re.compile(r"[\w']+")
+
+# Weights of the partial scores; similarity only counts when there are rated excuses to compare with
+WEIGHTS = {"length": 0.3, "formality": 0.3, "similarity": 0.4}
+
+
+def length_score(words, urgency):
+    low, high = LENGTH_TARGETS.get(urgency, LENGTH_TARGETS["Normal"])
+    if low <= words <= high:
+        return 1.0
+    # Falls off by half for every doubling away from the range
+    distance = math.log2(low / max(words, 1)) if words < low else math.log2(words / high)
+    return 0.5 ** distance
+
+
+def formality_level(text):
+    """Estimate of how formal text reads, from 0 (casual) to 1 (formal)"""
+    words = [word.lower() for word in WORD_PATTERN.findall(text)]
+    if not words:
+        return 0.5
+    formal = sum(1 for word in words if word in FORMAL_MARKERS)
+    casual = sum(1 for word in words if word in CASUAL_MARKERS)
+    casual += len(CONTRACTION_PATTERN.findall(text)) + text.count("!")
+    # Longer words read more formal
+    average_length = sum(len(word) for word in words) / len(words)
+    level = 0.5 + (formal - casual) / (formal + casual + 4) * 0.5 + (average_length - 4.5) * 0.08
+    return min(1.0, max(0.0, level))
+
+
+def formality_score(text, formality):
+    target = FORMALITY_TARGETS.get(formality, 0.5)
+    return 1.0 - abs(formality_level(text) - target)
+
+
+def cosine(a, b):
+    if not a or not b:
+        return 0.0
+    dot = sum(count * b[term] for term, count in a.items() if term in b)
+    return dot / math.sqrt(sum(v * v for v in a.values()) * sum(v * v for v in b.values()))
+
+
+def similarity_score(terms, references):
+    """Best cosine similarity to a reference excuse, weighted by how well it was ranked"""
+    best = 0.0
+    for reference_terms, weight in references:
+        best = max(best, cosine(terms, reference_terms) * weight)
+    return best
+
+
+def score_candidates(texts, formality, urgency, ranked=(), duplicate_threshold=0.8):
+    """Score and sort candidate excuses, best first.
+
+    ranked is the output of rank_excuses (dicts with "excuse" and "score"). Candidates
+    nearly identical to a better one are dropped. Each result has the text, its total
+    score and the partial scores it was made of.
+    """
+    top_score = max((entry["score"] for entry in ranked), default=0) or 1
+    references = [
+        (Counter(tokenize(entry["excuse"])), entry["score"] / top_score)
+        for entry in ranked if entry.get("excuse")
+    ]
+    weights = dict(WEIGHTS)
+    if not references:
+        weights.pop("similarity")
+    total_weight = sum(weights.values())
+
+    scored = []
+    for text in texts:
+        text = text.strip()
+        if not text:
+            continue
+        parts = {
+            "length": length_score(len(WORD_PATTERN.findall(text)), urgency),
+            "formality": formality_score(text, formality),
+        }
+        if references:
+            parts["similarity"] = similarity_score(Counter(tokenize(text)), references)
+        score = sum(parts[name] * weight for name, weight in weights.items()) / total_weight
+        scored.append(dict(parts, excuse=text, score=score))
+    scored.sort(key=lambda candidate: candidate["score"], reverse=True)
+
+    kept = []
+    kept_shingles = []
+    for candidate in scored:
+        candidate_shingles = shingles(candidate["excuse"])
+        if any(jaccard(candidate_shingles, other) >= duplicate_threshold for other in kept_shingles):
+            continue
+        kept.append(candidate)
+        kept_shingles.append(candidate_shingles)
+    return kept
@@ -0,0 +1,296 @@
+import time
+import queue
+import asyncio
+import inspect
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor, CancelledError
+
+from metrics import REGISTRY
+
+
+# Sentinel so callers can pass timeout=None to mean "no timeout"
+DEFAULT_TIMEOUT = object()
+
+
+class EngineBusyError(RuntimeError):
+    pass
+
+
+class CancelToken:
+    """Set when an engine request is cancelled or times out.
+
+    Cancelling only drops the asyncio side; the worker thread runs on, so code with
+    lasting side effects (saving history) checks is_cancelled() first.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+
+_current = threading.local()
+
+
+def is_cancelled():
+    """True when the engine request running on this thread was cancelled or timed out"""
+    token = getattr(_current, "token", None)
+    return token is not None and token.cancelled
+
+
+class AsyncEngine:
+    """Single asyncio event loop that runs all blocking model, translation and voice calls.
+
+    Work is handed to a small thread pool from the loop, with a semaphore capping how
+    many calls run at once and a pending limit that rejects new work when the queue is
+    full. Requests submitted under the same key supersede each other: starting a new
+    "excuse" request cancels the previous one that is still waiting or running.
+    """
+
+    def __init__(self, max_concurrency=4, max_pending=16, default_timeout=60):
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_pending
+        self.default_timeout = default_timeout
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency * 2, thread_name_prefix="engine")
+        self.loop = asyncio.new_event_loop()
+        self._active = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run_loop, name="engine-loop")
+        self._thread.daemon = True
+        self._thread.start()
+        self._semaphore = asyncio.run_coroutine_threadsafe(self._make_semaphore(), self.loop).result()
+
+    def submit(self, func, *args, key=None, timeout=DEFAULT_TIMEOUT):
+        """Schedule func(*args) and return a concurrent.futures.Future for its result"""
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        with self._lock:
+            # The request being superseded frees its slot, so it does not count against the limit
+            previous = self._active.get(key) if key is not None else None
+            pending = self._pending - (1 if previous is not None and not previous.done() else 0)
+            if pending >= self.max_pending:
+                REGISTRY.increment("engine_rejected_total")
+                raise EngineBusyError("Too many requests in progress, please wait")
+            self._pending += 1
+            REGISTRY.increment("engine_submitted_total")
+            future = asyncio.run_coroutine_threadsafe(self.run(func, *args, timeout=timeout), self.loop)
+            if key is not None:
+                self._active[key] = future
+        # Only cancelled once the new request has been accepted
+        if previous is not None:
+            previous.cancel()
+        future.add_done_callback(functools.partial(self._finished, key))
+        return future
+
+    async def run(self, func, *args, timeout=None):
+        """Coroutine form of submit for code already running on the engine loop"""
+        token = CancelToken()
+
+        def call_with_token():
+            _current.token = token
+            try:
+                return func(*args)
+            finally:
+                _current.token = None
+
+        try:
+            async with self._semaphore:
+                call = self.loop.run_in_executor(self.executor, call_with_token)
+                if timeout:
+                    return await asyncio.wait_for(call, timeout)
+                return await call
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            token.cancel()
+            raise
+
+    def cancel(self, key):
+        with self._lock:
+            future = self._active.pop(key, None)
+        if future is not None:
+            future.cancel()
+
+    def stats(self):
+        with self._lock:
+            return {"pending": self._pending, "active_keys": len(self._active)}
+
+    def shutdown(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=1)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _finished(self, key, future):
+        with self._lock:
+            self._pending -= 1
+            if key is not None and self._active.get(key) is future:
+                del self._active[key]
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    async def _make_semaphore(self):
+        return asyncio.Semaphore(self.max_concurrency)
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.lock = threading.Lock()
+        self.chunks = []
+        self.listeners = []
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key into a single call.
+
+    The first caller for a key runs the function; callers arriving while it is still
+    running wait for it and get the same result (or exception) instead of starting
+    another request. Streamed chunks are forwarded to every waiting caller, and a
+    caller joining mid-stream first receives the chunks it missed.
+    """
+
+    def __init__(self, name="flight"):
+        self.name = name
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func, on_chunk=None, method=None):
+        """Run func(emit) once for all concurrent callers of key.
+
+        emit(chunk) passes a streamed chunk on to the callers' on_chunk; it is None when
+        no caller wants chunks yet, so func can use the cheaper non-streaming call.
+        """
+        method = method or self.name
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        
+        if not leader:
+            REGISTRY.increment("coalesced_calls_total", method=method)
+            received = False
+            if on_chunk is not None:
+                with flight.lock:
+                    # Catch up on what was already streamed, later chunks arrive through emit
+                    for chunk in flight.chunks:
+                        on_chunk(chunk)
+                    received = bool(flight.chunks)
+                    flight.listeners.append(on_chunk)
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            if on_chunk is not None and not received and not flight.chunks:
+                # The leader did not stream, hand over the whole text at once
+                on_chunk(flight.result)
+            return flight.result
+
+        REGISTRY.increment("single_flight_calls_total", method=method)
+        if on_chunk is not None:
+            flight.listeners.append(on_chunk)
+
+        def emit(chunk):
+            with flight.lock:
+                flight.chunks.append(chunk)
+                for listener in flight.listeners:
+                    listener(chunk)
+
+        try:
+            flight.result = func(emit if on_chunk is not None else None)
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+
+def single_flight(method, streams=True):
+    """Decorator coalescing concurrent identical calls through self.flights (a SingleFlight).
+
+    Calls are identical when all arguments except on_chunk are equal. With streams=True
+    the method takes an on_chunk keyword that is fanned out to every caller.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            arguments = dict(bound.arguments)
+            del arguments["self"]
+            on_chunk = arguments.pop("on_chunk", None) if streams else None
+            key = (method, tuple(sorted(arguments.items())))
+
+            if streams:
+                call = lambda emit: func(self, on_chunk=emit, **arguments)
+            else:
+                call = lambda emit: func(self, **arguments)
+            return self.flights.do(key, call, on_chunk, method)
+        return wrapper
+    return decorator
+
+
+class TkDispatcher:
+    """Delivers results from worker threads to the Tk main loop.
+
+    Worker threads only put callbacks on a queue; the main loop drains it from an
+    `after` timer, so widgets are never touched outside the Tk thread.
+    """
+
+    def __init__(self, widget, interval=30):
+        self.widget = widget
+        self.interval = interval
+        self._queue = queue.Queue()
+        self.widget.after(self.interval, self._poll)
+
+    def call(self, func, *args):
+        self._queue.put((func, args))
+
+    def watch(self, future, on_result, on_error=None):
+        """Call on_result(value) or on_error(exception) on the Tk thread when future finishes.
+
+        Cancelled (superseded) futures are dropped silently.
+        """
+        def done(f):
+            try:
+                result = f.result()
+            except CancelledError:
+                return
+            except Exception as e:
+                if on_error is not None:
+                    self.call(on_error, e)
+                return
+            self.call(on_result, result)
+
+        future.add_done_callback(done)
+        return future
+
+    def _poll(self):
+        try:
+            while True:
+                func, args = self._queue.get_nowait()
+                start = time.perf_counter()
+                try:
+                    func(*args)
+                except Exception as e:
+                    REGISTRY.increment("errors_total", method="ui_callback")
+                    print(f"Error in UI callback: {e}")
+                # Time spent updating widgets on the Tk thread, per callback
+                name = getattr(func, "__qualname__", None) or getattr(func, "__name__", "callback")
+                REGISTRY.observe("ui_callback_duration_seconds", time.perf_counter() - start, callback=name)
+        except queue.Empty:
+            pass
+        self.widget.after(self.interval, self._poll)
@@ -0,0 +1,619 @@
+import os
+import re
+import json
+import bisect
+import heapq
+import functools
+import zlib
+import math
+import datetime
+import threading
+from pathlib import Path
+
+from storage import DAYS_OF_WEEK
+
+
+def context_category(context):
+    # History contexts look like "Work: details", patterns are tracked per category
+    return (context or "Other").split(":", 1)[0].strip() or "Other"
+
+
+class PatternIndex:
+    """Day-of-week x hour x context histogram of the excuse history, kept up to date per entry.
+
+    Instead of re-reading every timestamp, each new history entry adds its weight to
+    the matching cell and to the day, hour and context totals, so a prediction only
+    looks at those small totals. With a half-life, newer entries weigh more: weights
+    are stored scaled by exp(rate * (t - reference)), which fades old entries without
+    ever touching them again. The index is saved next to the history and rebuilt from
+    it when the two disagree.
+    """
+
+    VERSION = 1
+    # Rebase stored weights before they can overflow a float
+    MAX_WEIGHT = 1e12
+
+    def __init__(self, index_file, half_life_days=None):
+        self.index_file = Path(index_file)
+        self.half_life_days = half_life_days
+        self.rate = math.log(2) / (half_life_days * 86400) if half_life_days else 0.0
+        self._lock = threading.RLock()
+        self._reset()
+        self._load()
+
+    def add(self, entry, save=True):
+        with self._lock:
+            self._add(entry)
+            if save:
+                self.save()
+
+    def rebuild(self, entries):
+        with self._lock:
+            self._reset()
+            for entry in entries:
+                self._add(entry)
+            self.save()
+
+    def ensure_synced(self, history_count, load_entries):
+        """Rebuild from load_entries() if the index does not cover exactly history_count entries"""
+        with self._lock:
+            if self.count != history_count:
+                self.rebuild(load_entries())
+
+    def most_common(self):
+        """Return (day, hour, context) with the highest (decayed) weight, or None when empty"""
+        with self._lock:
+            if not self.count:
+                return None
+            # Every stored weight shares the same decay factor, so comparing them directly is enough
+            day = max(self.day_weights.items(), key=lambda x: x[1])[0]
+            hour = max(self.hour_weights.items(), key=lambda x: x[1])[0]
+            context = max(self.context_weights.items(), key=lambda x: x[1])[0]
+            return day, int(hour), context
+
+    def save(self):
+        with self._lock:
+            data = {
+                "version": self.VERSION,
+                "half_life_days": self.half_life_days,
+                "reference": self.reference,
+                "count": self.count,
+                "cells": self.cells,
+                "days": self.day_weights,
+                "hours": self.hour_weights,
+                "contexts": self.context_weights
+            }
+            tmp_file = self.index_file.with_suffix(self.index_file.suffix + ".tmp")
+            self.index_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                f.write(json.dumps(data))
+            os.replace(tmp_file, self.index_file)
+
+    def _add(self, entry):
+        # Entries without a usable timestamp still count, so the index stays in sync with history
+        self.count += 1
+        try:
+            timestamp = datetime.datetime.fromisoformat(entry["timestamp"])
+        except (KeyError, TypeError, ValueError):
+            return
+        day = DAYS_OF_WEEK[timestamp.weekday()]
+        hour = str(timestamp.hour)
+        context = context_category(entry.get("context"))
+        weight = self._weight(timestamp.timestamp())
+
+        key = f"{day}|{hour}|{context}"
+        self.cells[key] = self.cells.get(key, 0.0) + weight
+        self.day_weights[day] = self.day_weights.get(day, 0.0) + weight
+        self.hour_weights[hour] = self.hour_weights.get(hour, 0.0) + weight
+        self.context_weights[context] = self.context_weights.get(context, 0.0) + weight
+
+    def _weight(self, seconds):
+        if not self.rate:
+            return 1.0
+        if self.reference is None:
+            self.reference = seconds
+        weight = math.exp(self.rate * (seconds - self.reference))
+        if weight > self.MAX_WEIGHT:
+            self._rebase(seconds)
+            weight = 1.0
+        return weight
+
+    def _rebase(self, seconds):
+        factor = math.exp(-self.rate * (seconds - self.reference))
+        for weights in (self.cells, self.day_weights, self.hour_weights, self.context_weights):
+            for key in weights:
+                weights[key] *= factor
+        self.reference = seconds
+
+    def _reset(self):
+        self.reference = None
+        self.count = 0
+        self.cells = {}
+        self.day_weights = {}
+        self.hour_weights = {}
+        self.context_weights = {}
+
+    def _load(self):
+        if not self.index_file.exists():
+            return
+        try:
+            with open(self.index_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"Error loading pattern index: {e}")
+            return
+        # A different format or decay setting means the index has to be rebuilt
+        if data.get("version") != self.VERSION or data.get("half_life_days") != self.half_life_days:
+            return
+        self.reference = data.get("reference")
+        self.count = data.get("count", 0)
+        self.cells = data.get("cells", {})
+        self.day_weights = data.get("days", {})
+        self.hour_weights = data.get("hours", {})
+        self.context_weights = data.get("contexts", {})
+
+
+def excuse_score(effectiveness, timestamp, now):
+    """Ranking score: effectiveness (70%) plus recency (30%), higher for newer excuses"""
+    days_old = (now - timestamp).days + 1
+    return (effectiveness * 0.7) + ((10 / days_old) * 0.3)
+
+
+class RankingIndex:
+    """Rated history entries grouped by (context, audience) for top-K ranking.
+
+    Each bucket maps history index -> (effectiveness, timestamp). Rankings are computed
+    with a bounded heap and cached per bucket. Recency only changes when an entry's age
+    crosses another whole day, so the cache stays valid until the earliest such moment
+    and is recomputed lazily after that. Nothing derived is written into the history.
+    """
+
+    def __init__(self):
+        self.buckets = {}
+        self.placement = {}
+        self.built = False
+        self._lock = threading.RLock()
+
+    def build(self, entries):
+        """Index every rated entry from the full history, in insertion order"""
+        with self._lock:
+            self.buckets = {}
+            self.placement = {}
+            for index, entry in enumerate(entries):
+                self._set(index, entry)
+            self.built = True
+
+    def update(self, index, entry):
+        """Add, move or drop one history entry after it was added or (re)rated"""
+        with self._lock:
+            if self.built:
+                self._set(index, entry)
+
+    def top(self, context, audience, k=None, now=None):
+        """Return [(score, history_index), ...] best first, at most k items"""
+        now = now or datetime.datetime.now()
+        with self._lock:
+            bucket = self.buckets.get((context, audience))
+            if not bucket or not bucket["entries"]:
+                return []
+            size = len(bucket["entries"])
+            wanted = size if k is None else min(k, size)
+            cached = bucket["ranked"]
+            if cached is not None and now < bucket["valid_until"] and len(cached) >= wanted:
+                return cached[:wanted]
+
+            scored = []
+            valid_until = None
+            for index, (effectiveness, timestamp) in bucket["entries"].items():
+                scored.append((excuse_score(effectiveness, timestamp, now), index))
+                # The next moment this entry's age in whole days changes
+                change_at = timestamp + datetime.timedelta(days=(now - timestamp).days + 1)
+                if valid_until is None or change_at < valid_until:
+                    valid_until = change_at
+            # Ties go to the newer entry, as with a stable sort over newest-first input
+            ranked = heapq.nlargest(wanted, scored)
+            bucket["ranked"] = ranked
+            bucket["valid_until"] = valid_until
+            return ranked
+
+    def _set(self, index, entry):
+        # Drop any previous placement of this entry, then re-add it if it is rated
+        previous = self.placement.pop(index, None)
+        if previous is not None:
+            bucket = self.buckets[previous]
+            del bucket["entries"][index]
+            bucket["ranked"] = None
+        effectiveness = entry.get("effectiveness")
+        if effectiveness is None:
+            return
+        try:
+            timestamp = datetime.datetime.fromisoformat(entry["timestamp"])
+        except (KeyError, TypeError, ValueError):
+            return
+        key = (entry.get("context"), entry.get("audience"))
+        bucket = self.buckets.setdefault(key, {"entries": {}, "ranked": None, "valid_until": None})
+        bucket["entries"][index] = (effectiveness, timestamp)
+        bucket["ranked"] = None
+        self.placement[index] = key
+
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+STOP_WORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "for", "i", "in", "is", "it",
+    "me", "my", "of", "on", "or", "so", "that", "the", "this", "to", "was", "we", "with", "you"
+}
+# Longest suffixes first; a light stemmer so "meetings", "meeting" and "meet" match
+STEM_SUFFIXES = ("ational", "ization", "fulness", "ingly", "ments", "ness", "ment", "ings",
+                 "edly", "ing", "ies", "ied", "ers", "ed", "er", "es", "ly", "s")
+
+
+@functools.lru_cache(maxsize=65536)
+def stem(token):
+    for suffix in STEM_SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            token = token[:-len(suffix)]
+            if suffix in ("ies", "ied"):
+                token += "y"
+            break
+    return token
+
+
+def tokenize(text, stemming=True):
+    tokens = []
+    for token in TOKEN_PATTERN.findall((text or "").lower()):
+        if token in STOP_WORDS:
+            continue
+        tokens.append(stem(token) if stemming else token)
+    return tokens
+
+
+class PostingsIndex:
+    """Term -> sorted entry positions, saved to disk and extended one entry at a time.
+
+    Entries are only ever appended, so adding one appends its position to a few
+    posting lists and writes a single line to a journal next to the saved index; the
+    index file itself is rewritten once the journal grows. Subclasses decide which
+    terms an entry has. Without an index file the index lives in memory only.
+    """
+
+    VERSION = 1
+
+    def __init__(self, index_file=None, journal_min_records=500):
+        self.index_file = Path(index_file) if index_file else None
+        self.journal_file = self.index_file.with_suffix(self.index_file.suffix + ".log") if index_file else None
+        self.journal_min_records = journal_min_records
+        self.count = 0
+        self.postings = {}
+        self._sorted_terms = None
+        self._journal_records = 0
+        self._loaded = False
+        self._lock = threading.RLock()
+
+    def settings(self):
+        """Parameters that change the terms; a saved index with other settings is rebuilt"""
+        return {}
+
+    def terms(self, entry):
+        raise NotImplementedError
+
+    def add(self, position, entry):
+        with self._lock:
+            self._ensure_loaded()
+            terms = self._add(position, entry)
+            self._append_journal(position, terms)
+
+    def rebuild(self, entries):
+        with self._lock:
+            self._loaded = True
+            self.count = 0
+            self.postings = {}
+            self._sorted_terms = None
+            for position, entry in enumerate(entries):
+                self._add(position, entry)
+            self.save()
+
+    def ensure_synced(self, count, load_entries):
+        """Rebuild from load_entries() if the index does not cover exactly count entries"""
+        with self._lock:
+            self._ensure_loaded()
+            if self.count != count:
+                self.rebuild(load_entries())
+
+    def save(self):
+        with self._lock:
+            if self.index_file is None:
+                return
+            data = {
+                "version": self.VERSION,
+                "settings": self.settings(),
+                "count": self.count,
+                "postings": self.postings
+            }
+            tmp_file = self.index_file.with_suffix(self.index_file.suffix + ".tmp")
+            self.index_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                f.write(json.dumps(data, separators=(",", ":")))
+            os.replace(tmp_file, self.index_file)
+            # Everything in the journal is now part of the saved index
+            if self.journal_file.exists():
+                self.journal_file.unlink()
+            self._journal_records = 0
+
+    def _add(self, position, entry):
+        terms = sorted(set(self.terms(entry)))
+        for term in terms:
+            postings = self.postings.get(term)
+            if postings is None:
+                self.postings[term] = [position]
+                self._sorted_terms = None
+            elif postings[-1] < position:
+                postings.append(position)
+            elif not self._contains(postings, position):
+                bisect.insort(postings, position)
+        self.count = max(self.count, position + 1)
+        return terms
+
+    def _append_journal(self, position, terms):
+        if self.index_file is None:
+            return
+        self.index_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.journal_file, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"position": position, "terms": terms}) + "\n")
+        self._journal_records += 1
+        if self._journal_records >= max(self.journal_min_records, self.count // 4):
+            self.save()
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if self.index_file is None or not self.index_file.exists():
+            return
+        try:
+            with open(self.index_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"Error loading index {self.index_file.name}: {e}")
+            return
+        # A different format or term settings means the index has to be rebuilt
+        if data.get("version") != self.VERSION or data.get("settings") != self.settings():
+            return
+        self.count = data.get("count", 0)
+        self.postings = data.get("postings", {})
+        self._replay_journal()
+
+    def _replay_journal(self):
+        if not self.journal_file.exists():
+            return
+        with open(self.journal_file, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn last line from a crash mid-write, skip it
+                    continue
+                position = record["position"]
+                for term in record["terms"]:
+                    postings = self.postings.setdefault(term, [])
+                    if not postings or postings[-1] < position:
+                        postings.append(position)
+                self.count = max(self.count, position + 1)
+                self._journal_records += 1
+
+    @staticmethod
+    def _contains(postings, position):
+        i = bisect.bisect_left(postings, position)
+        return i < len(postings) and postings[i] == position
+
+
+class SearchIndex(PostingsIndex):
+    """Inverted index for full-text search over history or favorites entries.
+
+    Terms are the (optionally stemmed) words of the excuse, context, audience and
+    translation. A query intersects the posting lists of its words, shortest first,
+    and the last word also matches as a prefix so results show up while typing.
+    """
+
+    FIELDS = ("excuse", "context", "audience", "translation")
+
+    def __init__(self, index_file=None, stemming=True, journal_min_records=500):
+        self.stemming = stemming
+        super().__init__(index_file, journal_min_records)
+
+    def settings(self):
+        return {"stemming": self.stemming}
+
+    def terms(self, entry):
+        terms = []
+        for field in self.FIELDS:
+            terms.extend(tokenize(entry.get(field), self.stemming))
+        return terms
+
+    def search(self, query, limit=None):
+        """Return positions of entries matching every term of query, newest first"""
+        # Stop words are never indexed, so they are dropped before the last word is prefix-matched
+        tokens = [token for token in TOKEN_PATTERN.findall((query or "").lower()) if token not in STOP_WORDS]
+        with self._lock:
+            self._ensure_loaded()
+            lists = []
+            for i, token in enumerate(tokens):
+                if i == len(tokens) - 1 and len(token) > 1:
+                    postings = self._prefix_postings(token)
+                else:
+                    postings = self.postings.get(stem(token) if self.stemming else token, [])
+                if not postings:
+                    return []
+                lists.append(postings)
+            if not lists:
+                return []
+
+            if len(lists) == 1:
+                results = lists[0][::-1]
+            else:
+                lists.sort(key=len)
+                matches = set(lists[0])
+                for postings in lists[1:]:
+                    matches.intersection_update(postings)
+                results = sorted(matches, reverse=True)
+            return results if limit is None else results[:limit]
+
+    def _prefix_postings(self, token):
+        # Complete words are looked up directly (stemmed), partial ones through the sorted vocabulary
+        exact = self.postings.get(stem(token) if self.stemming else token, [])
+        if self._sorted_terms is None:
+            self._sorted_terms = sorted(self.postings)
+        start = bisect.bisect_left(self._sorted_terms, token)
+        matches = []
+        for term in self._sorted_terms[start:]:
+            if not term.startswith(token):
+                break
+            matches.append(self.postings[term])
+        if not matches:
+            return exact
+        if exact and not any(postings is exact for postings in matches):
+            matches.append(exact)
+        if len(matches) == 1:
+            return matches[0]
+        merged = set()
+        for postings in matches:
+            merged.update(postings)
+        return sorted(merged)
+
+
+def shingles(text, size=3):
+    """Set of overlapping word n-grams of text, lowercased"""
+    words = TOKEN_PATTERN.findall((text or "").lower())
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def minhash_signature(shingle_set, num_hashes):
+    """One-permutation MinHash: each shingle is hashed once into one of num_hashes bins.
+
+    Bins that stay empty borrow the value of the next filled bin (densification), so
+    two signatures still agree in roughly a Jaccard-similarity share of positions.
+    """
+    bins = [None] * num_hashes
+    for shingle in shingle_set:
+        # crc32 is stable across runs, unlike hash(); the multiply spreads it over the bins
+        value = (zlib.crc32(shingle.encode("utf-8")) * 0x9E3779B1) & 0xFFFFFFFF
+        slot = value % num_hashes
+        value //= num_hashes
+        if bins[slot] is None or value < bins[slot]:
+            bins[slot] = value
+    if not shingle_set:
+        return bins
+
+    signature = list(bins)
+    for slot in range(num_hashes):
+        distance = 1
+        while signature[slot] is None:
+            borrowed = bins[(slot + distance) % num_hashes]
+            if borrowed is not None:
+                signature[slot] = borrowed + distance * 0x4000000
+            distance += 1
+    return signature
+
+
+class DuplicateIndex(PostingsIndex):
+    """Locality-sensitive hashing index for spotting near-duplicate excuses.
+
+    Each excuse gets a MinHash signature over its word shingles, cut into bands; the
+    terms of an entry are its band hashes. Texts sharing any band are candidates and
+    are then compared exactly, so a lookup only touches a handful of entries however
+    long the history is. With 16 bands of 4 rows, pairs at 0.8 similarity are found
+    with probability above 99.9%.
+    """
+
+    def __init__(self, index_file=None, threshold=0.8, bands=16, rows=4, shingle_size=3,
+                 journal_min_records=500, max_candidates=50):
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = rows
+        self.shingle_size = shingle_size
+        self.max_candidates = max_candidates
+        super().__init__(index_file, journal_min_records)
+
+    def settings(self):
+        return {"bands": self.bands, "rows": self.rows, "shingle_size": self.shingle_size}
+
+    def terms(self, entry):
+        return self.band_keys(shingles(entry.get("excuse"), self.shingle_size))
+
+    def band_keys(self, shingle_set):
+        if not shingle_set:
+            return []
+        signature = minhash_signature(shingle_set, self.bands * self.rows)
+        keys = []
+        for band in range(self.bands):
+            values = signature[band * self.rows:(band + 1) * self.rows]
+            keys.append(f"{band}:{zlib.crc32(repr(values).encode()):x}")
+        return keys
+
+    def find(self, text, fetch_entries):
+        """Return (position, similarity) of the closest earlier near-duplicate of text, or None.
+
+        fetch_entries(positions) returns {position: entry}; positions that no longer
+        resolve to an entry are left out and skipped.
+        """
+        shingle_set = shingles(text, self.shingle_size)
+        with self._lock:
+            self._ensure_loaded()
+            candidates = set()
+            for key in self.band_keys(shingle_set):
+                # Only the newest entries of a band; a very common text must not make this linear
+                candidates.update(self.postings.get(key, ())[-self.max_candidates:])
+        if not candidates:
+            return None
+        # Newest candidates first, a bounded number of exact comparisons
+        positions = sorted(candidates, reverse=True)[:self.max_candidates]
+        best = None
+        entries = fetch_entries(positions)
+        for position in positions:
+            entry = entries.get(position)
+            if entry is None:
+                continue
+            similarity = jaccard(shingle_set, shingles(entry.get("excuse"), self.shingle_size))
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (position, similarity)
+        return best
+
+
+def merge_duplicates(entries, threshold=0.8):
+    """Collapse near-duplicate entries into the first one of each group.
+
+    Returns (merged_entries, removed_count). A kept entry records how many copies it
+    absorbed in "duplicates" and the newest copy's time in "last_seen"; ratings of
+    the group are averaged.
+    """
+    index = DuplicateIndex(threshold=threshold)
+    kept = []
+    ratings = []
+    removed = 0
+    for entry in entries:
+        match = index.find(entry.get("excuse"), lambda positions: {p: kept[p] for p in positions})
+        if match is None:
+            entry = {key: value for key, value in entry.items() if key != "duplicate_of"}
+            index.add(len(kept), entry)
+            kept.append(entry)
+            ratings.append([entry["effectiveness"]] if entry.get("effectiveness") is not None else [])
+            continue
+
+        position = match[0]
+        original = kept[position]
+        removed += 1
+        original["duplicates"] = original.get("duplicates", 0) + 1 + entry.get("duplicates", 0)
+        seen = entry.get("last_seen") or entry.get("timestamp")
+        if seen and seen > original.get("last_seen", original.get("timestamp", "")):
+            original["last_seen"] = seen
+        if entry.get("effectiveness") is not None:
+            ratings[position].append(entry["effectiveness"])
+            original["effectiveness"] = round(sum(ratings[position]) / len(ratings[position]))
+    return kept, removed
@@ -0,0 +1,194 @@
+import json
+import time
+import bisect
+import functools
+import threading
+
+
+# Latency bucket upper bounds in seconds: 0.1 ms to ~5 min, four buckets per doubling
+BUCKET_BOUNDS = [0.0001 * 2 ** (i / 4) for i in range(87)]
+
+
+def series_key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def format_labels(labels, extra=None):
+    items = list(labels) + (list(extra.items()) if extra else [])
+    if not items:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in items)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + "}"
+
+
+class Histogram:
+    """Counts of observed durations in fixed log-spaced buckets, plus count, sum and max"""
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.buckets[bisect.bisect_left(BUCKET_BOUNDS, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, pct):
+        """Estimate the pct-th percentile by interpolating inside its bucket"""
+        if not self.count:
+            return 0.0
+        rank = pct / 100 * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.buckets):
+            if bucket_count and seen + bucket_count >= rank:
+                lower = BUCKET_BOUNDS[i - 1] if i > 0 else 0.0
+                upper = BUCKET_BOUNDS[i] if i < len(BUCKET_BOUNDS) else self.max
+                estimate = lower + (upper - lower) * (rank - seen) / bucket_count
+                return min(estimate, self.max)
+            seen += bucket_count
+        return self.max
+
+
+class MetricsRegistry:
+    """Thread-safe registry of duration histograms and counters.
+
+    Series are identified by a metric name plus labels, e.g. the histogram
+    excuse_call_duration_seconds{method="ExcuseGenerator.translate_excuse"}. The
+    registry can be rendered in the Prometheus text format or as JSON lines.
+    """
+
+    def __init__(self, prefix="excuse_"):
+        self.prefix = prefix
+        self.histograms = {}
+        self.counters = {}
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def observe(self, name, seconds, **labels):
+        key = series_key(self.prefix + name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def increment(self, name, amount=1, **labels):
+        key = series_key(self.prefix + name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def timer(self, name, **labels):
+        """Context manager that observes the duration of its block"""
+        return _Timer(self, name, labels)
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+            self.counters = {}
+            self.started = time.time()
+
+    def summary(self):
+        """[(name, labels, count, sum, p50, p95, p99, max), ...] for every histogram"""
+        with self._lock:
+            rows = []
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                rows.append((
+                    name, dict(labels), histogram.count, histogram.sum,
+                    histogram.percentile(50), histogram.percentile(95), histogram.percentile(99), histogram.max
+                ))
+            return rows
+
+    def counter_values(self):
+        with self._lock:
+            return [(name, dict(labels), value) for (name, labels), value in sorted(self.counters.items())]
+
+    def to_prometheus(self):
+        lines = []
+        with self._lock:
+            histograms = sorted(self.histograms.items())
+            counters = sorted(self.counters.items())
+            typed = set()
+            for (name, labels), histogram in histograms:
+                if name not in typed:
+                    lines.append(f"# TYPE {name} histogram")
+                    typed.add(name)
+                cumulative = 0
+                for bound, bucket_count in zip(BUCKET_BOUNDS, histogram.buckets):
+                    cumulative += bucket_count
+                    # Empty leading buckets add nothing for readers, skip them
+                    if cumulative:
+                        lines.append(f"{name}_bucket{format_labels(labels, {'le': f'{bound:.6g}'})} {cumulative}")
+                lines.append(f"{name}_bucket{format_labels(labels, {'le': '+Inf'})} {histogram.count}")
+                lines.append(f"{name}_sum{format_labels(labels)} {histogram.sum:.6f}")
+                lines.append(f"{name}_count{format_labels(labels)} {histogram.count}")
+            for (name, labels), value in counters:
+                if name not in typed:
+                    lines.append(f"# TYPE {name} counter")
+                    typed.add(name)
+                lines.append(f"{name}{format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def to_json_lines(self, timestamp=None):
+        timestamp = timestamp or time.time()
+        lines = []
+        for name, labels, count, total, p50, p95, p99, maximum in self.summary():
+            lines.append(json.dumps({
+                "timestamp": timestamp, "type": "histogram", "name": name, "labels": labels,
+                "count": count, "sum": total, "p50": p50, "p95": p95, "p99": p99, "max": maximum
+            }))
+        for name, labels, value in self.counter_values():
+            lines.append(json.dumps({
+                "timestamp": timestamp, "type": "counter", "name": name, "labels": labels, "value": value
+            }))
+        return "\n".join(lines) + ("\n" if lines else "")
+
+
+class _Timer:
+    def __init__(self, registry, name, labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.registry.observe(self.name, time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+# Registry shared by the whole application
+REGISTRY = MetricsRegistry()
+
+
+def instrument(method, failed=None, registry=None):
+    """Decorator recording duration, calls and errors of a function under method=<method>.
+
+    Raised exceptions count as errors, and so do results for which failed(result) is true
+    (for functions that report errors as return values).
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            target = registry or REGISTRY
+            start = time.perf_counter()
+            error = False
+            try:
+                result = func(*args, **kwargs)
+                error = failed is not None and failed(result)
+                return result
+            except Exception:
+                error = True
+                raise
+            finally:
+                target.observe("call_duration_seconds", time.perf_counter() - start, method=method)
+                target.increment("calls_total", method=method)
+                if error:
+                    target.increment("errors_total", method=method)
+        return wrapper
+    return decorator
@@ -0,0 +1,473 @@
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import argparse
+import datetime
+import functools
+import threading
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from metrics import instrument
+
+
+PROOF_TYPES = ["Doctor's Note", "Email Screenshot", "Receipt", "Ticket", "Other"]
+EXPORT_FORMATS = ["png", "pdf"]
+# Pixel sizes below are for 150 dpi, so an A4 page is 1240 x 1754
+DPI = 150
+
+# Tried in order; Pillow looks these up in the system font folders
+FONT_FILES = {
+    "regular": ["DejaVuSans.ttf", "arial.ttf", "Arial.ttf", "LiberationSans-Regular.ttf", "Helvetica.ttc"],
+    "bold": ["DejaVuSans-Bold.ttf", "arialbd.ttf", "Arial Bold.ttf", "LiberationSans-Bold.ttf", "Helvetica.ttc"],
+    "serif": ["DejaVuSerif.ttf", "times.ttf", "Times New Roman.ttf", "LiberationSerif-Regular.ttf"],
+    "mono": ["DejaVuSansMono.ttf", "cour.ttf", "Courier New.ttf", "LiberationMono-Regular.ttf"],
+}
+
+# Per-type layout: page size, colors, body font and the box the body text is fitted into
+TEMPLATES = {
+    "Doctor's Note": {
+        "size": (1240, 1754), "background": "#ffffff", "accent": "#1f6f8b", "ink": "#222222",
+        "font": "serif", "font_size": 30, "body": (120, 430, 1120, 1380),
+    },
+    "Email Screenshot": {
+        "size": (1400, 1000), "background": "#ffffff", "accent": "#e8eaed", "ink": "#202124",
+        "font": "regular", "font_size": 26, "body": (60, 330, 1340, 960),
+    },
+    "Receipt": {
+        "size": (640, 1100), "background": "#fbfaf5", "accent": "#333333", "ink": "#1a1a1a",
+        "font": "mono", "font_size": 22, "body": (40, 190, 600, 1040),
+    },
+    "Ticket": {
+        "size": (1600, 620), "background": "#fff8e7", "accent": "#c0392b", "ink": "#2b2b2b",
+        "font": "regular", "font_size": 26, "body": (70, 210, 1160, 570),
+    },
+    "Other": {
+        "size": (1240, 1754), "background": "#ffffff", "accent": "#555555", "ink": "#222222",
+        "font": "regular", "font_size": 28, "body": (120, 260, 1120, 1620),
+    },
+}
+# Ticket stub starts here; the perforation is drawn along it
+TICKET_STUB_X = 1220
+RECEIPT_MIN_HEIGHT = 500
+MIN_FONT_SIZE = 14
+EMAIL_HEADERS = ("From", "To", "Cc", "Date", "Subject")
+PRICE_PATTERN = re.compile(r"^(.*?)[\s.:]*((?:[$€£]\s?)?\d[\d,]*\.\d{2})\s*$")
+
+
+@functools.lru_cache(maxsize=64)
+def load_font(style, size):
+    """TrueType font for style at size, loaded once per process"""
+    from PIL import ImageFont
+    for name in FONT_FILES.get(style, FONT_FILES["regular"]):
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    return ImageFont.load_default(size)
+
+
+def clean_text(text):
+    """Drop Markdown emphasis and headings the model likes to add"""
+    lines = []
+    for line in (text or "").replace("\r\n", "\n").split("\n"):
+        line = re.sub(r"^\s*#+\s*", "", line)
+        line = re.sub(r"^\s*[*-]\s+(?=\S)", "• ", line)
+        lines.append(line.replace("**", "").replace("__", ""))
+    return "\n".join(lines).strip()
+
+
+def wrap_text(text, font, width):
+    lines = []
+    for paragraph in text.split("\n"):
+        words = paragraph.split()
+        if not words:
+            lines.append("")
+            continue
+        line = words[0]
+        for word in words[1:]:
+            candidate = f"{line} {word}"
+            if font.getlength(candidate) <= width:
+                line = candidate
+            else:
+                lines.append(line)
+                line = word
+        lines.append(line)
+    return lines
+
+
+def draw_text_box(draw, text, box, style, size, fill):
+    """Draw wrapped text into box, shrinking the font until it fits; returns the bottom y"""
+    x0, y0, x1, y1 = box
+    while True:
+        font = load_font(style, size)
+        line_height = int(size * 1.45)
+        lines = wrap_text(text, font, x1 - x0)
+        if len(lines) * line_height <= y1 - y0 or size <= MIN_FONT_SIZE:
+            break
+        size -= 2
+    fitting = max(1, (y1 - y0) // line_height)
+    if len(lines) > fitting:
+        lines = lines[:fitting]
+        lines[-1] = lines[-1].rstrip(" .") + "..."
+    y = y0
+    for line in lines:
+        draw.text((x0, y), line, font=font, fill=fill)
+        y += line_height
+    return y
+
+
+def split_headers(text, names):
+    """Pull "Name: value" lines off the top of text; returns (headers, remaining text)"""
+    headers = {}
+    lines = text.split("\n")
+    while lines:
+        match = re.match(r"^\s*([A-Za-z]+)\s*:\s*(.*)$", lines[0])
+        if match and match.group(1).capitalize() in names:
+            headers[match.group(1).capitalize()] = match.group(2).strip()
+            lines.pop(0)
+        elif not lines[0].strip() and headers:
+            lines.pop(0)
+        else:
+            break
+    return headers, "\n".join(lines).strip()
+
+
+def paint_doctors_note(draw, template):
+    width, height = template["size"]
+    accent = template["accent"]
+    draw.rectangle((0, 0, width, 190), fill=accent)
+    draw.text((120, 50), "City Medical Centre", font=load_font("bold", 54), fill="#ffffff")
+    draw.text((120, 120), "General Practice & Family Medicine", font=load_font("regular", 26), fill="#d6ecf3")
+    # Red cross on the letterhead
+    cx, cy = width - 190, 95
+    draw.rectangle((cx - 55, cy - 55, cx + 55, cy + 55), fill="#ffffff")
+    draw.rectangle((cx - 14, cy - 42, cx + 14, cy + 42), fill="#d0312d")
+    draw.rectangle((cx - 42, cy - 14, cx + 42, cy + 14), fill="#d0312d")
+    title_font = load_font("bold", 44)
+    title = "MEDICAL CERTIFICATE"
+    draw.text(((width - title_font.getlength(title)) / 2, 255), title, font=title_font, fill=template["ink"])
+    draw.line((120, 330, width - 120, 330), fill=accent, width=3)
+    # Signature and stamp
+    draw.line((120, 1530, 560, 1530), fill=template["ink"], width=2)
+    draw.text((120, 1545), "Attending Physician", font=load_font("regular", 24), fill="#555555")
+    draw.ellipse((880, 1420, 1100, 1640), outline=accent, width=5)
+    draw.text((912, 1515), "VERIFIED", font=load_font("bold", 30), fill=accent)
+    draw.line((0, height - 60, width, height - 60), fill=accent, width=2)
+
+
+def paint_email(draw, template):
+    width, height = template["size"]
+    draw.rectangle((0, 0, width, 64), fill=template["accent"])
+    for i, color in enumerate(("#ff5f57", "#febc2e", "#28c840")):
+        x = 30 + i * 34
+        draw.ellipse((x, 22, x + 20, 42), fill=color)
+    draw.rounded_rectangle((300, 14, width - 300, 50), radius=12, fill="#ffffff")
+    draw.text((320, 19), "Inbox", font=load_font("regular", 22), fill="#5f6368")
+    draw.line((60, 305, width - 60, 305), fill="#dadce0", width=2)
+
+
+def paint_receipt(draw, template):
+    width, _ = template["size"]
+    draw.text((40, 40), "*" * 36, font=load_font("mono", 22), fill="#999999")
+    draw.line((40, 170, width - 40, 170), fill=template["accent"], width=2)
+
+
+def paint_ticket(draw, template):
+    width, height = template["size"]
+    accent = template["accent"]
+    draw.rectangle((0, 0, width, 150), fill=accent)
+    draw.text((70, 45), "ADMIT ONE", font=load_font("bold", 56), fill="#ffffff")
+    # Perforation between the ticket and its stub, with notches at both ends
+    for y in range(170, height - 20, 24):
+        draw.line((TICKET_STUB_X, y, TICKET_STUB_X, y + 12), fill="#999999", width=3)
+    draw.ellipse((TICKET_STUB_X - 30, -30, TICKET_STUB_X + 30, 30), fill="#ffffff")
+    draw.ellipse((TICKET_STUB_X - 30, height - 30, TICKET_STUB_X + 30, height + 30), fill="#ffffff")
+    draw.rectangle((0, 0, width - 1, height - 1), outline=accent, width=4)
+
+
+def paint_document(draw, template):
+    width, _ = template["size"]
+    draw.rectangle((120, 120, width - 120, 128), fill=template["accent"])
+
+
+PAINTERS = {
+    "Doctor's Note": paint_doctors_note,
+    "Email Screenshot": paint_email,
+    "Receipt": paint_receipt,
+    "Ticket": paint_ticket,
+    "Other": paint_document,
+}
+
+
+@functools.lru_cache(maxsize=None)
+def template_background(proof_type):
+    """Static part of a template (page, letterhead, frames), drawn once per process"""
+    from PIL import Image, ImageDraw
+    template = TEMPLATES[proof_type]
+    image = Image.new("RGB", template["size"], template["background"])
+    PAINTERS[proof_type](ImageDraw.Draw(image), template)
+    return image
+
+
+def render_doctors_note(image, draw, template, text, date):
+    date_font = load_font("regular", 26)
+    label = f"Date: {date}"
+    draw.text((image.width - 120 - date_font.getlength(label), 360), label, font=date_font, fill=template["ink"])
+    draw_text_box(draw, text, template["body"], template["font"], template["font_size"], template["ink"])
+
+
+def render_email(image, draw, template, text, date):
+    headers, body = split_headers(text, EMAIL_HEADERS)
+    subject = headers.pop("Subject", "") or "(no subject)"
+    draw.text((60, 100), subject, font=load_font("bold", 38), fill=template["ink"])
+    headers.setdefault("Date", date)
+    y = 170
+    label_font = load_font("bold", 22)
+    value_font = load_font("regular", 22)
+    for name in EMAIL_HEADERS:
+        if name in headers and y < 290:
+            draw.text((60, y), f"{name}:", font=label_font, fill="#5f6368")
+            draw.text((160, y), headers[name], font=value_font, fill=template["ink"])
+            y += 36
+    draw_text_box(draw, body, template["body"], template["font"], template["font_size"], template["ink"])
+
+
+def render_receipt(image, draw, template, text, date):
+    # Receipts are as long as their content instead of shrinking the font
+    from PIL import Image, ImageDraw
+    font = load_font("mono", template["font_size"])
+    x0, y0, x1, _ = template["body"]
+    line_height = int(template["font_size"] * 1.45)
+    lines = text.split("\n")
+    title = lines.pop(0).strip() if lines else "RECEIPT"
+    rows = []
+    for line in lines:
+        match = PRICE_PATTERN.match(line)
+        if match and match.group(1).strip():
+            rows.append(("price", match.group(1).strip(), match.group(2)))
+        elif line.strip() and set(line.strip()) <= set("-=_*"):
+            rows.append(("rule", "", ""))
+        else:
+            rows.extend(("text", wrapped, "") for wrapped in wrap_text(line, font, x1 - x0))
+    rows.extend([("rule", "", ""), ("text", date, "")])
+    height = max(RECEIPT_MIN_HEIGHT, y0 + len(rows) * line_height + 80)
+    if height != image.height:
+        resized = Image.new("RGB", (image.width, height), template["background"])
+        resized.paste(image.crop((0, 0, image.width, min(height, image.height))), (0, 0))
+        image = resized
+        draw = ImageDraw.Draw(image)
+    title_font = load_font("bold", 30)
+    draw.text(((image.width - title_font.getlength(title)) / 2, 100), title, font=title_font, fill=template["ink"])
+    y = y0
+    for kind, left, right in rows:
+        if kind == "rule":
+            draw.text((x0, y), "-" * int((x1 - x0) // font.getlength("-")), font=font, fill="#777777")
+        else:
+            draw.text((x0, y), left, font=font, fill=template["ink"])
+            if right:
+                draw.text((x1 - font.getlength(right), y), right, font=font, fill=template["ink"])
+        y += line_height
+    # Torn edge at the bottom
+    for x in range(0, image.width, 20):
+        draw.polygon([(x, image.height), (x + 10, image.height - 14), (x + 20, image.height)], fill="#d8d4c8")
+    return image
+
+
+def render_ticket(image, draw, template, text, date):
+    lines = text.split("\n", 1)
+    title = lines[0].strip()
+    body = lines[1].strip() if len(lines) > 1 else ""
+    x0, y0, x1, y1 = template["body"]
+    title_bottom = draw_text_box(draw, title, (x0, 170, x1, 260), "bold", 40, template["ink"])
+    draw_text_box(draw, body, (x0, max(y0, title_bottom + 10), x1, y1), template["font"], template["font_size"],
+                  template["ink"])
+    # Stub: date, a ticket number and a barcode that follow from the text
+    digest = hashlib.sha256(text.encode("utf-8")).digest()
+    stub_font = load_font("bold", 24)
+    draw.text((TICKET_STUB_X + 50, 50), "TICKET", font=load_font("bold", 40), fill="#ffffff")
+    draw.text((TICKET_STUB_X + 50, 180), date, font=stub_font, fill=template["ink"])
+    draw.text((TICKET_STUB_X + 50, 220), f"No. {int.from_bytes(digest[:4], 'big') % 10 ** 8:08d}",
+              font=stub_font, fill=template["ink"])
+    x = TICKET_STUB_X + 50
+    for byte in digest * 2:
+        bar = 2 + byte % 4
+        if x + bar > image.width - 50:
+            break
+        draw.rectangle((x, 300, x + bar - 1, 540), fill="#111111")
+        x += bar + 2 + (byte >> 6)
+
+
+def render_document(image, draw, template, text, date):
+    date_font = load_font("regular", 24)
+    draw.text((image.width - 120 - date_font.getlength(date), 160), date, font=date_font, fill="#555555")
+    draw_text_box(draw, text, template["body"], template["font"], template["font_size"], template["ink"])
+
+
+RENDERERS = {
+    "Doctor's Note": render_doctors_note,
+    "Email Screenshot": render_email,
+    "Receipt": render_receipt,
+    "Ticket": render_ticket,
+    "Other": render_document,
+}
+
+
+def render_proof(text, proof_type, date=None):
+    """Render proof text onto the template for proof_type and return a PIL image"""
+    from PIL import ImageDraw
+    if proof_type not in TEMPLATES:
+        proof_type = "Other"
+    date = date or datetime.date.today().strftime("%B %d, %Y")
+    image = template_background(proof_type).copy()
+    draw = ImageDraw.Draw(image)
+    # Only the receipt replaces the image, to fit the page to its length
+    result = RENDERERS[proof_type](image, draw, TEMPLATES[proof_type], clean_text(text), date)
+    return result or image
+
+
+def save_proof(image, path):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.suffix.lower() == ".pdf":
+        image.save(path, "PDF", resolution=DPI)
+    else:
+        image.save(path, "PNG")
+    return path
+
+
+def render_job(job):
+    """Render one {"text", "proof_type", "path", "date"} job to its file.
+
+    Top-level so process pool workers can run it; each worker keeps its own font and
+    template caches warm across jobs.
+    """
+    save_proof(render_proof(job["text"], job.get("proof_type", "Other"), job.get("date")), job["path"])
+    return str(job["path"])
+
+
+class ProofRenderer:
+    """Renders proofs to PNG or PDF files under output_dir.
+
+    Single proofs render in the calling thread. Batches go to a pool of worker
+    processes, started on first use and kept for later batches, so rendering uses
+    every core and never holds the GIL the Tk main loop needs.
+    """
+
+    def __init__(self, output_dir, workers=None):
+        self.output_dir = Path(output_dir)
+        self.workers = workers or os.cpu_count() or 1
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def output_path(self, proof_type, fmt="png", name=None):
+        slug = re.sub(r"[^a-z0-9]+", "-", proof_type.lower()).strip("-")
+        name = name or datetime.datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        return self.output_dir / f"{slug}-{name}.{fmt}"
+
+    @instrument("ProofRenderer.render")
+    def render(self, text, proof_type, fmt="png", path=None, date=None):
+        path = path or self.output_path(proof_type, fmt)
+        return save_proof(render_proof(text, proof_type, date), path)
+
+    @property
+    def pool(self):
+        with self._lock:
+            if self._pool is None:
+                # Spawned, not forked: the app has Tk and worker threads running
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    @instrument("ProofRenderer.render_batch")
+    def render_batch(self, jobs, on_progress=None):
+        """Render jobs ({"text", "proof_type", "format" or "path"}) in the process pool.
+
+        Returns one (path, error) pair per job in input order; on_progress(done, total)
+        is called from this thread as jobs finish.
+        """
+        jobs = [dict(job) for job in jobs]
+        for i, job in enumerate(jobs):
+            if "path" not in job:
+                job["path"] = str(self.output_path(job.get("proof_type", "Other"), job.get("format", "png"),
+                                                   name=f"{i + 1:05d}"))
+        results = [None] * len(jobs)
+        if not jobs:
+            return results
+        futures = {self.pool.submit(render_job, job): i for i, job in enumerate(jobs)}
+        broken = False
+        for done, future in enumerate(as_completed(futures), 1):
+            try:
+                results[futures[future]] = (future.result(), None)
+            except BrokenProcessPool as e:
+                broken = True
+                results[futures[future]] = (None, e)
+            except Exception as e:
+                results[futures[future]] = (None, e)
+            if on_progress is not None:
+                on_progress(done, len(jobs))
+        if broken:
+            # A worker died (e.g. out of memory); start a fresh pool next time
+            self.close()
+        return results
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(cancel_futures=True)
+                self._pool = None
+
+
+def read_jobs(path, proof_type, fmt):
+    """Jobs from a JSON Lines file with "text" (or "proof"/"excuse") and optional "proof_type" per line"""
+    jobs = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            text = record.get("text") or record.get("proof") or record.get("excuse")
+            if not text or record.get("ok") is False:
+                continue
+            jobs.append({"text": text, "proof_type": record.get("proof_type", proof_type), "format": fmt})
+    return jobs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render proof documents to PNG or PDF")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    render_parser = subparsers.add_parser("render", help="Render every line of a JSON Lines file")
+    render_parser.add_argument("input", help="JSON Lines with a text, proof or excuse field (e.g. batch output)")
+    render_parser.add_argument("-o", "--output-dir", default="data/proofs")
+    render_parser.add_argument("--type", dest="proof_type", choices=PROOF_TYPES, default="Other",
+                               help="Proof type for lines without a proof_type field")
+    render_parser.add_argument("--format", choices=EXPORT_FORMATS, default="png")
+    render_parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    jobs = read_jobs(args.input, args.proof_type, args.format)
+    renderer = ProofRenderer(args.output_dir, args.workers)
+    start = time.perf_counter()
+    try:
+        results = renderer.render_batch(
+            jobs, on_progress=lambda done, total: print(f"{done}/{total}", end="\r", file=sys.stderr)
+        )
+    finally:
+        renderer.close()
+    if jobs:
+        print(file=sys.stderr)
+    failed = [error for _, error in results if error is not None]
+    for error in failed[:5]:
+        print(f"Error rendering proof: {error}", file=sys.stderr)
+    elapsed = time.perf_counter() - start
+    print(f"Rendered {len(jobs) - len(failed)} of {len(jobs)} proofs to {args.output_dir} in {elapsed:.1f}s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,262 @@
+import time
+import random
+import threading
+
+from backends import BackendError, CandidatesUnsupportedError, ModelBackend, TranslationBackend
+from metrics import REGISTRY
+
+
+# Exception class names used by google-api-core for errors worth retrying
+RETRYABLE_ERROR_NAMES = {
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "InternalServerError",
+    "DeadlineExceeded", "GatewayTimeout", "BadGateway", "Aborted", "ConnectionError",
+    "Timeout", "TimeoutError", "ReadTimeout", "ConnectTimeout"
+}
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+RETRYABLE_KINDS = {"rate_limit", "server", "timeout"}
+
+
+class CircuitOpenError(BackendError):
+    def __init__(self, name, retry_in):
+        super().__init__(f"{name} is unavailable after repeated failures, retrying in {retry_in:.0f}s", "circuit_open")
+
+
+class RateLimitedError(BackendError):
+    def __init__(self, name, wait):
+        super().__init__(f"{name} request quota reached, next slot in {wait:.0f}s", "rate_limit")
+
+
+class ErrorResult(str):
+    """Failed result of a generator method.
+
+    It is still the "Error ..." text the UI shows, so existing callers keep working,
+    but it can be told apart from a real excuse with isinstance(result, ErrorResult),
+    and it is never saved to history or favorites.
+    """
+
+    def __new__(cls, message, error=None):
+        result = super().__new__(cls, message)
+        result.error = error
+        result.kind = error_kind(error) if error is not None else "error"
+        result.retryable = is_retryable(error) if error is not None else False
+        return result
+
+
+def error_kind(error):
+    if isinstance(error, BackendError):
+        return error.kind
+    code = getattr(error, "code", None)
+    if code == 429 or type(error).__name__ in ("ResourceExhausted", "TooManyRequests"):
+        return "rate_limit"
+    if isinstance(error, TimeoutError) or "Timeout" in type(error).__name__:
+        return "timeout"
+    if code in RETRYABLE_STATUS_CODES or type(error).__name__ in RETRYABLE_ERROR_NAMES:
+        return "server"
+    return "error"
+
+
+def is_retryable(error):
+    if isinstance(error, (CircuitOpenError, RateLimitedError)):
+        return False
+    if isinstance(error, BackendError):
+        return error.kind in RETRYABLE_KINDS
+    return error_kind(error) in RETRYABLE_KINDS
+
+
+class TokenBucket:
+    """Client-side rate limiter: rate_per_minute tokens refill continuously up to burst.
+
+    A caller takes a token or reserves the next one and sleeps until it is due, so
+    waiting callers are served in order. If the wait would exceed max_wait the call
+    is refused with RateLimitedError instead.
+    """
+
+    def __init__(self, rate_per_minute, burst=None, name="backend"):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst or max(1, int(rate_per_minute // 4))
+        self.name = name
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, max_wait=None):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+            if max_wait is not None and wait > max_wait:
+                raise RateLimitedError(self.name, wait)
+            self.tokens -= 1
+        if wait > 0:
+            REGISTRY.observe("rate_limit_wait_seconds", wait, backend=self.name)
+            time.sleep(wait)
+        return wait
+
+
+class CircuitBreaker:
+    """Fails fast after failure_threshold consecutive failures.
+
+    While open every call is refused for reset_timeout seconds; then one trial call is
+    let through (half-open) and its outcome closes or re-opens the circuit.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, name="backend"):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.name = name
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == self.OPEN:
+                elapsed = time.monotonic() - self.opened_at
+                if elapsed < self.reset_timeout:
+                    REGISTRY.increment("circuit_rejected_total", backend=self.name)
+                    raise CircuitOpenError(self.name, self.reset_timeout - elapsed)
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN:
+                if self._trial_running:
+                    REGISTRY.increment("circuit_rejected_total", backend=self.name)
+                    raise CircuitOpenError(self.name, self.reset_timeout)
+                self._trial_running = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._trial_running = False
+            self.state = self.CLOSED
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    REGISTRY.increment("circuit_opened_total", backend=self.name)
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def release(self, reached_service=True):
+        # A call that failed for its own reasons (bad input) still shows the service answers;
+        # one refused before it was sent shows nothing, so the next call becomes the trial
+        with self._lock:
+            self._trial_running = False
+            if self.state == self.HALF_OPEN and reached_service:
+                self.state = self.CLOSED
+
+
+class ResilientCaller:
+    """Runs calls through a rate limiter, a circuit breaker and retries with backoff.
+
+    Retryable failures (rate limits, server errors, timeouts) are retried up to
+    max_attempts times, sleeping a random time up to base_delay * 2^attempt ("full
+    jitter", capped at max_delay) in between, and count towards opening the circuit.
+    Other errors are raised straight away.
+    """
+
+    def __init__(self, name, limiter=None, breaker=None, max_attempts=4, base_delay=1.0, max_delay=30.0,
+                 max_wait=30.0, seed=None):
+        self.name = name
+        self.limiter = limiter
+        self.breaker = breaker or CircuitBreaker(name=name)
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_wait = max_wait
+        self._random = random.Random(seed)
+
+    def backoff(self, attempt):
+        return self._random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(self, func, *args):
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            if self.limiter is not None:
+                try:
+                    self.limiter.acquire(self.max_wait)
+                except RateLimitedError:
+                    self.breaker.release(reached_service=False)
+                    raise
+            try:
+                result = func(*args)
+            except Exception as e:
+                if not is_retryable(e):
+                    self.breaker.release()
+                    raise
+                self.breaker.record_failure()
+                attempt += 1
+                if attempt >= self.max_attempts:
+                    raise
+                REGISTRY.increment("retries_total", backend=self.name, kind=error_kind(e))
+                time.sleep(self.backoff(attempt - 1))
+                continue
+            self.breaker.record_success()
+            return result
+
+
+class ResilientModelBackend(ModelBackend):
+    """ModelBackend wrapper that sends every call through a ResilientCaller"""
+
+    def __init__(self, backend, caller):
+        self.backend = backend
+        self.caller = caller
+        self.name = backend.name
+
+    def generate(self, prompt, generation_config=None):
+        return self.caller.call(self.backend.generate, prompt, generation_config)
+
+    def generate_candidates(self, prompt, count, generation_config=None):
+        # A fan-out of single requests has to pass the limiter and breaker request by request
+        if type(self.backend).generate_candidates is not ModelBackend.generate_candidates:
+            try:
+                return self.caller.call(self.backend.generate_candidates, prompt, count, generation_config)
+            except CandidatesUnsupportedError:
+                pass
+        return super().generate_candidates(prompt, count, generation_config)
+
+    def stream(self, prompt, generation_config=None):
+        # Retrying is only safe until the first chunk has been passed on
+        chunks = []
+
+        def first_chunk():
+            iterator = iter(self.backend.stream(prompt, generation_config))
+            chunks.append(next(iterator, None))
+            return iterator
+
+        iterator = self.caller.call(first_chunk)
+        if chunks[-1] is None:
+            return
+        yield chunks[-1]
+        for chunk in iterator:
+            yield chunk
+
+
+class ResilientTranslator:
+    def __init__(self, translator, caller):
+        self.translator = translator
+        self.caller = caller
+
+    def translate(self, text):
+        return self.caller.call(self.translator.translate, text)
+
+
+class ResilientTranslationBackend(TranslationBackend):
+    """TranslationBackend wrapper whose translators share one ResilientCaller"""
+
+    def __init__(self, backend, caller):
+        self.backend = backend
+        self.caller = caller
+        self.name = backend.name
+
+    def translator(self, language_code):
+        return ResilientTranslator(self.backend.translator(language_code), self.caller)
@@ -0,0 +1,237 @@
+import os
+import sys
+import wave
+import queue
+import shutil
+import hashlib
+import itertools
+import threading
+import subprocess
+from pathlib import Path
+from concurrent.futures import Future
+
+from metrics import REGISTRY
+
+
+# Queue priorities: playback always goes before pre-rendering
+SPEAK = 0
+RENDER = 1
+STOP = -1
+
+# Command-line players for cached audio files, tried in order (Windows uses winsound)
+PLAYERS = [
+    ["afplay"],
+    ["paplay"],
+    ["aplay", "-q"],
+    ["ffplay", "-nodisp", "-autoexit", "-loglevel", "quiet"],
+]
+
+
+def speech_cache_key(text, voice, rate):
+    return hashlib.sha256(f"{voice}\0{rate}\0{text}".encode("utf-8")).hexdigest()[:32]
+
+
+def find_player():
+    if sys.platform == "win32":
+        return ["winsound"]
+    for command in PLAYERS:
+        if shutil.which(command[0]):
+            return command
+    return None
+
+
+def wav_duration(path):
+    try:
+        with wave.open(str(path), "rb") as f:
+            return f.getnframes() / float(f.getframerate())
+    except (wave.Error, EOFError, OSError):
+        return None
+
+
+class SpeechWorker:
+    """Single thread that owns the pyttsx3 engine and plays speech requests in order.
+
+    pyttsx3 engines must stay on one thread, so every request goes through a queue.
+    speak() interrupts whatever is playing by default; skip() only ends the current
+    utterance and stop() also drops queued ones. Spoken texts are synthesized to WAV
+    files keyed by (text hash, voice, rate), so playing the same text again starts
+    instantly from the file. prerender() fills that cache at low priority, e.g. with
+    the favorites while the app is idle.
+    """
+
+    def __init__(self, cache_dir, engine_factory, voice=None, rate=None, max_cache_files=500, player=None):
+        self.cache_dir = Path(cache_dir)
+        self.engine_factory = engine_factory
+        self.voice = voice
+        self.rate = rate
+        self.max_cache_files = max_cache_files
+        self.player = player if player is not None else find_player()
+        self.current = None
+        self._rendering = False
+        self._engine = None
+        self._queue = queue.PriorityQueue()
+        self._order = itertools.count()
+        self._generation = 0
+        self._interrupt = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def cache_path(self, text):
+        return self.cache_dir / f"{speech_cache_key(text, self.voice or 'default', self.rate or 'default')}.wav"
+
+    def speak(self, text, interrupt=True):
+        """Queue text for playback; the future resolves to True once it has been spoken
+        and to False if it was skipped or stopped first"""
+        if interrupt:
+            self.stop()
+        future = Future()
+        self._put(SPEAK, ("speak", text, future, self._generation))
+        return future
+
+    def prerender(self, texts):
+        """Synthesize texts into the cache when nothing is waiting to be spoken"""
+        if not self.player:
+            # Nothing could play the files back
+            return 0
+        queued = 0
+        for text in texts:
+            if text and not self.cache_path(text).exists():
+                self._put(RENDER, ("render", text, None, None))
+                queued += 1
+        return queued
+
+    def skip(self):
+        self._interrupt.set()
+
+    def stop(self):
+        with self._lock:
+            self._generation += 1
+        self._interrupt.set()
+
+    def close(self, timeout=5):
+        self.stop()
+        if self._thread is not None:
+            self._put(STOP, None)
+            self._thread.join(timeout)
+
+    def _put(self, priority, job):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="speech", daemon=True)
+                self._thread.start()
+        self._queue.put((priority, next(self._order), job))
+
+    @property
+    def engine(self):
+        # Created on the worker thread, which is the only one that touches it
+        if self._engine is None:
+            engine = self.engine_factory()
+            if self.voice:
+                engine.setProperty("voice", self.voice)
+            if self.rate:
+                engine.setProperty("rate", int(self.rate))
+            engine.connect("started-word", self._on_word)
+            self._engine = engine
+        return self._engine
+
+    def _on_word(self, name, location, length):
+        # A file being rendered is finished anyway, a cut-off one would be cached
+        if self._interrupt.is_set() and not self._rendering:
+            self._engine.stop()
+
+    def _run(self):
+        while True:
+            _, _, job = self._queue.get()
+            if job is None:
+                return
+            kind, text, future, generation = job
+            if kind == "render":
+                try:
+                    self._render(text)
+                except Exception as e:
+                    print(f"Error pre-rendering speech: {e}")
+                continue
+            if not future.set_running_or_notify_cancel():
+                continue
+            self._interrupt.clear()
+            if generation != self._generation:
+                # Stopped while it was waiting in the queue
+                future.set_result(False)
+                continue
+            self.current = text
+            try:
+                future.set_result(self._speak(text))
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                self.current = None
+
+    def _speak(self, text):
+        path = self.cache_path(text)
+        if self.player and path.exists():
+            REGISTRY.increment("cache_hits_total", cache="speech")
+            os.utime(path)
+            with REGISTRY.timer("speech_duration_seconds", source="cache"):
+                return self._play(path)
+        REGISTRY.increment("cache_misses_total", cache="speech")
+        # Speak right away and keep a file for next time
+        with REGISTRY.timer("speech_duration_seconds", source="engine"):
+            spoken = self._say(text)
+        if self.player and spoken:
+            self._put(RENDER, ("render", text, None, None))
+        return spoken
+
+    def _say(self, text):
+        engine = self.engine
+        engine.say(text)
+        engine.runAndWait()
+        return not self._interrupt.is_set()
+
+    def _render(self, text):
+        path = self.cache_path(text)
+        if path.exists():
+            return
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        partial = path.with_name(f"{path.stem}.partial.wav")
+        engine = self.engine
+        self._rendering = True
+        try:
+            with REGISTRY.timer("speech_render_seconds"):
+                engine.save_to_file(text, str(partial))
+                engine.runAndWait()
+        finally:
+            self._rendering = False
+        if partial.exists() and partial.stat().st_size > 0:
+            os.replace(partial, path)
+            self._prune()
+
+    def _play(self, path):
+        if self.player[0] == "winsound":
+            import winsound
+            winsound.PlaySound(str(path), winsound.SND_FILENAME | winsound.SND_ASYNC)
+            # winsound gives no completion signal, so wait for the length of the file
+            if self._interrupt.wait(wav_duration(path) or 0):
+                winsound.PlaySound(None, winsound.SND_PURGE)
+                return False
+            return True
+        process = subprocess.Popen(
+            self.player + [str(path)], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        while process.poll() is None:
+            if self._interrupt.wait(0.05):
+                process.terminate()
+                process.wait()
+                return False
+        return True
+
+    def _prune(self):
+        # Least recently played files go first; playing a file touches it
+        files = [(p.stat().st_mtime, p) for p in self.cache_dir.glob("*.wav") if not p.stem.endswith(".partial")]
+        if len(files) <= self.max_cache_files:
+            return
+        files.sort()
+        for _, path in files[:len(files) - self.max_cache_files]:
+            try:
+                path.unlink()
+            except OSError:
+                pass
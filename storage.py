@@ -0,0 +1,608 @@
+import os
+import sys
+import json
+import sqlite3
+import argparse
+import datetime
+import threading
+from pathlib import Path
+
+
+DAYS_OF_WEEK = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+class HistoryJournal:
+    """Append-only JSON Lines store for the excuse history.
+
+    Every line is one record: {"op": "add", "entry": {...}} appends an entry and
+    {"op": "set", "index": i, "fields": {...}} updates fields of entry i. Generating
+    or rating an excuse is therefore a single line append instead of a full rewrite.
+    The journal is compacted back to plain "add" records in a background thread once
+    update records make up too much of the file.
+    """
+
+    def __init__(self, journal_file, legacy_file=None, compact_min_records=1000, compact_ratio=0.5):
+        self.journal_file = Path(journal_file)
+        self.legacy_file = Path(legacy_file) if legacy_file else None
+        self.compact_min_records = compact_min_records
+        self.compact_ratio = compact_ratio
+        self.entries = []
+        self._lock = threading.RLock()
+        self._handle = None
+        self._record_count = 0
+        self._compacting = False
+        self._compact_thread = None
+        self._pending = []
+
+    def load(self):
+        with self._lock:
+            self._migrate_legacy()
+            entries = []
+            record_count = 0
+            if self.journal_file.exists():
+                self._close_handle()
+                self._repair_tail()
+                with open(self.journal_file, "r", encoding="utf-8") as f:
+                    for line in f:
+                        line = line.strip()
+                        if not line:
+                            continue
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            # Garbage left by an older crash, skip it
+                            continue
+                        record_count += 1
+                        self._apply(entries, record)
+            # Keep the same list object so references held by callers stay valid
+            self.entries[:] = entries
+            self._record_count = record_count
+            return self.entries
+
+    def append(self, entry):
+        with self._lock:
+            self.entries.append(entry)
+            self._write_record({"op": "add", "entry": entry})
+            index = len(self.entries) - 1
+        # Updates made earlier may still be waiting for compaction
+        self._maybe_compact()
+        return index
+
+    def update(self, index, fields):
+        with self._lock:
+            if not 0 <= index < len(self.entries):
+                raise IndexError(f"History entry {index} does not exist")
+            self.entries[index].update(fields)
+            self._write_record({"op": "set", "index": index, "fields": fields})
+        self._maybe_compact()
+
+    def rewrite(self, entries=None):
+        """Replace the journal with one "add" record per entry (synchronous compaction)"""
+        with self._lock:
+            if entries is not None and entries is not self.entries:
+                self.entries[:] = entries
+            self._close_handle()
+            self._write_snapshot(self.journal_file, [dict(e) for e in self.entries])
+            self._record_count = len(self.entries)
+
+    def compact_async(self):
+        """Start compacting in the background; returns the thread, or the one already running"""
+        with self._lock:
+            if self._compacting:
+                return self._compact_thread
+            self._compacting = True
+            self._pending = []
+            snapshot = [dict(e) for e in self.entries]
+            thread = threading.Thread(target=self._compact_task, args=(snapshot,))
+            thread.daemon = True
+            self._compact_thread = thread
+        thread.start()
+        return thread
+
+    def close(self):
+        with self._lock:
+            self._close_handle()
+
+    def _compact_task(self, snapshot):
+        tmp_file = self.journal_file.with_suffix(self.journal_file.suffix + ".compact")
+        try:
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                for entry in snapshot:
+                    f.write(json.dumps({"op": "add", "entry": entry}) + "\n")
+            with self._lock:
+                # Records written while we were busy go on top of the snapshot
+                with open(tmp_file, "a", encoding="utf-8") as f:
+                    for line in self._pending:
+                        f.write(line)
+                    f.flush()
+                    os.fsync(f.fileno())
+                self._close_handle()
+                os.replace(tmp_file, self.journal_file)
+                self._record_count = len(snapshot) + len(self._pending)
+        except Exception as e:
+            print(f"Error compacting history: {e}")
+        finally:
+            with self._lock:
+                self._compacting = False
+                self._pending = []
+            # Only left behind when compaction failed
+            try:
+                tmp_file.unlink()
+            except FileNotFoundError:
+                pass
+
+    def _maybe_compact(self):
+        with self._lock:
+            overhead = self._record_count - len(self.entries)
+            if self._record_count < self.compact_min_records:
+                return
+            if overhead < self._record_count * self.compact_ratio:
+                return
+        self.compact_async()
+
+    def _write_record(self, record):
+        line = json.dumps(record) + "\n"
+        if self._handle is None:
+            self.journal_file.parent.mkdir(parents=True, exist_ok=True)
+            self._handle = open(self.journal_file, "a", encoding="utf-8")
+        self._handle.write(line)
+        self._handle.flush()
+        self._record_count += 1
+        if self._compacting:
+            self._pending.append(line)
+
+    def _close_handle(self):
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+    def _repair_tail(self):
+        # A crash mid-write can leave the last line without its newline; the next record
+        # would be glued onto it and lost, so finish a complete record or cut a torn one off
+        with open(self.journal_file, "rb+") as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            if size == 0:
+                return
+            position = size
+            tail = b""
+            while position > 0:
+                step = min(4096, position)
+                position -= step
+                f.seek(position)
+                tail = f.read(step) + tail
+                newline = tail.rfind(b"\n")
+                if newline != -1:
+                    position += newline + 1
+                    tail = tail[newline + 1:]
+                    break
+            if not tail:
+                return
+            try:
+                json.loads(tail.decode("utf-8"))
+            except ValueError:
+                f.truncate(position)
+            else:
+                f.seek(0, os.SEEK_END)
+                f.write(b"\n")
+
+    def _migrate_legacy(self):
+        # Convert an old excuse_history.json list into the journal format once
+        if self.legacy_file is None or not self.legacy_file.exists():
+            return
+        if self.journal_file.exists():
+            return
+        try:
+            with open(self.legacy_file, "r", encoding="utf-8") as f:
+                legacy_entries = json.load(f)
+        except Exception as e:
+            print(f"Error migrating history: {e}")
+            return
+        self._write_snapshot(self.journal_file, legacy_entries)
+        os.replace(self.legacy_file, self.legacy_file.with_suffix(self.legacy_file.suffix + ".migrated"))
+
+    @staticmethod
+    def _write_snapshot(path, entries):
+        tmp_file = path.with_suffix(path.suffix + ".tmp")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                for entry in entries:
+                    f.write(json.dumps({"op": "add", "entry": entry}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, path)
+        finally:
+            try:
+                tmp_file.unlink()
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def _apply(entries, record):
+        op = record.get("op")
+        if op == "add":
+            entries.append(record.get("entry", {}))
+        elif op == "set":
+            index = record.get("index", -1)
+            if 0 <= index < len(entries):
+                entries[index].update(record.get("fields", {}))
+
+
+class StorageBackend:
+    """Interface shared by the history and favorites storage engines.
+
+    History entries are addressed by their position in insertion order, which is
+    what the UI uses to rate the latest excuse.
+    """
+
+    def load_history(self):
+        raise NotImplementedError
+
+    def count_history(self):
+        raise NotImplementedError
+
+    def append_history(self, entry):
+        raise NotImplementedError
+
+    def update_history(self, index, fields):
+        raise NotImplementedError
+
+    def replace_history(self, entries):
+        raise NotImplementedError
+
+    def query_history(self, context=None, audience=None, rated_only=False, newest_first=True, limit=None, offset=0):
+        raise NotImplementedError
+
+    def get_history_entries(self, indices):
+        """Return the entries at the given history positions, in the same order"""
+        found = self.get_history_by_index(indices)
+        return [found[i] for i in indices if i in found]
+
+    def get_history_by_index(self, indices):
+        """Return {position: entry} for those of the given history positions that exist"""
+        raise NotImplementedError
+
+    def history_patterns(self):
+        """Return (day_counts, hour_counts, context_counts) over the whole history"""
+        raise NotImplementedError
+
+    def load_favorites(self):
+        raise NotImplementedError
+
+    def add_favorite(self, entry):
+        raise NotImplementedError
+
+    def remove_favorite(self, index):
+        raise NotImplementedError
+
+    def replace_favorites(self, entries):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class JsonStorage(StorageBackend):
+    """Default backend: history journal plus favorites.json, held in memory"""
+
+    def __init__(self, history_file, favorites_file, legacy_history_file=None):
+        self.journal = HistoryJournal(history_file, legacy_history_file)
+        self.favorites_file = Path(favorites_file)
+        self._history_loaded = False
+        self._load_lock = threading.Lock()
+
+    def load_history(self, reload=False):
+        # History may be preloaded on a background thread while the UI asks for it
+        with self._load_lock:
+            if reload or not self._history_loaded:
+                self.journal.load()
+                self._history_loaded = True
+        return self.journal.entries
+
+    def count_history(self):
+        return len(self.load_history())
+
+    def append_history(self, entry):
+        self.load_history()
+        return self.journal.append(entry)
+
+    def update_history(self, index, fields):
+        self.load_history()
+        self.journal.update(index, fields)
+
+    def replace_history(self, entries):
+        # A load running at the same time must not overwrite the new entries with the old file
+        with self._load_lock:
+            self.journal.rewrite(entries)
+            self._history_loaded = True
+
+    def query_history(self, context=None, audience=None, rated_only=False, newest_first=True, limit=None, offset=0):
+        entries = self.load_history()
+        if context is None and audience is None and not rated_only:
+            # Unfiltered pages (the History list) are a plain slice
+            if newest_first:
+                stop = len(entries) - offset
+                start = 0 if limit is None else max(0, stop - limit)
+                return entries[start:max(0, stop)][::-1]
+            return entries[offset:None if limit is None else offset + limit]
+        ordered = reversed(entries) if newest_first else iter(entries)
+        results = []
+        skipped = 0
+        for entry in ordered:
+            if context is not None and entry.get("context") != context:
+                continue
+            if audience is not None and entry.get("audience") != audience:
+                continue
+            if rated_only and entry.get("effectiveness") is None:
+                continue
+            if skipped < offset:
+                skipped += 1
+                continue
+            results.append(entry)
+            if limit is not None and len(results) >= limit:
+                break
+        return results
+
+    def get_history_by_index(self, indices):
+        entries = self.load_history()
+        return {i: entries[i] for i in indices if 0 <= i < len(entries)}
+
+    def history_patterns(self):
+        day_counts = {}
+        hour_counts = {}
+        context_counts = {}
+        for entry in self.load_history():
+            timestamp = datetime.datetime.fromisoformat(entry["timestamp"])
+            day = timestamp.strftime("%A")
+            day_counts[day] = day_counts.get(day, 0) + 1
+            hour_counts[timestamp.hour] = hour_counts.get(timestamp.hour, 0) + 1
+            context_counts[entry["context"]] = context_counts.get(entry["context"], 0) + 1
+        return day_counts, hour_counts, context_counts
+
+    def load_favorites(self):
+        if not self.favorites_file.exists():
+            return []
+        with open(self.favorites_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def add_favorite(self, entry):
+        favorites = self.load_favorites()
+        favorites.append(entry)
+        self.replace_favorites(favorites)
+
+    def remove_favorite(self, index):
+        favorites = self.load_favorites()
+        if 0 <= index < len(favorites):
+            del favorites[index]
+            self.replace_favorites(favorites)
+
+    def replace_favorites(self, entries):
+        with open(self.favorites_file, "w", encoding="utf-8") as f:
+            json.dump(entries, f)
+
+    def close(self):
+        self.journal.close()
+
+
+class SqliteStorage(StorageBackend):
+    """SQLite backend with indexes for the ranking, prediction and History page queries"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS history (
+            id INTEGER PRIMARY KEY,
+            context TEXT,
+            audience TEXT,
+            timestamp TEXT,
+            effectiveness INTEGER,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_history_context_audience ON history (context, audience);
+        CREATE INDEX IF NOT EXISTS idx_history_timestamp ON history (timestamp);
+        CREATE INDEX IF NOT EXISTS idx_history_effectiveness ON history (effectiveness);
+        CREATE TABLE IF NOT EXISTS favorites (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            context TEXT,
+            audience TEXT,
+            timestamp TEXT,
+            data TEXT NOT NULL
+        );
+    """
+
+    # Columns mirrored out of the entry dict so they can be indexed
+    HISTORY_COLUMNS = ("context", "audience", "timestamp", "effectiveness")
+
+    def __init__(self, database_file):
+        self.database_file = Path(database_file)
+        self.database_file.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        # Generation runs on worker threads, so the connection is shared behind a lock
+        self.conn = sqlite3.connect(str(self.database_file), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+        self.conn.commit()
+
+    def load_history(self):
+        return self.query_history(newest_first=False)
+
+    def count_history(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+
+    def append_history(self, entry):
+        with self._lock:
+            index = self.count_history()
+            self.conn.execute(
+                "INSERT INTO history (id, context, audience, timestamp, effectiveness, data) VALUES (?, ?, ?, ?, ?, ?)",
+                (index + 1,) + self._history_values(entry)
+            )
+            self.conn.commit()
+            return index
+
+    def update_history(self, index, fields):
+        with self._lock:
+            row = self.conn.execute("SELECT data FROM history WHERE id = ?", (index + 1,)).fetchone()
+            if row is None:
+                raise IndexError(f"History entry {index} does not exist")
+            entry = json.loads(row[0])
+            entry.update(fields)
+            self.conn.execute(
+                "UPDATE history SET context = ?, audience = ?, timestamp = ?, effectiveness = ?, data = ? WHERE id = ?",
+                self._history_values(entry) + (index + 1,)
+            )
+            self.conn.commit()
+
+    def replace_history(self, entries):
+        with self._lock:
+            self.conn.execute("DELETE FROM history")
+            self.conn.executemany(
+                "INSERT INTO history (id, context, audience, timestamp, effectiveness, data) VALUES (?, ?, ?, ?, ?, ?)",
+                ((i + 1,) + self._history_values(entry) for i, entry in enumerate(entries))
+            )
+            self.conn.commit()
+
+    def query_history(self, context=None, audience=None, rated_only=False, newest_first=True, limit=None, offset=0):
+        clauses = []
+        params = []
+        if context is not None:
+            clauses.append("context = ?")
+            params.append(context)
+        if audience is not None:
+            clauses.append("audience = ?")
+            params.append(audience)
+        if rated_only:
+            clauses.append("effectiveness IS NOT NULL")
+        sql = "SELECT data FROM history"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY id DESC" if newest_first else " ORDER BY id"
+        if limit is not None or offset:
+            sql += " LIMIT ? OFFSET ?"
+            params += [limit if limit is not None else -1, offset]
+        with self._lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def get_history_by_index(self, indices):
+        indices = list(indices)
+        if not indices:
+            return {}
+        placeholders = ", ".join("?" for _ in indices)
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT id, data FROM history WHERE id IN ({placeholders})", [i + 1 for i in indices]
+            ).fetchall()
+        return {row[0] - 1: json.loads(row[1]) for row in rows}
+
+    def history_patterns(self):
+        day_counts = {}
+        hour_counts = {}
+        context_counts = {}
+        with self._lock:
+            # %w is 0 for Sunday, DAYS_OF_WEEK starts on Monday
+            for dow, count in self.conn.execute(
+                "SELECT strftime('%w', timestamp), COUNT(*) FROM history GROUP BY 1"
+            ):
+                if dow is not None:
+                    day_counts[DAYS_OF_WEEK[(int(dow) - 1) % 7]] = count
+            for hour, count in self.conn.execute(
+                "SELECT CAST(strftime('%H', timestamp) AS INTEGER), COUNT(*) FROM history GROUP BY 1"
+            ):
+                if hour is not None:
+                    hour_counts[hour] = count
+            for context, count in self.conn.execute(
+                "SELECT context, COUNT(*) FROM history GROUP BY context"
+            ):
+                context_counts[context] = count
+        return day_counts, hour_counts, context_counts
+
+    def load_favorites(self):
+        with self._lock:
+            rows = self.conn.execute("SELECT data FROM favorites ORDER BY id").fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def add_favorite(self, entry):
+        with self._lock:
+            self.conn.execute(
+                "INSERT INTO favorites (context, audience, timestamp, data) VALUES (?, ?, ?, ?)",
+                self._favorite_values(entry)
+            )
+            self.conn.commit()
+
+    def remove_favorite(self, index):
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT id FROM favorites ORDER BY id LIMIT 1 OFFSET ?", (index,)
+            ).fetchone()
+            if row is not None:
+                self.conn.execute("DELETE FROM favorites WHERE id = ?", row)
+                self.conn.commit()
+
+    def replace_favorites(self, entries):
+        with self._lock:
+            self.conn.execute("DELETE FROM favorites")
+            self.conn.executemany(
+                "INSERT INTO favorites (context, audience, timestamp, data) VALUES (?, ?, ?, ?)",
+                (self._favorite_values(entry) for entry in entries)
+            )
+            self.conn.commit()
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    def _history_values(self, entry):
+        return tuple(entry.get(column) for column in self.HISTORY_COLUMNS) + (json.dumps(entry),)
+
+    @staticmethod
+    def _favorite_values(entry):
+        return (entry.get("context"), entry.get("audience"), entry.get("timestamp"), json.dumps(entry))
+
+
+def create_storage(backend, data_dir):
+    """Build the storage engine named by backend ("json" or "sqlite") under data_dir"""
+    data_dir = Path(data_dir)
+    if backend == "json":
+        return JsonStorage(
+            data_dir / "excuse_history.jsonl",
+            data_dir / "favorites.json",
+            data_dir / "excuse_history.json"
+        )
+    if backend == "sqlite":
+        return SqliteStorage(data_dir / "excuses.db")
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+def import_json_to_sqlite(data_dir, database_file=None):
+    """One-shot import of the JSON history and favorites into the SQLite database"""
+    data_dir = Path(data_dir)
+    source = create_storage("json", data_dir)
+    target = SqliteStorage(database_file or data_dir / "excuses.db")
+    try:
+        history = source.load_history()
+        favorites = source.load_favorites()
+        target.replace_history(history)
+        target.replace_favorites(favorites)
+        return len(history), len(favorites)
+    finally:
+        source.close()
+        target.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Excuse Generator storage tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    import_parser = subparsers.add_parser("import-json", help="Import JSON history and favorites into SQLite")
+    import_parser.add_argument("--data-dir", default="data")
+    import_parser.add_argument("--database", default=None)
+    args = parser.parse_args(argv)
+
+    if args.command == "import-json":
+        history_count, favorites_count = import_json_to_sqlite(args.data_dir, args.database)
+        print(f"Imported {history_count} history entries and {favorites_count} favorites")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+import json
+
+from backends import LocalModelBackend
+from batch import BatchRunner, scenario_grid, load_scenarios, percentile
+from resilience import ErrorResult
+
+
+class FakeGenerator:
+    """Just the two ExcuseGenerator methods the runner uses, on the offline model"""
+
+    def __init__(self):
+        self.backend = LocalModelBackend(latency="fixed:0")
+        self.translated = []
+
+    def generate_excuse(self, context, audience, formality, urgency, use_cache=True, save_to_history=True):
+        if context.startswith("Fail"):
+            return ErrorResult("Error generating excuse: simulated")
+        return self.backend.generate(f"{context}|{audience}|{formality}|{urgency}")
+
+    def translate_excuse(self, excuse, language):
+        self.translated.append(excuse)
+        return f"[{language}] {excuse}"
+
+
+def test_scenario_grid_covers_every_combination():
+    scenarios = list(scenario_grid(language="French"))
+    assert len(scenarios) == 5 * 5 * 3 * 4
+    assert len({(s["context"], s["audience"], s["formality"], s["urgency"]) for s in scenarios}) == len(scenarios)
+    assert all(s["language"] == "French" for s in scenarios)
+
+
+def test_load_scenarios_fills_defaults(tmp_path):
+    csv_file = tmp_path / "scenarios.csv"
+    csv_file.write_text("context,audience,urgency\nSchool,Teacher,\n", encoding="utf-8")
+    jsonl_file = tmp_path / "scenarios.jsonl"
+    jsonl_file.write_text(json.dumps({"context": "Social", "language": "Spanish"}) + "\n\n", encoding="utf-8")
+
+    (from_csv,) = load_scenarios(csv_file)
+    (from_jsonl,) = load_scenarios(jsonl_file)
+    assert from_csv["context"] == "School" and from_csv["audience"] == "Teacher"
+    assert from_csv["urgency"] == "Normal" and from_csv["formality"] == "Formal"
+    assert from_jsonl["language"] == "Spanish" and from_jsonl["audience"] == "Boss"
+
+
+def test_percentile():
+    values = [0.1, 0.2, 0.3, 0.4, 0.5]
+    assert percentile([], 0.5) == 0.0
+    assert percentile(values, 0.0) == 0.1
+    assert percentile(values, 0.5) == 0.3
+    assert percentile(values, 1.0) == 0.5
+
+
+def test_run_writes_every_result_and_counts_failures(tmp_path):
+    generator = FakeGenerator()
+    scenarios = [
+        {"context": "Work", "details": "", "audience": "Boss", "formality": "Formal", "urgency": "Normal",
+         "language": "Spanish"},
+        {"context": "Fail", "details": "", "audience": "Boss", "formality": "Formal", "urgency": "Normal",
+         "language": "Spanish"},
+    ] + list(scenario_grid())[:20]
+    output = tmp_path / "results.jsonl"
+
+    summary = BatchRunner(generator, workers=3, progress_every=0).run(iter(scenarios), output, report=lambda s: None)
+
+    results = [json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()]
+    assert summary["total"] == len(results) == len(scenarios)
+    assert summary["failed"] == 1
+    failed = [r for r in results if not r["ok"]]
+    assert failed[0]["context"] == "Fail" and failed[0]["translation"] == ""
+    # A failed generation is never sent to the translator
+    assert len(generator.translated) == 1
+    assert summary["p50"] <= summary["p99"] <= summary["max"]
@@ -0,0 +1,104 @@
+import pytest
+
+from cache import ResponseCache, make_cache_key
+
+
+def disk_total(cache):
+    return cache.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+
+def disk_keys(cache):
+    return {row[0] for row in cache.conn.execute("SELECT key FROM responses")}
+
+
+def accessed(cache, key):
+    return cache.conn.execute("SELECT accessed FROM responses WHERE key = ?", (key,)).fetchone()[0]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("cache.time.time", lambda: now[0])
+    return now
+
+
+def test_cache_key_ignores_whitespace():
+    assert make_cache_key("m", "Hello   world\n") == make_cache_key("m", " Hello world")
+    assert make_cache_key("m", "Hello") != make_cache_key("other", "Hello")
+    assert make_cache_key("m", "Hello", {"t": 1}) != make_cache_key("m", "Hello")
+
+
+def test_get_set_and_reopen(tmp_path):
+    cache = ResponseCache(tmp_path / "cache.db")
+    assert cache.get("a") is None
+    cache.set("a", "response")
+    assert cache.get("a") == "response"
+    assert (cache.hits, cache.misses) == (1, 1)
+    cache.close()
+
+    reopened = ResponseCache(tmp_path / "cache.db")
+    assert reopened.get("a") == "response"
+    assert reopened.stats()["disk_bytes"] == len("response")
+
+
+def test_entries_expire(tmp_path, clock):
+    cache = ResponseCache(tmp_path / "cache.db", ttl=60, memory_entries=1)
+    cache.set("a", "x" * 10)
+    cache.set("b", "y" * 10)
+    clock[0] += 61
+    # "a" is only on disk, "b" is also in memory; both have expired
+    assert cache.get("a") is None
+    assert cache.get("b") is None
+    assert "a" not in disk_keys(cache)
+    assert cache.stats()["disk_bytes"] == disk_total(cache) == 0
+
+
+def test_running_size_matches_the_table(tmp_path, clock):
+    cache = ResponseCache(tmp_path / "cache.db", ttl=100, disk_bytes=50)
+    cache.set("a", "x" * 20)
+    cache.set("a", "x" * 5)
+    assert cache.stats()["disk_bytes"] == disk_total(cache) == 5
+    cache.set("b", "é" * 10)
+    assert cache.stats()["disk_bytes"] == disk_total(cache) == 25
+
+    clock[0] += 200
+    # Over the limit: the expired entries go first, then the least recently used
+    cache.set("c", "z" * 40)
+    cache.set("d", "w" * 30)
+    assert disk_keys(cache) == {"d"}
+    assert cache.stats()["disk_bytes"] == disk_total(cache) == 30
+    cache.clear()
+    assert cache.stats()["disk_bytes"] == disk_total(cache) == 0
+
+
+def test_memory_hits_protect_entries_from_eviction(tmp_path, clock):
+    cache = ResponseCache(tmp_path / "cache.db", disk_bytes=30)
+    for key in ("hot", "warm", "cold"):
+        cache.set(key, "x" * 10)
+        clock[0] += 1
+    clock[0] += 10
+    # Served from memory; the access time reaches the disk before eviction looks at it
+    assert cache.get("hot") == "x" * 10
+    cache.set("new", "x" * 10)
+    assert disk_keys(cache) == {"hot", "cold", "new"}
+    assert cache.stats()["disk_bytes"] == disk_total(cache) == 30
+
+
+def test_memory_hits_are_written_back_in_batches(tmp_path, clock):
+    cache = ResponseCache(tmp_path / "cache.db")
+    cache.set("a", "value")
+    created = accessed(cache, "a")
+    clock[0] += 5
+    for _ in range(ResponseCache.TOUCH_BATCH - 1):
+        cache.set(f"other {clock[0]}", "v")
+        cache.get("a")
+        clock[0] += 0.001
+    assert accessed(cache, "a") == created
+    cache.get("a")
+    assert accessed(cache, "a") > created
+    clock[0] += 5
+    cache.get("a")
+    cache.close()
+
+    reopened = ResponseCache(tmp_path / "cache.db")
+    assert accessed(reopened, "a") == pytest.approx(clock[0])
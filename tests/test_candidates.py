@@ -0,0 +1,100 @@
+import pytest
+
+from backends import GeminiBackend, LocalModelBackend, ModelBackend
+from candidates import length_score, formality_level, score_candidates
+from resilience import ResilientModelBackend, ResilientCaller, TokenBucket
+
+
+FORMAL = ("I sincerely apologize, but due to unforeseen circumstances I am unable to attend today's meeting. "
+          "I would appreciate your understanding and will ensure that any outstanding work is completed promptly.")
+CASUAL = "hey sorry guys, gonna be super late lol, my car's totally dead!!"
+
+
+def test_length_score_halves_per_doubling():
+    assert length_score(50, "Normal") == 1.0
+    assert length_score(15, "Normal") == pytest.approx(0.5)
+    assert length_score(180, "Normal") == pytest.approx(0.5)
+    assert length_score(0, "Unknown") == length_score(1, "Normal")
+
+
+def test_formality_level_orders_texts():
+    assert formality_level(FORMAL) > 0.65 > formality_level(CASUAL)
+    assert formality_level("") == 0.5
+
+
+def test_scores_prefer_the_requested_tone():
+    formal_first = score_candidates([CASUAL, FORMAL], "Formal", "Normal")
+    assert formal_first[0]["excuse"] == FORMAL
+    casual_first = score_candidates([FORMAL, CASUAL], "Casual", "Emergency")
+    assert casual_first[0]["excuse"] == CASUAL
+    assert set(formal_first[0]) == {"excuse", "score", "length", "formality"}
+
+
+def test_rated_excuses_add_similarity():
+    ranked = [{"excuse": "My train was cancelled and the replacement bus was full", "score": 8.0}]
+    scored = score_candidates(
+        ["The train was cancelled and the replacement bus was full, sorry", "I overslept after a late night"],
+        "Professional", "Normal", ranked
+    )
+    assert "similarity" in scored[0]
+    assert scored[0]["excuse"].startswith("The train")
+
+
+def test_near_duplicates_and_blanks_are_dropped():
+    scored = score_candidates([FORMAL, FORMAL + " ", "   ", FORMAL + " Thanks."], "Formal", "Normal")
+    assert len(scored) == 1
+
+
+def test_local_backend_returns_distinct_candidates():
+    backend = LocalModelBackend(latency="fixed:0", sentences=(3, 4))
+    texts = backend.generate_candidates("excuse for work", 3)
+    assert len(texts) == 3 and len(set(texts)) == 3
+    assert texts[0] == backend.generate("excuse for work")
+
+
+class InvalidArgument(Exception):
+    pass
+
+
+class SingleCandidateModel(GeminiBackend):
+    """Gemini backend against a fake model that refuses candidate_count"""
+
+    def __init__(self):
+        super().__init__("fake-model", "key")
+        self.requests = 0
+
+    @property
+    def model(self):
+        return self
+
+    def generate_content(self, prompt, generation_config=None, **kwargs):
+        self.requests += 1
+        if generation_config and "candidate_count" in generation_config:
+            raise InvalidArgument("candidate_count must be 1")
+        return type("Response", (), {"text": f"excuse {self.requests}"})()
+
+
+def test_fan_out_takes_a_limiter_token_per_request():
+    model = SingleCandidateModel()
+    limiter = TokenBucket(rate_per_minute=60, burst=10)
+    backend = ResilientModelBackend(model, ResilientCaller("model", limiter))
+
+    assert len(backend.generate_candidates("prompt", 5)) == 5
+    # The refused candidate_count request and five single ones
+    assert model.requests == 6
+    assert limiter.tokens == pytest.approx(10 - 6, abs=0.1)
+
+    # The refusal is remembered, later calls go straight to single requests
+    assert len(backend.generate_candidates("prompt", 3)) == 3
+    assert model.requests == 9
+
+
+def test_backends_without_candidates_fan_out_through_the_caller():
+    class Plain(ModelBackend):
+        def generate(self, prompt, generation_config=None):
+            return prompt
+
+    limiter = TokenBucket(rate_per_minute=60, burst=10)
+    backend = ResilientModelBackend(Plain(), ResilientCaller("model", limiter))
+    assert backend.generate_candidates("same", 4) == ["same"] * 4
+    assert limiter.tokens == pytest.approx(6, abs=0.1)
@@ -0,0 +1,227 @@
+import threading
+from concurrent.futures import CancelledError
+
+import pytest
+
+from engine import AsyncEngine, EngineBusyError, SingleFlight, single_flight, is_cancelled
+
+
+class Gate:
+    """Blocking fake call: records that it started, waits to be released, reports cancellation"""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.finished = threading.Event()
+        self.cancelled_seen = []
+
+    def __call__(self, value):
+        self.started.set()
+        self.release.wait(5)
+        self.cancelled_seen.append(is_cancelled())
+        self.finished.set()
+        return value
+
+
+@pytest.fixture
+def engine():
+    engine = AsyncEngine(max_concurrency=2, max_pending=2, default_timeout=5)
+    yield engine
+    engine.shutdown()
+
+
+def test_submit_returns_results(engine):
+    assert engine.submit(lambda a, b: a + b, 2, 3).result(5) == 5
+    assert engine.stats() == {"pending": 0, "active_keys": 0}
+
+
+def test_same_key_supersedes_and_flags_the_old_call(engine):
+    first = Gate()
+    old = engine.submit(first, "old", key="excuse")
+    assert first.started.wait(5)
+    new = engine.submit(lambda: "new", key="excuse")
+    assert new.result(5) == "new"
+    with pytest.raises(CancelledError):
+        old.result(5)
+    # The worker thread runs on, but can tell it was superseded
+    first.release.set()
+    assert first.finished.wait(5)
+    assert first.cancelled_seen == [True]
+
+
+def test_full_engine_keeps_the_running_request(engine):
+    gates = [Gate(), Gate()]
+    running = engine.submit(gates[0], "kept", key="excuse")
+    other = engine.submit(gates[1], "other", key="proof")
+    with pytest.raises(EngineBusyError):
+        engine.submit(lambda: "third", key="voice")
+    # Superseding frees the slot of the request it replaces, so this is accepted
+    replacement = engine.submit(lambda: "replacement", key="proof")
+    assert replacement.result(5) == "replacement"
+    assert other.cancelled()
+    for gate in gates:
+        gate.release.set()
+    assert running.result(5) == "kept"
+    assert engine.stats()["pending"] == 0
+
+
+def test_timeout_flags_the_worker(engine):
+    gate = Gate()
+    future = engine.submit(gate, "late", timeout=0.05)
+    with pytest.raises(TimeoutError):
+        future.result(5)
+    gate.release.set()
+    assert gate.finished.wait(5)
+    assert gate.cancelled_seen == [True]
+    assert engine.stats()["pending"] == 0
+
+
+def test_concurrency_is_capped(engine):
+    gates = [Gate() for _ in range(3)]
+    engine.max_pending = 10
+    futures = [engine.submit(gate, i) for i, gate in enumerate(gates)]
+    assert gates[0].started.wait(5) and gates[1].started.wait(5)
+    assert not gates[2].started.wait(0.1)
+    gates[0].release.set()
+    assert gates[2].started.wait(5)
+    for gate in gates:
+        gate.release.set()
+    assert [f.result(5) for f in futures] == [0, 1, 2]
+
+
+class Streamer:
+    """Fake streaming call that emits one chunk, then waits for a second caller to join"""
+
+    def __init__(self):
+        self.calls = 0
+        self.first_chunk = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, emit):
+        self.calls += 1
+        emit("Sorry, ")
+        self.first_chunk.set()
+        self.release.wait(5)
+        emit("I was late.")
+        return "Sorry, I was late."
+
+
+def wait_for(condition):
+    for _ in range(500):
+        if condition():
+            return
+        threading.Event().wait(0.01)
+    raise AssertionError("condition not reached")
+
+
+def run_in_thread(func):
+    outcome = {}
+
+    def target():
+        try:
+            outcome["result"] = func()
+        except Exception as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=target)
+    thread.start()
+    return thread, outcome
+
+
+def test_late_joiner_catches_up_on_missed_chunks():
+    flights = SingleFlight()
+    streamer = Streamer()
+    leader_chunks, follower_chunks = [], []
+    leader, leader_outcome = run_in_thread(lambda: flights.do("key", streamer, leader_chunks.append))
+    assert streamer.first_chunk.wait(5)
+
+    follower, follower_outcome = run_in_thread(lambda: flights.do("key", streamer, follower_chunks.append))
+    wait_for(lambda: follower_chunks)
+    streamer.release.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert streamer.calls == 1
+    assert leader_outcome["result"] == follower_outcome["result"] == "Sorry, I was late."
+    assert leader_chunks == follower_chunks == ["Sorry, ", "I was late."]
+
+
+def test_follower_of_a_non_streaming_leader_gets_the_whole_text():
+    flights = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def call(emit):
+        assert emit is None
+        started.set()
+        release.wait(5)
+        return "All at once."
+
+    leader, leader_outcome = run_in_thread(lambda: flights.do("key", call))
+    assert started.wait(5)
+    chunks = []
+    follower, follower_outcome = run_in_thread(lambda: flights.do("key", call, chunks.append))
+    wait_for(lambda: flights._flights["key"].listeners)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+    assert leader_outcome["result"] == follower_outcome["result"] == "All at once."
+    assert chunks == ["All at once."]
+
+
+def test_errors_reach_every_waiting_caller():
+    flights = SingleFlight()
+    barrier = threading.Barrier(2, timeout=5)
+    calls = []
+
+    def failing(emit):
+        calls.append(1)
+        barrier.wait()
+        raise ConnectionError("model offline")
+
+    leader, leader_outcome = run_in_thread(lambda: flights.do("key", failing))
+    wait_for(lambda: calls)
+    chunks = []
+    follower, follower_outcome = run_in_thread(lambda: flights.do("key", failing, chunks.append))
+    wait_for(lambda: flights._flights["key"].listeners)
+    barrier.wait()
+    leader.join(5)
+    follower.join(5)
+
+    assert len(calls) == 1
+    assert isinstance(leader_outcome["error"], ConnectionError)
+    assert follower_outcome["error"] is leader_outcome["error"]
+    assert chunks == []
+    assert flights._flights == {}
+
+
+class Generator:
+    def __init__(self):
+        self.flights = SingleFlight("generator")
+        self.barrier = threading.Barrier(2, timeout=5)
+        self.calls = []
+
+    @single_flight("generate")
+    def generate(self, context, formality="casual", on_chunk=None):
+        self.calls.append((context, formality))
+        if context == "traffic":
+            self.barrier.wait()
+        return f"{context}/{formality}"
+
+
+def test_decorator_keys_on_arguments_with_defaults_applied():
+    generator = Generator()
+    first, first_outcome = run_in_thread(lambda: generator.generate("traffic"))
+    wait_for(lambda: generator.calls)
+    chunks = []
+    second, second_outcome = run_in_thread(
+        lambda: generator.generate("traffic", formality="casual", on_chunk=chunks.append))
+    wait_for(lambda: generator.flights._flights and list(generator.flights._flights.values())[0].listeners)
+    # A different argument is a different call and runs on its own
+    assert generator.generate("dentist") == "dentist/casual"
+    generator.barrier.wait()
+    first.join(5)
+    second.join(5)
+
+    assert first_outcome["result"] == second_outcome["result"] == "traffic/casual"
+    assert generator.calls == [("traffic", "casual"), ("dentist", "casual")]
+    assert chunks == ["traffic/casual"]
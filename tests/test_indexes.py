@@ -0,0 +1,169 @@
+import datetime
+
+import pytest
+
+from indexes import (PatternIndex, DuplicateIndex, SearchIndex, shingles, jaccard, minhash_signature,
+                     merge_duplicates, stem, tokenize)
+
+
+BASE = datetime.datetime(2024, 1, 1, 9, 0)
+EXCUSE = "My car would not start this morning and the next bus was forty minutes late, sorry for the delay"
+
+
+def entry(excuse, context="Work: late", days=0, effectiveness=None):
+    return {
+        "excuse": excuse,
+        "context": context,
+        "timestamp": (BASE + datetime.timedelta(days=days)).isoformat(),
+        "effectiveness": effectiveness,
+    }
+
+
+def test_minhash_agreement_tracks_jaccard():
+    a = shingles(EXCUSE)
+    b = shingles(EXCUSE.replace("forty", "fifty"))
+    c = shingles("The printer caught fire during the quarterly review and everyone left the building early")
+    sig_a, sig_b, sig_c = (minhash_signature(s, 64) for s in (a, b, c))
+    assert None not in sig_a and len(sig_a) == 64
+    assert minhash_signature(a, 64) == sig_a
+
+    def agreement(x, y):
+        return sum(1 for p, q in zip(x, y) if p == q) / len(x)
+
+    assert agreement(sig_a, sig_b) == pytest.approx(jaccard(a, b), abs=0.25)
+    assert agreement(sig_a, sig_c) < 0.2
+
+
+def test_band_keys_shared_by_near_duplicates_only():
+    index = DuplicateIndex()
+    keys = index.band_keys(shingles(EXCUSE))
+    assert len(keys) == index.bands
+    assert set(keys) & set(index.band_keys(shingles(EXCUSE + " again")))
+    assert not set(keys) & set(index.band_keys(shingles("Completely different words about a dentist appointment")))
+    assert index.band_keys(set()) == []
+
+
+def test_duplicate_index_finds_closest_earlier_entry(tmp_path):
+    entries = [entry("A water leak in my flat kept me home waiting for the plumber all day"), entry(EXCUSE)]
+    index = DuplicateIndex(tmp_path / "duplicates.json")
+    for position, item in enumerate(entries):
+        index.add(position, item)
+
+    fetch = lambda positions: {p: entries[p] for p in positions}
+    position, similarity = index.find(EXCUSE + " today", fetch)
+    assert position == 1 and similarity >= index.threshold
+    assert index.find("Something that was never said before at all", fetch) is None
+
+    # Saved and reloaded, the postings answer the same way
+    index.save()
+    reloaded = DuplicateIndex(tmp_path / "duplicates.json")
+    assert reloaded.find(EXCUSE, fetch)[0] == 1
+
+
+def test_duplicate_index_skips_entries_that_no_longer_resolve():
+    texts = [EXCUSE, "The dog ate my homework and then the cat was sick all over the printer"]
+    index = DuplicateIndex()
+    for position, text in enumerate(texts):
+        index.add(position, entry(text))
+    # Position 1 (the newer candidate, compared first) is gone; position 0 must keep its own text
+    fetch = lambda positions: {p: entry(texts[p]) for p in positions if p != 1}
+    position, similarity = index.find(EXCUSE, fetch)
+    assert position == 0 and similarity == 1.0
+    assert index.find(texts[1], fetch) is None
+
+
+def test_merge_duplicates_keeps_first_and_averages_ratings():
+    entries = [
+        entry(EXCUSE, effectiveness=2, days=0),
+        entry("Unrelated: the kids had a fever and I stayed home with them", days=1),
+        entry(EXCUSE + ".", effectiveness=4, days=2),
+    ]
+    merged, removed = merge_duplicates(entries)
+    assert removed == 1
+    assert [e["excuse"] for e in merged] == [EXCUSE, entries[1]["excuse"]]
+    assert merged[0]["duplicates"] == 1
+    assert merged[0]["effectiveness"] == 3
+    assert merged[0]["last_seen"] == entries[2]["timestamp"]
+
+
+def test_pattern_index_counts_without_decay(tmp_path):
+    index = PatternIndex(tmp_path / "patterns.json")
+    index.rebuild([entry("a", "Work: x"), entry("b", "School: y"), entry("c", "Work: z"), {"excuse": "no time"}])
+    assert index.count == 4
+    assert index.most_common() == ("Monday", 9, "Work")
+
+
+def test_pattern_index_decay_survives_rebase(tmp_path):
+    # A one-day half-life over months pushes the scaled weights past MAX_WEIGHT several times
+    index = PatternIndex(tmp_path / "patterns.json", half_life_days=1)
+    index.add(entry("old", "School: exam", days=0), save=False)
+    index.add(entry("old", "School: exam", days=1), save=False)
+    for days in range(40, 200, 40):
+        index.add(entry("new", "Work: meeting", days=days), save=False)
+    references = [index.reference]
+    index.add(entry("newest", "Family: visit", days=199), save=False)
+    references.append(index.reference)
+
+    assert references[0] > BASE.timestamp()
+    weights = index.context_weights
+    # Relative weights are what a plain 2^(-age / half-life) would give
+    work = sum(2 ** -(199 - days) for days in range(40, 200, 40))
+    assert weights["Work"] / weights["Family"] == pytest.approx(work, rel=1e-9)
+    assert weights["School"] / weights["Family"] == pytest.approx(2 ** -199 + 2 ** -198, rel=1e-9)
+    assert max(weights.values()) <= PatternIndex.MAX_WEIGHT
+    assert index.most_common()[2] == "Family"
+
+    index.save()
+    reloaded = PatternIndex(tmp_path / "patterns.json", half_life_days=1)
+    assert reloaded.count == 7 and reloaded.context_weights == pytest.approx(weights)
+    # A different half-life cannot reuse the saved weights
+    assert PatternIndex(tmp_path / "patterns.json", half_life_days=30).count == 0
+
+
+def test_search_index_prefix_and_stemming(tmp_path):
+    index = SearchIndex(tmp_path / "search.json")
+    index.rebuild([entry("Stuck in traffic on the motorway"), entry("Missed the train", "School: trip")])
+    assert index.search("traffic") == [0]
+    assert index.search("trains") == [1]
+    assert index.search("school") == [1]
+
+
+def test_stem_and_tokenize():
+    assert stem("meetings") == stem("meeting") == "meet"
+    assert stem("apologies") == "apology"
+    # Too short to strip a suffix from
+    assert stem("bus") == "bus"
+    assert tokenize("I was stuck in the Meetings") == ["stuck", "meet"]
+    assert tokenize("I was stuck in the Meetings", stemming=False) == ["stuck", "meetings"]
+
+
+def test_search_intersects_terms_newest_first(tmp_path):
+    index = SearchIndex(tmp_path / "search.json")
+    index.rebuild([
+        entry("Stuck in traffic on the motorway"),
+        entry("Missed the theatre show", "Social: late"),
+        entry("Traffic jam near the theatre"),
+    ])
+    assert index.search("traffic") == [2, 0]
+    assert index.search("traffic", limit=1) == [2]
+    assert index.search("theatre traffic") == [2]
+    assert index.search("traffic dentist") == []
+    assert index.search("") == [] and index.search("the") == []
+    # The last word is a prefix while typing, earlier words must match whole
+    assert index.search("motorw") == [0]
+    assert index.search("motorw traffic") == []
+
+
+def test_search_ignores_trailing_stop_word(tmp_path):
+    index = SearchIndex(tmp_path / "search.json")
+    index.rebuild([entry("Stuck in traffic on the motorway"), entry("Missed the theatre show")])
+    # "the" must not be expanded to "theatre"
+    assert index.search("traffic the") == [0]
+    assert index.search("stuck in") == [0]
+
+
+def test_search_without_stemming(tmp_path):
+    index = SearchIndex(tmp_path / "search.json", stemming=False)
+    index.rebuild([entry("Missed the train"), entry("Both trains were cancelled")])
+    assert index.search("train missed") == [0]
+    assert index.search("trains cancelled") == [1]
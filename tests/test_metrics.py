@@ -0,0 +1,89 @@
+import json
+
+import pytest
+
+from metrics import BUCKET_BOUNDS, Histogram, MetricsRegistry, instrument
+
+
+def test_histogram_percentiles_stay_within_a_bucket():
+    histogram = Histogram()
+    assert histogram.percentile(50) == 0.0
+    for i in range(1, 101):
+        histogram.observe(i / 1000)
+    assert histogram.count == 100 and histogram.sum == pytest.approx(5.05) and histogram.max == 0.1
+    # Neighbouring bucket bounds are 2 ** 0.25 apart, so that is the worst-case error
+    assert histogram.percentile(50) == pytest.approx(0.05, rel=0.19)
+    assert histogram.percentile(95) == pytest.approx(0.095, rel=0.19)
+    assert histogram.percentile(99) <= histogram.max
+    assert histogram.percentile(100) == histogram.max
+
+
+def test_histogram_clamps_to_the_largest_observation():
+    histogram = Histogram()
+    histogram.observe(0.0123)
+    assert histogram.percentile(50) <= 0.0123
+    assert histogram.percentile(99) == 0.0123
+    # Beyond the last bound the overflow bucket interpolates up to max
+    histogram.observe(1000.0)
+    assert histogram.buckets[-1] == 1
+    assert histogram.percentile(100) == 1000.0
+
+
+def test_prometheus_export():
+    registry = MetricsRegistry()
+    registry.observe("call_duration_seconds", 0.001, method="translate")
+    registry.observe("call_duration_seconds", 0.004, method="translate")
+    registry.increment("calls_total", method='say "hi"')
+    registry.increment("calls_total", 2, method='say "hi"')
+
+    first = next(i for i, bound in enumerate(BUCKET_BOUNDS) if bound >= 0.001)
+    lines = registry.to_prometheus().splitlines()
+    assert lines[0] == "# TYPE excuse_call_duration_seconds histogram"
+    # Buckets are cumulative and start at the first non-empty one
+    assert lines[1] == f'excuse_call_duration_seconds_bucket{{method="translate",le="{BUCKET_BOUNDS[first]:.6g}"}} 1'
+    buckets = [line for line in lines if line.startswith("excuse_call_duration_seconds_bucket")]
+    assert len(buckets) == len(BUCKET_BOUNDS) - first + 1
+    assert buckets[-1] == 'excuse_call_duration_seconds_bucket{method="translate",le="+Inf"} 2'
+    assert [int(line.rsplit(" ", 1)[1]) for line in buckets] == sorted(int(line.rsplit(" ", 1)[1]) for line in buckets)
+    assert lines[-5:] == [
+        'excuse_call_duration_seconds_bucket{method="translate",le="+Inf"} 2',
+        'excuse_call_duration_seconds_sum{method="translate"} 0.005000',
+        'excuse_call_duration_seconds_count{method="translate"} 2',
+        "# TYPE excuse_calls_total counter",
+        'excuse_calls_total{method="say \\"hi\\""} 3',
+    ]
+
+
+def test_json_lines_export():
+    registry = MetricsRegistry()
+    assert registry.to_json_lines() == ""
+    registry.observe("call_duration_seconds", 0.25, method="proof")
+    registry.increment("errors_total", method="proof")
+
+    text = registry.to_json_lines(timestamp=1700000000)
+    assert text.endswith("\n")
+    histogram, counter = (json.loads(line) for line in text.splitlines())
+    assert histogram["timestamp"] == 1700000000 and histogram["type"] == "histogram"
+    assert histogram["name"] == "excuse_call_duration_seconds" and histogram["labels"] == {"method": "proof"}
+    assert histogram["count"] == 1 and histogram["sum"] == histogram["max"] == 0.25
+    assert histogram["p50"] <= histogram["p95"] <= histogram["p99"] <= 0.25
+    assert counter == {"timestamp": 1700000000, "type": "counter", "name": "excuse_errors_total",
+                       "labels": {"method": "proof"}, "value": 1}
+
+
+def test_instrument_counts_calls_and_errors():
+    registry = MetricsRegistry()
+
+    @instrument("Demo.run", failed=lambda result: result.startswith("Error"), registry=registry)
+    def run(result):
+        if result is None:
+            raise ValueError("boom")
+        return result
+
+    run("fine")
+    run("Error: offline")
+    with pytest.raises(ValueError):
+        run(None)
+    counters = {(name, labels["method"]): value for name, labels, value in registry.counter_values()}
+    assert counters == {("excuse_calls_total", "Demo.run"): 3, ("excuse_errors_total", "Demo.run"): 2}
+    assert registry.summary()[0][:3] == ("excuse_call_duration_seconds", {"method": "Demo.run"}, 3)
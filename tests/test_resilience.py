@@ -0,0 +1,141 @@
+import time
+
+import pytest
+
+from backends import BackendError
+from resilience import (TokenBucket, CircuitBreaker, ResilientCaller, CircuitOpenError, RateLimitedError,
+                        ErrorResult, error_kind, is_retryable)
+
+
+class Flaky:
+    """Fails with the given errors first, then returns "ok"; counts the calls"""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+def test_error_kinds():
+    assert error_kind(BackendError("slow down", "rate_limit")) == "rate_limit"
+    assert error_kind(TimeoutError()) == "timeout"
+    assert error_kind(ValueError()) == "error"
+    assert is_retryable(BackendError("down", "server"))
+    assert not is_retryable(BackendError("bad key", "auth"))
+    assert not is_retryable(CircuitOpenError("model", 5))
+
+    result = ErrorResult("Error generating excuse: down", BackendError("down", "server"))
+    assert result == "Error generating excuse: down"
+    assert result.kind == "server" and result.retryable
+
+
+def test_token_bucket_burst_then_wait():
+    bucket = TokenBucket(rate_per_minute=600, burst=2)
+    assert bucket.acquire() == 0
+    assert bucket.acquire() == 0
+    with pytest.raises(RateLimitedError):
+        bucket.acquire(max_wait=0.01)
+    start = time.monotonic()
+    waited = bucket.acquire(max_wait=1)
+    assert 0 < waited <= 0.1 + 1e-6
+    assert time.monotonic() - start >= waited * 0.9
+
+
+def test_token_bucket_refills_up_to_burst():
+    bucket = TokenBucket(rate_per_minute=6000, burst=3)
+    for _ in range(3):
+        bucket.acquire()
+    time.sleep(0.1)
+    assert [bucket.acquire(max_wait=0) for _ in range(3)] == [0, 0, 0]
+    with pytest.raises(RateLimitedError):
+        bucket.acquire(max_wait=0)
+
+
+def test_circuit_breaker_opens_then_half_opens():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    time.sleep(0.06)
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # Only one trial call at a time
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    time.sleep(0.06)
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.failures == 0
+
+
+def test_circuit_breaker_release_without_reaching_service():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+    breaker.before_call()
+    breaker.record_failure()
+    time.sleep(0.02)
+    breaker.before_call()
+    breaker.release(reached_service=False)
+    # Still half-open, and the next call may be the trial
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.before_call()
+    breaker.release()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_caller_retries_retryable_errors():
+    caller = ResilientCaller("model", base_delay=0, seed=1)
+    func = Flaky(BackendError("busy", "rate_limit"), BackendError("down", "server"))
+    assert caller.call(func) == "ok"
+    assert func.calls == 3
+    assert caller.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_caller_raises_other_errors_at_once():
+    caller = ResilientCaller("model", base_delay=0)
+    func = Flaky(ValueError("bad prompt"))
+    with pytest.raises(ValueError):
+        caller.call(func)
+    assert func.calls == 1
+    assert caller.breaker.failures == 0
+
+
+def test_caller_gives_up_and_opens_the_circuit():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    caller = ResilientCaller("model", breaker=breaker, max_attempts=3, base_delay=0)
+    func = Flaky(*[BackendError("down", "server")] * 5)
+    with pytest.raises(BackendError):
+        caller.call(func)
+    assert func.calls == 3
+    with pytest.raises(CircuitOpenError):
+        caller.call(func)
+    assert func.calls == 3
+
+
+def test_caller_refused_by_limiter_does_not_hold_the_trial():
+    limiter = TokenBucket(rate_per_minute=60, burst=1)
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    caller = ResilientCaller("model", limiter, breaker, max_wait=0)
+    assert caller.call(Flaky()) == "ok"
+    with pytest.raises(RateLimitedError):
+        caller.call(Flaky())
+    assert not breaker._trial_running
+
+
+def test_backoff_is_full_jitter_and_capped():
+    caller = ResilientCaller("model", base_delay=1.0, max_delay=4.0, seed=7)
+    delays = [caller.backoff(attempt) for attempt in range(8) for _ in range(20)]
+    assert all(0 <= delay <= 4.0 for delay in delays)
+    assert all(caller.backoff(0) <= 1.0 for _ in range(20))
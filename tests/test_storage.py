@@ -0,0 +1,235 @@
+import json
+
+import pytest
+
+from storage import HistoryJournal, JsonStorage, SqliteStorage, create_storage, import_json_to_sqlite
+
+
+def entry(number, context="Work: late", effectiveness=None):
+    return {
+        "excuse": f"Excuse number {number}",
+        "context": context,
+        "audience": "Boss",
+        "timestamp": f"2024-01-{number % 28 + 1:02d}T09:{number % 60:02d}:00",
+        "effectiveness": effectiveness,
+    }
+
+
+def records(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines() if line.strip()]
+
+
+def test_journal_appends_and_updates_replay(tmp_path):
+    path = tmp_path / "history.jsonl"
+    journal = HistoryJournal(path)
+    journal.load()
+    assert journal.append(entry(0)) == 0
+    assert journal.append(entry(1)) == 1
+    journal.update(0, {"effectiveness": 4})
+    journal.close()
+
+    assert [record["op"] for record in records(path)] == ["add", "add", "set"]
+    reloaded = HistoryJournal(path).load()
+    assert reloaded[0]["effectiveness"] == 4 and reloaded[1]["excuse"] == "Excuse number 1"
+
+
+def test_torn_last_line_is_skipped(tmp_path):
+    path = tmp_path / "history.jsonl"
+    journal = HistoryJournal(path)
+    journal.load()
+    journal.append(entry(0))
+    journal.close()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"op": "add", "entry": {"excuse": "cut o')
+
+    reloaded = HistoryJournal(path)
+    assert [e["excuse"] for e in reloaded.load()] == ["Excuse number 0"]
+    # The torn record is cut off, so the next one is not glued onto it
+    reloaded.append(entry(1))
+    reloaded.close()
+    assert [e["excuse"] for e in HistoryJournal(path).load()] == ["Excuse number 0", "Excuse number 1"]
+
+
+def test_complete_last_record_without_newline_is_kept(tmp_path):
+    path = tmp_path / "history.jsonl"
+    path.write_text(json.dumps({"op": "add", "entry": entry(0)}), encoding="utf-8")
+    journal = HistoryJournal(path)
+    journal.load()
+    journal.append(entry(1))
+    journal.close()
+    assert len(HistoryJournal(path).load()) == 2
+
+
+def test_legacy_list_is_migrated_once(tmp_path):
+    legacy = tmp_path / "excuse_history.json"
+    legacy.write_text(json.dumps([entry(0), entry(1, effectiveness=3)]), encoding="utf-8")
+    path = tmp_path / "excuse_history.jsonl"
+
+    entries = HistoryJournal(path, legacy).load()
+    assert [e["effectiveness"] for e in entries] == [None, 3]
+    assert not legacy.exists()
+    assert (tmp_path / "excuse_history.json.migrated").exists()
+
+    # A legacy file showing up again does not replace the journal
+    legacy.write_text(json.dumps([entry(9)]), encoding="utf-8")
+    assert len(HistoryJournal(path, legacy).load()) == 2
+
+
+def test_rewrite_replaces_the_journal(tmp_path):
+    path = tmp_path / "history.jsonl"
+    journal = HistoryJournal(path)
+    journal.load()
+    for number in range(3):
+        journal.append(entry(number))
+    journal.update(1, {"effectiveness": 5})
+    journal.rewrite([entry(7)])
+
+    assert records(path) == [{"op": "add", "entry": entry(7)}]
+    assert journal.entries == [entry(7)]
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_background_compaction_keeps_concurrent_writes(tmp_path):
+    path = tmp_path / "history.jsonl"
+    journal = HistoryJournal(path, compact_min_records=10, compact_ratio=0.5)
+    journal.load()
+    for number in range(4):
+        journal.append(entry(number))
+    for rating in range(12):
+        journal.update(rating % 4, {"effectiveness": rating % 5 + 1})
+    thread = journal.compact_async()
+    # Written while the compaction may still be running
+    journal.append(entry(4))
+    journal.update(4, {"effectiveness": 2})
+    thread.join()
+    journal.close()
+
+    expected = [dict(e) for e in journal.entries]
+    assert HistoryJournal(path).load() == expected
+    assert len(records(path)) < 4 + 12
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["history.jsonl"]
+
+
+def test_updates_trigger_compaction(tmp_path):
+    path = tmp_path / "history.jsonl"
+    journal = HistoryJournal(path, compact_min_records=20, compact_ratio=0.5)
+    journal.load()
+    journal.append(entry(0))
+    for rating in range(30):
+        journal.update(0, {"effectiveness": rating % 5 + 1})
+    started = journal._compact_thread
+    assert started is not None
+    # compact_async hands back the running compaction (or starts another once it is done)
+    journal.compact_async().join()
+    assert len(records(path)) < 31
+    journal.compact_async().join()
+    journal.close()
+    assert len(records(path)) == 1
+    assert HistoryJournal(path).load()[0]["effectiveness"] == 5
+
+
+def test_failed_compaction_leaves_no_temporary_file(tmp_path, monkeypatch):
+    path = tmp_path / "history.jsonl"
+    journal = HistoryJournal(path)
+    journal.load()
+    journal.append(entry(0))
+
+    def fail(*args):
+        raise OSError("disk full")
+
+    monkeypatch.setattr("storage.os.replace", fail)
+    journal.compact_async().join()
+    journal.close()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["history.jsonl"]
+    assert HistoryJournal(path).load() == [entry(0)]
+
+
+def make_storage(kind, tmp_path):
+    if kind == "json":
+        return JsonStorage(tmp_path / "history.jsonl", tmp_path / "favorites.json")
+    return SqliteStorage(tmp_path / "excuses.db")
+
+
+@pytest.mark.parametrize("kind", ["json", "sqlite"])
+def test_backends_agree_on_history(kind, tmp_path):
+    storage = make_storage(kind, tmp_path)
+    contexts = ["Work: late", "School: exam", "Work: sick"]
+    for number in range(6):
+        assert storage.append_history(entry(number, contexts[number % 3])) == number
+    storage.update_history(4, {"effectiveness": 5})
+    with pytest.raises(IndexError):
+        storage.update_history(6, {"effectiveness": 1})
+
+    assert storage.count_history() == 6
+    assert [e["excuse"] for e in storage.get_history_entries([4, 0, 9])] == ["Excuse number 4", "Excuse number 0"]
+    assert storage.get_history_by_index([9, 2]) == {2: entry(2, "Work: sick")}
+    newest = storage.query_history(limit=2, offset=1)
+    assert [e["excuse"] for e in newest] == ["Excuse number 4", "Excuse number 3"]
+    oldest = storage.query_history(newest_first=False, limit=2)
+    assert [e["excuse"] for e in oldest] == ["Excuse number 0", "Excuse number 1"]
+    work = storage.query_history(context="Work: late")
+    assert [e["excuse"] for e in work] == ["Excuse number 3", "Excuse number 0"]
+    assert [e["effectiveness"] for e in storage.query_history(rated_only=True)] == [5]
+
+    days, hours, context_counts = storage.history_patterns()
+    assert sum(days.values()) == 6 and sum(hours.values()) == 6
+    assert context_counts["Work: late"] == 2
+
+    storage.replace_history([entry(10), entry(11)])
+    assert storage.append_history(entry(12)) == 2
+    assert [e["excuse"] for e in storage.load_history()] == ["Excuse number 10", "Excuse number 11", "Excuse number 12"]
+    storage.close()
+
+
+@pytest.mark.parametrize("kind", ["json", "sqlite"])
+def test_backends_agree_on_favorites(kind, tmp_path):
+    storage = make_storage(kind, tmp_path)
+    for number in range(3):
+        storage.add_favorite(entry(number))
+    storage.remove_favorite(1)
+    storage.remove_favorite(5)
+    assert [e["excuse"] for e in storage.load_favorites()] == ["Excuse number 0", "Excuse number 2"]
+    storage.replace_favorites([entry(8)])
+    assert storage.load_favorites() == [entry(8)]
+    storage.close()
+
+
+def test_sqlite_keeps_data_across_reopen(tmp_path):
+    storage = SqliteStorage(tmp_path / "excuses.db")
+    storage.append_history(entry(0))
+    storage.append_history(entry(1))
+    storage.update_history(1, {"effectiveness": 2, "duplicate_of": 0})
+    storage.close()
+
+    reopened = SqliteStorage(tmp_path / "excuses.db")
+    assert reopened.load_history() == [entry(0), dict(entry(1), effectiveness=2, duplicate_of=0)]
+    assert reopened.append_history(entry(2)) == 2
+    reopened.close()
+
+
+def test_import_json_to_sqlite(tmp_path):
+    # Starts from the old single-file history, which is migrated on the way
+    (tmp_path / "excuse_history.json").write_text(json.dumps([entry(0), entry(1)]), encoding="utf-8")
+    (tmp_path / "favorites.json").write_text(json.dumps([entry(1)]), encoding="utf-8")
+    source = create_storage("json", tmp_path)
+    source.update_history(0, {"effectiveness": 4})
+    source.close()
+
+    assert import_json_to_sqlite(tmp_path) == (2, 1)
+    target = create_storage("sqlite", tmp_path)
+    history = target.load_history()
+    assert [e["effectiveness"] for e in history] == [4, None]
+    assert target.get_history_entries([1]) == [entry(1)]
+    assert target.load_favorites() == [entry(1)]
+    target.close()
+
+    # Importing again replaces rather than duplicates
+    assert import_json_to_sqlite(tmp_path) == (2, 1)
+    target = create_storage("sqlite", tmp_path)
+    assert target.count_history() == 2
+    target.close()
+
+
+def test_unknown_backend(tmp_path):
+    with pytest.raises(ValueError):
+        create_storage("csv", tmp_path)
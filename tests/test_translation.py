@@ -0,0 +1,115 @@
+import threading
+
+from backends import LocalTranslationBackend
+from translation import (TranslationMemory, TranslatorPool, split_segments, split_long, chunk_lines,
+                         protect_placeholders, restore_placeholders)
+
+
+LETTER = (
+    "Subject: Absence from Work - [Your Name]\n\n"
+    "Dear [Boss's Name],\n\n"
+    "I am writing to let you know I cannot come in on [Date]. It was very sudden!\n\n"
+    "*   **Reason:** my car broke down.\n"
+    "*   I will catch up on [mention any steps you took].\n\n"
+    "Best regards,\n[Your Name]"
+)
+
+
+class RecordingTranslator:
+    """Upper-cases each line and records the requests it was sent"""
+
+    def __init__(self, requests, merge_lines=False):
+        self.requests = requests
+        self.merge_lines = merge_lines
+
+    def translate(self, text):
+        self.requests.append(text)
+        if self.merge_lines and "\n" in text:
+            return text.replace("\n", " ").upper()
+        return text.upper()
+
+
+def memory(tmp_path, **options):
+    return TranslationMemory(tmp_path / "memory.db", **options)
+
+
+def test_split_segments_round_trips():
+    segments = split_segments(LETTER)
+    assert "".join(sentence + separator for sentence, separator in segments) == LETTER
+    assert ("It was very sudden!", "\n") in segments
+
+
+def test_placeholders_are_restored_even_with_spaces_added():
+    text, placeholders = protect_placeholders("Dear [Boss's Name], see you on [Date].")
+    assert text == "Dear [0], see you on [1]."
+    assert restore_placeholders("Querido [ 0 ], nos vemos el [1 ].", placeholders) == \
+        "Querido [Boss's Name], nos vemos el [Date]."
+    assert restore_placeholders("[es] Hola [7]", placeholders) == "[es] Hola [7]"
+
+
+def test_split_long_and_chunk_lines_respect_the_limit():
+    pieces = split_long("word " * 30 + "x" * 25, 20)
+    assert all(len(piece) <= 20 for piece in pieces)
+    assert " ".join(pieces).split() == ("word " * 30 + "x" * 25).split()[:30] + ["x" * 20, "x" * 5]
+
+    chunks = chunk_lines(["a" * 8, "b" * 8, "c" * 2, "d" * 12], 20)
+    assert chunks == [["a" * 8, "b" * 8, "c" * 2], ["d" * 12]]
+    assert all(len("\n".join(chunk)) <= 20 for chunk in chunks)
+
+
+def test_letter_layout_and_placeholders_survive(tmp_path):
+    requests = []
+    pool = TranslatorPool(lambda code: RecordingTranslator(requests))
+    translated = memory(tmp_path, max_request_chars=60).translate(LETTER, "es", pool)
+
+    assert translated.splitlines()[0] == "SUBJECT: ABSENCE FROM WORK - [Your Name]"
+    assert "DEAR [Boss's Name]," in translated
+    assert "*   **REASON:** MY CAR BROKE DOWN." in translated
+    assert translated.endswith("BEST REGARDS,\n[Your Name]")
+    assert translated.count("\n") == LETTER.count("\n")
+    assert len(requests) > 1 and all(len(request) <= 60 for request in requests)
+    assert not any("[Date]" in request for request in requests)
+
+
+def test_long_text_is_sent_in_parallel_chunks(tmp_path):
+    text = "".join(f"Sentence number {i} explains why the train was late again.\n\n" for i in range(200))
+    backend = LocalTranslationBackend(latency="fixed:0.05")
+    threads = set()
+    original = backend.translator
+
+    def translator(code):
+        inner = original(code)
+
+        class Recording:
+            def translate(self, chunk):
+                threads.add(threading.current_thread().name)
+                assert len(chunk) <= 1000
+                return inner.translate(chunk)
+
+        return Recording()
+
+    translated = memory(tmp_path, max_request_chars=1000).translate(text, "fr", TranslatorPool(translator))
+    lines = [line for line in translated.split("\n") if line]
+    assert len(lines) == 200
+    assert lines[137] == "[fr] Sentence number 137 explains why the train was late again."
+    assert len(threads) > 1
+
+
+def test_merged_lines_fall_back_per_line(tmp_path):
+    requests = []
+    pool = TranslatorPool(lambda code: RecordingTranslator(requests, merge_lines=True))
+    translated = memory(tmp_path).translate("One. Two [A].\n  Three.", "de", pool)
+    assert translated == "ONE. TWO [A].\n  THREE."
+    assert requests[0] == "One.\nTwo [0].\nThree."
+    assert requests[1:] == ["One.", "Two [0].", "Three."]
+
+
+def test_unchanged_sentences_come_from_memory(tmp_path):
+    requests = []
+    pool = TranslatorPool(lambda code: RecordingTranslator(requests))
+    translation_memory = memory(tmp_path)
+    translation_memory.translate("First sentence. Second sentence.", "it", pool)
+    requests.clear()
+    assert translation_memory.translate("First sentence. Third sentence.", "it", pool) == \
+        "FIRST SENTENCE. THIRD SENTENCE."
+    assert requests == ["Third sentence."]
@@ -0,0 +1,306 @@
+import re
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+
+from cache import ResponseCache
+from metrics import REGISTRY
+
+
+# Sentence boundary inside a single line; the whitespace after it is kept as a separator
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?])(\s+)")
+# Template gaps like [Your Name] are kept as they are; translators tend to mangle them
+PLACEHOLDER_PATTERN = re.compile(r"\[[^\[\]\n]{1,80}\]")
+# What a numbered marker may come back as, translators sometimes add spaces inside
+MARKER_PATTERN = re.compile(r"\[\s*(\d+)\s*\]")
+# Google Translate refuses requests over 5000 characters, stay clear of it
+MAX_REQUEST_CHARS = 4500
+
+
+def split_segments(text):
+    """Split text into [(sentence, separator), ...] so joining them restores the layout"""
+    segments = []
+    lines = text.split("\n")
+    for line_index, line in enumerate(lines):
+        newline = "\n" if line_index < len(lines) - 1 else ""
+        parts = SENTENCE_SPLIT.split(line)
+        # parts alternates sentence, separator, sentence, ...
+        for i in range(0, len(parts), 2):
+            sentence = parts[i]
+            separator = parts[i + 1] if i + 1 < len(parts) else ""
+            if i + 1 >= len(parts):
+                separator += newline
+            segments.append((sentence, separator))
+    return segments
+
+
+def protect_placeholders(text):
+    """Swap [placeholders] for numbered markers; returns (text, placeholders)"""
+    placeholders = []
+
+    def marker(match):
+        placeholders.append(match.group(0))
+        return f"[{len(placeholders) - 1}]"
+
+    return PLACEHOLDER_PATTERN.sub(marker, text), placeholders
+
+
+def restore_placeholders(text, placeholders):
+    def original(match):
+        index = int(match.group(1))
+        return placeholders[index] if index < len(placeholders) else match.group(0)
+
+    return MARKER_PATTERN.sub(original, text) if placeholders else text
+
+
+def split_long(sentence, limit):
+    """Cut a sentence longer than limit at spaces (or anywhere, for one huge word)"""
+    pieces = []
+    while len(sentence) > limit:
+        cut = sentence.rfind(" ", 0, limit + 1)
+        if cut <= 0:
+            cut = limit
+        pieces.append(sentence[:cut])
+        sentence = sentence[cut:].lstrip(" ")
+    pieces.append(sentence)
+    return pieces
+
+
+def chunk_lines(lines, limit):
+    """Group lines in order into newline-joined chunks of at most limit characters"""
+    chunks = []
+    current = []
+    size = 0
+    for line in lines:
+        if current and size + 1 + len(line) > limit:
+            chunks.append(current)
+            current = []
+            size = 0
+        size += len(line) + (1 if current else 0)
+        current.append(line)
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class TranslatorPool:
+    """Keeps idle translator instances per target language instead of building one per call"""
+
+    def __init__(self, factory):
+        self.factory = factory
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, language_code):
+        with self._lock:
+            idle = self._idle.get(language_code)
+            if idle:
+                return idle.pop()
+        return self.factory(language_code)
+
+    def release(self, language_code, translator):
+        with self._lock:
+            self._idle.setdefault(language_code, []).append(translator)
+
+    def translate(self, text, language_code):
+        translator = self.acquire(language_code)
+        try:
+            return translator.translate(text)
+        finally:
+            self.release(language_code, translator)
+
+
+class TranslationMemory:
+    """Persistent translation memory keyed by (source hash, target language code).
+
+    Whole texts and individual sentences are both remembered, so an edited excuse
+    only sends the sentences that changed to the translator. Storage and LRU
+    eviction are handled by a ResponseCache.
+
+    Sentences to translate go out one per line in requests of at most max_request_chars,
+    several requests in parallel for long texts. Placeholders in brackets and the
+    whitespace around each sentence are kept as they are.
+    """
+
+    def __init__(self, cache_file, max_entries=2048, disk_bytes=20 * 1024 * 1024, ttl=365 * 24 * 3600, namespace=None,
+                 max_request_chars=MAX_REQUEST_CHARS, max_workers=4):
+        self.cache = ResponseCache(cache_file, ttl=ttl, memory_entries=max_entries, disk_bytes=disk_bytes)
+        # Keeps translations from different backends apart in the same cache file
+        self.namespace = namespace
+        self.max_request_chars = max_request_chars
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def lookup(self, text, language_code):
+        return self.cache.get(self._key(text, language_code))
+
+    def store(self, text, language_code, translation):
+        self.cache.set(self._key(text, language_code), translation)
+
+    def translate(self, text, language_code, pool):
+        cached = self.lookup(text, language_code)
+        if cached is not None:
+            REGISTRY.increment("cache_hits_total", cache="translation")
+            return cached
+        REGISTRY.increment("cache_misses_total", cache="translation")
+
+        segments = split_segments(text)
+        translated = {}
+        # Insertion-ordered set of the sentences to send
+        missing = {}
+        for sentence, _ in segments:
+            if not sentence.strip() or sentence in translated or sentence in missing:
+                continue
+            cached = self.lookup(sentence, language_code)
+            if cached is not None:
+                translated[sentence] = cached
+            else:
+                missing[sentence] = None
+
+        if missing:
+            REGISTRY.increment("translated_sentences_total", len(missing))
+            REGISTRY.increment("reused_sentences_total", len(translated))
+            for sentence, line in zip(missing, self.translate_sentences(missing, language_code, pool)):
+                translated[sentence] = line
+                self.store(sentence, language_code, line)
+
+        translation = "".join(
+            translated.get(sentence, sentence) + separator for sentence, separator in segments
+        )
+        self.store(text, language_code, translation)
+        return translation
+
+    def translate_sentences(self, sentences, language_code, pool):
+        """Translate sentences one per line, in chunks sent in parallel; returns them in order"""
+        # Each sentence becomes one or more lines: (sentence index, text, its placeholders)
+        lines = []
+        for index, sentence in enumerate(sentences):
+            core, placeholders = protect_placeholders(sentence.strip())
+            for piece in split_long(core, self.max_request_chars):
+                lines.append((index, piece, placeholders))
+        chunks = chunk_lines([piece for _, piece, _ in lines], self.max_request_chars)
+
+        if len(chunks) == 1:
+            results = [self._translate_chunk(chunks[0], language_code, pool)]
+        else:
+            REGISTRY.increment("translation_chunks_total", len(chunks))
+            results = list(self.executor.map(lambda chunk: self._translate_chunk(chunk, language_code, pool), chunks))
+
+        pieces = [[] for _ in sentences]
+        translated_lines = (line for result in results for line in result)
+        for (index, _, placeholders), line in zip(lines, translated_lines):
+            pieces[index].append(restore_placeholders(line.strip(), placeholders))
+        # Indentation of bullet lines and the like is put back around the translation
+        return [
+            sentence[:len(sentence) - len(sentence.lstrip())] + " ".join(parts) + sentence[len(sentence.rstrip()):]
+            for sentence, parts in zip(sentences, pieces)
+        ]
+
+    def _translate_chunk(self, chunk, language_code, pool):
+        with REGISTRY.timer("translator_duration_seconds", language=language_code):
+            result = pool.translate("\n".join(chunk), language_code) or ""
+        lines = result.split("\n")
+        if len(lines) != len(chunk):
+            # The translator merged or split lines, send this chunk's lines one by one
+            REGISTRY.increment("translation_chunk_fallbacks_total")
+            lines = [(pool.translate(line, language_code) or "").replace("\n", " ") for line in chunk]
+        return lines
+
+    @property
+    def executor(self):
+        # Its own pool: translate() may already run on the app's translation executor
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="translate-chunk")
+            return self._executor
+
+    def clear(self):
+        self.cache.clear()
+
+    def _key(self, text, language_code):
+        key = f"{text_hash(text)}:{language_code}"
+        return f"{self.namespace}:{key}" if self.namespace else key
+
+
+class PipelinedTranslator:
+    """Translates a streamed text sentence by sentence while it is still being generated.
+
+    feed() takes raw chunks; every sentence that is complete is sent to translate_func
+    on a small thread pool right away. Translations are passed to on_output strictly in
+    source order as soon as the prefix before them is done, so the translated text
+    fills in progressively and finishes shortly after the last sentence arrives.
+
+    Sentences that fail keep their source text and their errors are collected in
+    errors, for the caller to report. A shared executor can be passed in; otherwise
+    one is made for this translation and shut down by finish().
+    """
+
+    def __init__(self, translate_func, on_output=None, max_workers=4, executor=None):
+        self.translate_func = translate_func
+        self.on_output = on_output
+        self.owns_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pipeline")
+        self.sentences = 0
+        self.errors = []
+        self._buffer = ""
+        self._slots = []
+        self._emitted = 0
+        # Re-entrant: a future that is already done runs its callback inside _submit
+        self._lock = threading.RLock()
+
+    def feed(self, chunk):
+        with self._lock:
+            self._buffer += chunk
+            segments = split_segments(self._buffer)
+            # The last segment may still be growing, keep it buffered
+            self._buffer = segments[-1][0]
+            for sentence, separator in segments[:-1]:
+                self._submit(sentence, separator)
+
+    def finish(self):
+        """Translate whatever is left, wait for every sentence and return the full translation"""
+        with self._lock:
+            if self._buffer:
+                self._submit(self._buffer, "")
+                self._buffer = ""
+            slots = list(self._slots)
+        for future, _ in slots:
+            future.result()
+        if self.owns_executor:
+            self.executor.shutdown(wait=True)
+        self._emit_ready()
+        return "".join(future.result() + separator for future, separator in slots)
+
+    def _submit(self, sentence, separator):
+        if sentence.strip():
+            self.sentences += 1
+            future = self.executor.submit(self._translate, sentence)
+        else:
+            future = Future()
+            future.set_result(sentence)
+        self._slots.append((future, separator))
+        future.add_done_callback(lambda f: self._emit_ready())
+
+    def _translate(self, sentence):
+        try:
+            return self.translate_func(sentence)
+        except Exception as e:
+            # Keep the source sentence rather than losing the whole translation
+            self.errors.append(e)
+            return sentence
+
+    def _emit_ready(self):
+        # Output happens under the lock so two threads cannot deliver out of order
+        with self._lock:
+            ready = []
+            while self._emitted < len(self._slots) and self._slots[self._emitted][0].done():
+                future, separator = self._slots[self._emitted]
+                ready.append(future.result() + separator)
+                self._emitted += 1
+            if ready and self.on_output is not None:
+                self.on_output("".join(ready))
@@ -0,0 +1,292 @@
+import sys
+import math
+import time
+import wave
+import array
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import REGISTRY
+
+
+# 16-bit mono PCM in 30 ms frames throughout the pipeline
+SAMPLE_WIDTH = 2
+FRAME_MS = 30
+
+
+def to_mono(pcm, channels):
+    """Average interleaved 16-bit channels down to one"""
+    if channels == 1:
+        return pcm
+    samples = array.array("h", pcm)
+    if sys.byteorder == "big":
+        samples.byteswap()
+    mono = array.array("h", (
+        sum(samples[i:i + channels]) // channels for i in range(0, len(samples) - channels + 1, channels)
+    ))
+    if sys.byteorder == "big":
+        mono.byteswap()
+    return mono.tobytes()
+
+
+def frame_energy(frame):
+    """Root mean square of a 16-bit little-endian PCM frame"""
+    samples = array.array("h", frame)
+    if sys.byteorder == "big":
+        samples.byteswap()
+    if not samples:
+        return 0.0
+    return math.sqrt(sum(s * s for s in samples) / len(samples))
+
+
+class PcmSource:
+    """Raw 16-bit little-endian PCM read from a binary stream (file, pipe, socket)"""
+
+    def __init__(self, stream, sample_rate=16000, channels=1, frame_ms=FRAME_MS):
+        self.stream = stream
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.frame_bytes = int(sample_rate * frame_ms / 1000) * SAMPLE_WIDTH * channels
+        self.stopped = threading.Event()
+
+    def frames(self):
+        while not self.stopped.is_set():
+            frame = self.stream.read(self.frame_bytes)
+            if not frame:
+                return
+            # Drop a trailing odd byte rather than misaligning the samples
+            yield to_mono(frame[:len(frame) - len(frame) % (SAMPLE_WIDTH * self.channels)], self.channels)
+
+    def stop(self):
+        self.stopped.set()
+
+    def close(self):
+        pass
+
+
+class WavSource(PcmSource):
+    """16-bit PCM WAV file, for tests and benchmarks without audio hardware"""
+
+    def __init__(self, path, frame_ms=FRAME_MS):
+        self.wav = wave.open(str(path), "rb")
+        sample_width = self.wav.getsampwidth()
+        if sample_width != SAMPLE_WIDTH:
+            self.wav.close()
+            raise ValueError(f"Only 16-bit WAV files are supported, got {sample_width * 8}-bit")
+        super().__init__(None, self.wav.getframerate(), self.wav.getnchannels(), frame_ms)
+        self.frame_samples = int(self.sample_rate * frame_ms / 1000)
+
+    def frames(self):
+        while not self.stopped.is_set():
+            frame = self.wav.readframes(self.frame_samples)
+            if not frame:
+                return
+            yield to_mono(frame, self.channels)
+
+    def close(self):
+        self.wav.close()
+
+
+class MicrophoneSource(PcmSource):
+    """Live microphone through speech_recognition (PyAudio), read frame by frame"""
+
+    def __init__(self, sample_rate=16000, frame_ms=FRAME_MS, device_index=None):
+        super().__init__(None, sample_rate, 1, frame_ms)
+        self.frame_samples = int(sample_rate * frame_ms / 1000)
+        self.device_index = device_index
+
+    def frames(self):
+        import speech_recognition as sr
+        with sr.Microphone(device_index=self.device_index, sample_rate=self.sample_rate,
+                           chunk_size=self.frame_samples) as source:
+            while not self.stopped.is_set():
+                yield source.stream.read(self.frame_samples)
+
+
+class Segment:
+    def __init__(self, index, start, pcm, sample_rate):
+        self.index = index
+        self.start = start
+        self.pcm = pcm
+        self.sample_rate = sample_rate
+
+    @property
+    def duration(self):
+        return len(self.pcm) / SAMPLE_WIDTH / self.sample_rate
+
+
+class VoiceActivitySegmenter:
+    """Energy-based voice activity detection that cuts a frame stream into utterances.
+
+    A frame is speech when its energy is well above the tracked noise floor. A segment
+    starts at the first speech frame (plus some lead-in) and ends after silence_ms of
+    quiet, or at max_segment_ms so long dictations are recognized piece by piece.
+    Blips shorter than min_speech_ms are dropped.
+    """
+
+    def __init__(self, sample_rate, frame_ms=FRAME_MS, silence_ms=600, padding_ms=200, min_speech_ms=250,
+                 max_segment_ms=12000, threshold_ratio=3.0, min_energy=300.0):
+        self.sample_rate = sample_rate
+        self.frame_ms = frame_ms
+        self.silence_frames = max(1, silence_ms // frame_ms)
+        self.padding_frames = max(0, padding_ms // frame_ms)
+        self.min_speech_frames = max(1, min_speech_ms // frame_ms)
+        self.max_segment_frames = max(1, max_segment_ms // frame_ms)
+        self.threshold_ratio = threshold_ratio
+        self.min_energy = min_energy
+        self.noise = None
+        self.position = 0
+        self.count = 0
+        self._lead_in = []
+        self._frames = []
+        self._speech_frames = 0
+        self._quiet_frames = 0
+        self._start = 0
+
+    def is_speech(self, energy):
+        if self.noise is None:
+            self.noise = energy
+        speech = energy > max(self.min_energy, self.noise * self.threshold_ratio)
+        if not speech:
+            # Follow the background level, quickly down and slowly up
+            self.noise += (energy - self.noise) * (0.3 if energy < self.noise else 0.05)
+        return speech
+
+    def feed(self, frame):
+        """Add one frame; returns a finished Segment or None"""
+        speech = self.is_speech(frame_energy(frame))
+        self.position += 1
+        if not self._frames:
+            if not speech:
+                self._lead_in.append(frame)
+                del self._lead_in[:-self.padding_frames or len(self._lead_in)]
+                return None
+            self._start = self.position - 1 - len(self._lead_in)
+            self._frames = self._lead_in + [frame]
+            self._lead_in = []
+            self._speech_frames = 1
+            self._quiet_frames = 0
+            return None
+        self._frames.append(frame)
+        if speech:
+            self._speech_frames += 1
+            self._quiet_frames = 0
+        else:
+            self._quiet_frames += 1
+        if self._quiet_frames >= self.silence_frames or len(self._frames) >= self.max_segment_frames:
+            return self._finish()
+        return None
+
+    @property
+    def in_speech(self):
+        return bool(self._frames)
+
+    def flush(self):
+        return self._finish() if self._frames else None
+
+    def _finish(self):
+        frames = self._frames
+        # Keep a little trailing quiet, drop the rest
+        trailing = max(0, self._quiet_frames - self.padding_frames)
+        if trailing:
+            frames = frames[:-trailing]
+        speech_frames = self._speech_frames
+        self._frames = []
+        self._speech_frames = 0
+        self._quiet_frames = 0
+        if speech_frames < self.min_speech_frames:
+            return None
+        segment = Segment(self.count, self._start * self.frame_ms / 1000, b"".join(frames), self.sample_rate)
+        self.count += 1
+        return segment
+
+
+class TranscriptionPipeline:
+    """Streams audio from a source through voice activity segmentation into concurrent recognition.
+
+    Segments are recognized by recognize(segment) on a thread pool while capture goes
+    on. on_partial(text) is called with each segment's text in spoken order as soon as
+    it and all earlier segments are done. A failed segment is recorded and skipped,
+    the rest of the dictation is kept.
+    """
+
+    def __init__(self, recognize, workers=4, idle_timeout=None, **segmenter_options):
+        self.recognize = recognize
+        self.workers = workers
+        self.idle_timeout = idle_timeout
+        self.segmenter_options = segmenter_options
+        self.source = None
+
+    def stop(self):
+        if self.source is not None:
+            self.source.stop()
+
+    def run(self, source, on_partial=None):
+        """Transcribe source until it ends or stop() is called.
+
+        Returns [(segment, text, error), ...] in spoken order.
+        """
+        self.source = source
+        segmenter = VoiceActivitySegmenter(source.sample_rate, **self.segmenter_options)
+        results = {}
+        futures = {}
+        released = [0]
+        lock = threading.Lock()
+
+        def recognize(segment):
+            with REGISTRY.timer("voice_segment_seconds"):
+                try:
+                    results[segment.index] = (segment, self.recognize(segment) or "", None)
+                except Exception as e:
+                    REGISTRY.increment("errors_total", method="voice_segment")
+                    results[segment.index] = (segment, "", e)
+            # Hand out finished segments in order, whichever thread completes the gap
+            with lock:
+                while released[0] in results:
+                    _, text, error = results[released[0]]
+                    released[0] += 1
+                    if on_partial is not None and text and error is None:
+                        on_partial(text)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            last_speech = time.monotonic()
+            try:
+                for frame in source.frames():
+                    segment = segmenter.feed(frame)
+                    if segment is not None:
+                        futures[segment.index] = pool.submit(recognize, segment)
+                    if segmenter.in_speech:
+                        last_speech = time.monotonic()
+                    elif self.idle_timeout and time.monotonic() - last_speech > self.idle_timeout:
+                        break
+                segment = segmenter.flush()
+                if segment is not None:
+                    futures[segment.index] = pool.submit(recognize, segment)
+            finally:
+                source.close()
+        REGISTRY.increment("voice_segments_total", len(results))
+        return [results[index] for index in sorted(results)]
+
+
+def transcript_text(results):
+    return " ".join(text.strip() for _, text, _ in results if text.strip())
+
+
+def main(argv=None):
+    """Segment a WAV file or raw PCM from stdin and print the segments (no recognition)"""
+    parser = argparse.ArgumentParser(description="Voice activity segmentation of WAV or raw PCM audio")
+    parser.add_argument("input", help="WAV file, or - for raw 16-bit mono PCM on stdin")
+    parser.add_argument("--rate", type=int, default=16000, help="Sample rate of raw PCM input")
+    args = parser.parse_args(argv)
+    source = PcmSource(sys.stdin.buffer, args.rate) if args.input == "-" else WavSource(args.input)
+    start = time.perf_counter()
+    results = TranscriptionPipeline(lambda segment: f"{segment.duration:.2f}s").run(source)
+    for segment, text, _ in results:
+        print(f"segment {segment.index}: {segment.start:7.2f}s  {text}")
+    print(f"{len(results)} segments in {time.perf_counter() - start:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())